@@ -0,0 +1,81 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api import deps
+from app.models.models import User, UserDailyActions, UserDailyStats
+from app.schemas.stats import DailyStats, StatsSummary, UserStatsResult
+
+router = APIRouter()
+
+# 单次查询的最大天数
+MAX_STATS_DAYS = 366
+
+_SUMS = ("message_count", "session_count", "session_seconds", "response_count", "response_ms_total")
+
+
+def _summary(sums: Dict[str, int], response_ms_max: int, actions: Dict[str, int]) -> dict:
+    """由汇总表的累计值计算平均会话时长和平均回复耗时"""
+    return {
+        "message_count": sums["message_count"],
+        "session_count": sums["session_count"],
+        "avg_session_seconds": sums["session_seconds"] / sums["session_count"] if sums["session_count"] else 0.0,
+        "avg_response_ms": sums["response_ms_total"] / sums["response_count"] if sums["response_count"] else None,
+        "max_response_ms": response_ms_max if sums["response_count"] else None,
+        "actions": actions,
+    }
+
+
+@router.get("/stats", response_model=UserStatsResult)
+async def get_user_stats(*, db: AsyncSession = Depends(deps.get_read_db), current_user: User = Depends(deps.get_current_admin_user), user_id: Optional[int] = None, start: Optional[date] = None, end: Optional[date] = None) -> Any:
+    """按天获取用户的聊天统计（消息数、会话数和时长、回复耗时、操作次数），不指定用户时汇总全部用户
+
+    只读取预先汇总的每日统计表，不扫描聊天记录；日期为 UTC，默认最近 30 天。
+    """
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    if start > end or (end - start).days >= MAX_STATS_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"日期范围无效，最多查询 {MAX_STATS_DAYS} 天"
+        )
+
+    stats, actions = UserDailyStats, UserDailyActions
+    query = select(stats.day, *(func.sum(getattr(stats, name)) for name in _SUMS), func.max(stats.response_ms_max)) \
+        .where(stats.day >= start, stats.day <= end).group_by(stats.day).order_by(stats.day)
+    action_query = select(actions.day, actions.action, func.sum(actions.count)) \
+        .where(actions.day >= start, actions.day <= end).group_by(actions.day, actions.action)
+    if user_id is not None:
+        query = query.where(stats.user_id == user_id)
+        action_query = action_query.where(actions.user_id == user_id)
+
+    daily_actions: Dict[date, Dict[str, int]] = defaultdict(dict)
+    for day, action, count in (await db.execute(action_query)).all():
+        daily_actions[day][action] = int(count)
+
+    days = []
+    totals = dict.fromkeys(_SUMS, 0)
+    total_max = 0
+    for day, *sums, response_ms_max in (await db.execute(query)).all():
+        sums = dict(zip(_SUMS, (int(value or 0) for value in sums)))
+        for name, value in sums.items():
+            totals[name] += value
+        total_max = max(total_max, response_ms_max or 0)
+        days.append(DailyStats(day=day, **_summary(sums, response_ms_max or 0, daily_actions.get(day, {}))))
+    # 只有操作记录、没有消息的日期
+    seen = {daily.day for daily in days}
+    for day in sorted(set(daily_actions) - seen):
+        days.append(DailyStats(day=day, actions=daily_actions[day]))
+    days.sort(key=lambda daily: daily.day)
+
+    total_actions: Dict[str, int] = defaultdict(int)
+    for day_actions in daily_actions.values():
+        for action, count in day_actions.items():
+            total_actions[action] += count
+    return UserStatsResult(
+        user_id=user_id, start=start, end=end, days=days,
+        total=StatsSummary(**_summary(totals, total_max, dict(total_actions)))
+    )
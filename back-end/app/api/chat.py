@@ -1,43 +1,563 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import asyncio
+import json
+import logging
+import math
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.background import BackgroundTask
+from sqlalchemy import and_, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.api import deps
-from app.models.models import User, ChatLog
-from app.schemas.chat import ChatCreate, ChatResponse, ChatList
+from app.core.config import settings
+from app.core.lifecycle import StreamDrainer, StreamInterrupted
+from app.core.pagination import InvalidCursor, decode_cursor, encode_cursor
+from app.core.responses import ORJSONResponse, objects_to_dicts, response_fields, rows_to_dicts
+from app.models.models import User, ChatLog, Log
+from app.schemas.chat import ChatCreate, ChatResponse, ChatList, ChatSearchResult
+from app.services.batching import BatchingTextGenAPI
+from app.services.context import ConversationContext, bare_prompt
+from app.services.export import csv_chunks, gzip_chunks, ndjson_chunks
+from app.services.push import PushHub
+from app.services.rate_limit import AdmissionController, GenerationOverloaded
+from app.services.response_cache import ResponseCache
+from app.services.rollup import record_rows
+from app.services.search import search_chat_logs
+from app.services.text_gen import AsyncTextGenAPI
+from app.services.write_behind import WriteBehindQueue, WriteBehindQueueFull, increment_chat_count
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/send", response_model=ChatResponse)
-def send_message(*, db: Session = Depends(deps.get_db), chat_in: ChatCreate, current_user: User = Depends(deps.get_current_active_user)) -> Any:
+# 导出时每次从服务端游标读取的行数
+EXPORT_BATCH_SIZE = 500
+
+# 列表接口只查询响应需要的列并直接编码为 JSON，不逐行构造 ORM 对象和 Pydantic 模型
+CHAT_COLUMNS = [getattr(ChatLog, name) for name in response_fields(ChatResponse)]
+
+async def _build_prompt(db: AsyncSession, conversation_context: Optional[ConversationContext], user_id: int, message: str) -> Tuple[str, bool]:
+    """拼接带有对话上下文的提示词，同时返回是否拼入了历史对话
+
+    拼入历史对话的提示词包含用户的私人内容，回复不能写入或取自共享的回复缓存。
+    """
+    if conversation_context is None:
+        return message, False
+    prompt = await conversation_context.build_prompt(db, user_id, message)
+    return prompt, prompt != bare_prompt(message)
+
+
+async def _save_chat_log(db: AsyncSession, chat_log: ChatLog, conversation_context: Optional[ConversationContext] = None, write_queue: Optional[WriteBehindQueue] = None, push_hub: Optional[PushHub] = None, origin: Optional[str] = None) -> ChatLog:
+    """写入聊天记录和审计日志，追加到对话上下文窗口，并推送给该用户的其他 WebSocket 连接（origin 为发起方的连接ID）"""
+    if write_queue is not None:
+        # 与其他请求的记录合并在一个事务中写入，等待提交后取得ID
+        await write_queue.add(Log(user_id=chat_log.user_id, action="chat_send"), wait=False)
+        chat_log = await write_queue.add(chat_log)
+    else:
+        log = Log(user_id=chat_log.user_id, action="chat_send")
+        db.add(chat_log)
+        db.add(log)
+        # 在同一事务中维护用户的聊天记录数和每日统计，分页和统计时无需扫描聊天记录
+        await increment_chat_count(db, chat_log.user_id, 1)
+        await record_rows(db, [chat_log, log])
+        await db.commit()
+        await db.refresh(chat_log)
+    if conversation_context is not None:
+        await conversation_context.append(chat_log.user_id, chat_log.message, chat_log.response)
+    if push_hub is not None:
+        await push_hub.publish(chat_log.user_id, {"type": "chat", "chat": jsonable_encoder(ChatResponse.from_orm(chat_log))}, exclude=origin)
+    return chat_log
+
+
+async def _batched_reply(text_gen_api: BatchingTextGenAPI, prompt: str, max_length: int) -> AsyncIterator[str]:
+    yield await text_gen_api.generate_text(prompt, max_length=max_length, priority="high")
+
+
+def _elapsed_ms(started: float) -> int:
+    return int((time.perf_counter() - started) * 1000)
+
+
+def _overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="服务繁忙，请稍后重试",
+        headers={"Retry-After": "1"}
+    )
+
+
+@router.post("/send", response_model=ChatResponse, dependencies=[Depends(deps.RateLimit("chat_send"))])
+async def send_message(*, db: AsyncSession = Depends(deps.get_db), chat_in: ChatCreate, current_user: User = Depends(deps.get_current_active_user), text_gen_api: AsyncTextGenAPI = Depends(deps.get_text_gen_api), response_cache: Optional[ResponseCache] = Depends(deps.get_response_cache), conversation_context: Optional[ConversationContext] = Depends(deps.get_conversation_context), write_queue: Optional[WriteBehindQueue] = Depends(deps.get_write_queue), admission: AdmissionController = Depends(deps.get_admission_controller), push_hub: PushHub = Depends(deps.get_push_hub)) -> Any:
     """发送聊天消息并获取回复"""
-    # 在实际应用中，这里可能会调用AI服务来生成回复
-    # 目前使用简单的回复机制作为示例
-    response_text = f"这是对'{chat_in.message}'的自动回复"
+    started = time.perf_counter()
+    max_length = settings.TEXT_GEN_MAX_LENGTH
+    prompt, with_history = await _build_prompt(db, conversation_context, current_user.id, chat_in.message)
+
+    async def generate():
+        # 只有真正调用生成服务时才占用准入名额，命中缓存的请求不受影响
+        with admission.acquire():
+            return await text_gen_api.generate_text(prompt, max_length=max_length)
+
+    try:
+        # 用户可以选择不使用共享的回复缓存；缓存以用户本次的消息为键，带历史对话的请求不使用缓存
+        if response_cache is not None and current_user.allow_response_cache and not with_history:
+            response_text = await response_cache.get_or_generate(chat_in.message, max_length, generate)
+        else:
+            response_text = await generate()
+    except GenerationOverloaded:
+        raise _overloaded()
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="回复生成失败"
+        )
     
     # 创建聊天记录
     chat_log = ChatLog(
         user_id=current_user.id,
         message=chat_in.message,
-        response=response_text
+        response=response_text,
+        response_ms=_elapsed_ms(started)
     )
     
-    db.add(chat_log)
-    db.commit()
-    db.refresh(chat_log)
-    
-    return chat_log
+    try:
+        return await _save_chat_log(db, chat_log, conversation_context, write_queue, push_hub)
+    except WriteBehindQueueFull:
+        raise _overloaded()
+
+def _sse_event(event: str, data: str) -> str:
+    """按SSE格式封装一个事件"""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.post("/stream", dependencies=[Depends(deps.RateLimit("chat_stream"))])
+async def stream_message(*, db: AsyncSession = Depends(deps.get_db), chat_in: ChatCreate, current_user: User = Depends(deps.get_current_active_user), text_gen_api: AsyncTextGenAPI = Depends(deps.get_text_gen_api), response_cache: Optional[ResponseCache] = Depends(deps.get_response_cache), conversation_context: Optional[ConversationContext] = Depends(deps.get_conversation_context), write_queue: Optional[WriteBehindQueue] = Depends(deps.get_write_queue), admission: AdmissionController = Depends(deps.get_admission_controller), drainer: StreamDrainer = Depends(deps.get_stream_drainer), push_hub: PushHub = Depends(deps.get_push_hub)) -> Any:
+    """发送聊天消息，并以SSE流式返回生成的回复"""
+    # 停机过程中不再开始新的流式回复
+    if drainer.draining:
+        raise _overloaded()
+    started = time.perf_counter()
+    user_id = current_user.id
+    max_length = settings.TEXT_GEN_MAX_LENGTH
+    prompt, with_history = await _build_prompt(db, conversation_context, user_id, chat_in.message)
+    if not current_user.allow_response_cache or with_history:
+        response_cache = None
+    # 响应头发出后就无法再返回 503，因此在开始流式响应前申请准入
+    try:
+        ticket = admission.acquire()
+    except GenerationOverloaded:
+        raise _overloaded()
+
+    async def event_stream():
+        chunks = []
+        try:
+            cached = await response_cache.get(chat_in.message, max_length) if response_cache is not None else None
+            if cached is not None:
+                # 命中缓存时一次性返回完整回复
+                chunks.append(cached)
+                yield _sse_event("token", json.dumps({"text": cached}, ensure_ascii=False))
+            else:
+                try:
+                    async for chunk in drainer.stream(text_gen_api.stream_text(prompt, max_length=max_length)):
+                        chunks.append(chunk)
+                        yield _sse_event("token", json.dumps({"text": chunk}, ensure_ascii=False))
+                except StreamInterrupted:
+                    yield _sse_event("error", json.dumps({"detail": "服务正在重启，请稍后重试"}, ensure_ascii=False))
+                    return
+                except Exception:
+                    yield _sse_event("error", json.dumps({"detail": "回复生成失败"}, ensure_ascii=False))
+                    return
+                if response_cache is not None and chunks:
+                    await response_cache.set(chat_in.message, max_length, "".join(chunks))
+        finally:
+            ticket.release()
+
+        # 生成结束后只写入一次完整的聊天记录
+        chat_log = ChatLog(
+            user_id=user_id,
+            message=chat_in.message,
+            response="".join(chunks),
+            response_ms=_elapsed_ms(started)
+        )
+        try:
+            chat_log = await _save_chat_log(db, chat_log, conversation_context, write_queue, push_hub)
+        except WriteBehindQueueFull:
+            yield _sse_event("error", json.dumps({"detail": "服务繁忙，请稍后重试"}, ensure_ascii=False))
+            return
+
+        yield _sse_event("done", ChatResponse.from_orm(chat_log).json(ensure_ascii=False))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # 客户端在响应开始前断开时生成器不会执行，由后台任务归还准入名额
+        background=BackgroundTask(ticket.release)
+    )
+
+# WebSocket 消息与 /stream 共用同一个按用户的限流规则
+_ws_rate_limit = deps.RateLimit("chat_stream")
+
+
+class _ChatConnection:
+    """一个已认证的 WebSocket 聊天连接
+
+    同一连接上可以同时进行多条消息的回复，以消息ID区分。发往客户端的消息都经过一个有界缓冲区，由单独的任务写出：
+    缓冲区满时回复的生成随之暂停，等待超过 WS_SEND_TIMEOUT 则认为客户端读取过慢并断开连接。
+    """
+
+    def __init__(self, websocket: WebSocket, user: User, *, session_factory: Callable, text_gen_api: AsyncTextGenAPI, response_cache: Optional[ResponseCache], conversation_context: Optional[ConversationContext], write_queue: Optional[WriteBehindQueue], admission: AdmissionController, drainer: StreamDrainer, push_hub: PushHub):
+        self.websocket = websocket
+        self.user_id = user.id
+        self.session_factory = session_factory
+        self.text_gen_api = text_gen_api
+        # 用户可以选择不使用共享的回复缓存
+        self.response_cache = response_cache if user.allow_response_cache else None
+        self.conversation_context = conversation_context
+        self.write_queue = write_queue
+        self.admission = admission
+        self.drainer = drainer
+        self.push_hub = push_hub
+
+        self.id = uuid.uuid4().hex
+        self.loop = asyncio.get_event_loop()
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.replies: Dict[str, asyncio.Task] = {}
+        self.closed = asyncio.Event()
+        self.stopping = asyncio.Event()
+        self.close_code = status.WS_1000_NORMAL_CLOSURE
+        self.disconnected = False
+        self.last_received = time.monotonic()
+
+    def close(self, code: int) -> None:
+        if not self.closed.is_set():
+            self.close_code = code
+            self.closed.set()
+
+    async def send(self, frame: dict) -> None:
+        """发送一条消息，缓冲区满时等待"""
+        try:
+            await asyncio.wait_for(self.outbox.put(frame), settings.WS_SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.close(status.WS_1008_POLICY_VIOLATION)
+
+    def push(self, frame: dict) -> None:
+        """推送中心的投递回调，不能等待"""
+        try:
+            self.outbox.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.close(status.WS_1008_POLICY_VIOLATION)
+
+    async def error(self, reply_id: Optional[str], detail: str, **extra: Any) -> None:
+        await self.send({"type": "error", "id": reply_id, "detail": detail, **extra})
+
+    async def run(self) -> None:
+        """处理连接直到客户端断开、心跳超时或停机"""
+        self.push_hub.register(self.user_id, self.id, self.push)
+        self.drainer.add_listener(self._on_drain)
+        if self.drainer.draining:
+            self.stopping.set()
+        reader = asyncio.ensure_future(self._read())
+        writer = asyncio.ensure_future(self._write())
+        others = [asyncio.ensure_future(self._heartbeat()), asyncio.ensure_future(self._drain())]
+        try:
+            await self.closed.wait()
+        finally:
+            self.push_hub.unregister(self.user_id, self.id)
+            self.drainer.remove_listener(self._on_drain)
+            for task in [reader, *others, *self.replies.values()]:
+                task.cancel()
+            await asyncio.wait([reader, *others, *self.replies.values()])
+            if not self.disconnected and self.close_code != status.WS_1008_POLICY_VIOLATION:
+                # 把已经排队的消息（例如停机前最后的 done 和 error）发送出去再关闭
+                try:
+                    await asyncio.wait_for(self.outbox.join(), settings.WS_SEND_TIMEOUT)
+                except asyncio.TimeoutError:
+                    pass
+            writer.cancel()
+            await asyncio.wait([writer])
+            if not self.disconnected:
+                try:
+                    await self.websocket.close(code=self.close_code)
+                except Exception:
+                    pass
+
+    async def _read(self) -> None:
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", status.WS_1000_NORMAL_CLOSURE))
+                self.last_received = time.monotonic()
+                try:
+                    frame = json.loads(message.get("text") or "")
+                except ValueError:
+                    frame = None
+                if not isinstance(frame, dict):
+                    await self.error(None, "无效的消息格式")
+                    continue
+                await self._dispatch(frame)
+        except WebSocketDisconnect:
+            self.disconnected = True
+            self.close(status.WS_1000_NORMAL_CLOSURE)
+        except Exception:
+            logger.exception("处理 WebSocket 消息失败")
+            self.close(status.WS_1011_INTERNAL_ERROR)
+
+    async def _write(self) -> None:
+        try:
+            while True:
+                frame = await self.outbox.get()
+                await self.websocket.send_text(json.dumps(frame, ensure_ascii=False))
+                self.outbox.task_done()
+        except Exception:
+            # 连接已经断开
+            self.disconnected = True
+            self.close(status.WS_1001_GOING_AWAY)
+
+    async def _heartbeat(self) -> None:
+        interval = settings.WS_HEARTBEAT_INTERVAL
+        if interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            # 客户端的任何消息（包括 pong）都算作存活
+            if time.monotonic() - self.last_received > 2 * interval:
+                self.close(status.WS_1001_GOING_AWAY)
+                return
+            await self.send({"type": "ping"})
+
+    def _on_drain(self) -> None:
+        # 由 StreamDrainer.begin 调用，不一定在本连接的事件循环中
+        self.loop.call_soon_threadsafe(self.stopping.set)
+
+    async def _drain(self) -> None:
+        """停机开始后不再接收新消息，等进行中的回复结束后以 1012 关闭，提示客户端重新连接"""
+        await self.stopping.wait()
+        while self.replies:
+            await asyncio.wait(list(self.replies.values()))
+        self.close(status.WS_1012_SERVICE_RESTART)
+
+    async def _dispatch(self, frame: dict) -> None:
+        kind = frame.get("type")
+        if kind == "message":
+            await self._start_reply(frame)
+        elif kind == "cancel":
+            reply_id = str(frame.get("id"))
+            task = self.replies.get(reply_id)
+            if task is not None:
+                task.cancel()
+                await self.send({"type": "cancelled", "id": reply_id})
+        elif kind == "ping":
+            await self.send({"type": "pong"})
+        elif kind != "pong":
+            await self.error(frame.get("id"), "未知的消息类型")
+
+    async def _start_reply(self, frame: dict) -> None:
+        reply_id = str(frame.get("id") or uuid.uuid4().hex)
+        try:
+            chat_in = ChatCreate(message=frame.get("message"))
+        except ValidationError:
+            await self.error(reply_id, "消息内容无效")
+            return
+        if self.drainer.draining:
+            await self.error(reply_id, "服务正在重启，请稍后重试")
+        elif reply_id in self.replies:
+            await self.error(reply_id, "消息ID重复")
+        elif len(self.replies) >= settings.WS_MAX_STREAMS:
+            await self.error(reply_id, "同时进行的回复过多，请稍后重试")
+        else:
+            task = asyncio.ensure_future(self._reply(reply_id, chat_in.message))
+            self.replies[reply_id] = task
+            task.add_done_callback(lambda _: self.replies.pop(reply_id, None))
+
+    async def _reply(self, reply_id: str, message: str) -> None:
+        """生成一条消息的回复并逐段发送，结束后写入聊天记录"""
+        started = time.perf_counter()
+        allowed, retry_after = await _ws_rate_limit.check_user(self.user_id)
+        if not allowed:
+            await self.error(reply_id, "请求过于频繁，请稍后重试", retry_after=math.ceil(retry_after))
+            return
+        max_length = settings.TEXT_GEN_MAX_LENGTH
+        # 每条消息只在读写数据库时短暂占用连接
+        async with self.session_factory() as db:
+            prompt, with_history = await _build_prompt(db, self.conversation_context, self.user_id, message)
+        response_cache = None if with_history else self.response_cache
+
+        chunks = []
+        try:
+            cached = await response_cache.get(message, max_length) if response_cache is not None else None
+            if cached is not None:
+                chunks.append(cached)
+                await self.send({"type": "token", "id": reply_id, "text": cached})
+            else:
+                if isinstance(self.text_gen_api, BatchingTextGenAPI):
+                    # 启用批处理时 WebSocket 回复也参与组批，并优先于 /send 的请求；整条回复作为一段发送
+                    chunk_iter = _batched_reply(self.text_gen_api, prompt, max_length)
+                else:
+                    chunk_iter = self.text_gen_api.stream_text(prompt, max_length=max_length)
+                with self.admission.acquire():
+                    async for chunk in self.drainer.stream(chunk_iter):
+                        chunks.append(chunk)
+                        await self.send({"type": "token", "id": reply_id, "text": chunk})
+                if response_cache is not None and chunks:
+                    await response_cache.set(message, max_length, "".join(chunks))
+        except GenerationOverloaded:
+            await self.error(reply_id, "服务繁忙，请稍后重试")
+            return
+        except StreamInterrupted:
+            await self.error(reply_id, "服务正在重启，请稍后重试")
+            return
+        except Exception:
+            await self.error(reply_id, "回复生成失败")
+            return
+
+        chat_log = ChatLog(user_id=self.user_id, message=message, response="".join(chunks), response_ms=_elapsed_ms(started))
+        try:
+            async with self.session_factory() as db:
+                chat_log = await _save_chat_log(db, chat_log, self.conversation_context, self.write_queue, self.push_hub, origin=self.id)
+                chat = jsonable_encoder(ChatResponse.from_orm(chat_log))
+        except WriteBehindQueueFull:
+            await self.error(reply_id, "服务繁忙，请稍后重试")
+            return
+        # WebSocket 消息不经过 get_db，在这里记录写入，使随后的历史记录请求读主库
+        await deps.recent_writers.mark(self.user_id)
+        await self.send({"type": "done", "id": reply_id, "chat": chat})
+
+
+async def _receive_auth_token(websocket: WebSocket) -> Optional[str]:
+    """等待客户端发送的首条消息 {"type": "auth", "token": ...}，超时或格式不对时返回 None"""
+    try:
+        frame = json.loads(await asyncio.wait_for(websocket.receive_text(), settings.WS_AUTH_TIMEOUT))
+    except (asyncio.TimeoutError, KeyError, ValueError):
+        return None
+    if isinstance(frame, dict) and frame.get("type") == "auth" and isinstance(frame.get("token"), str):
+        return frame["token"]
+    return None
+
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket, token: Optional[str] = None, session_factory: Callable = Depends(deps.get_session_factory), text_gen_api: AsyncTextGenAPI = Depends(deps.get_text_gen_api), response_cache: Optional[ResponseCache] = Depends(deps.get_response_cache), conversation_context: Optional[ConversationContext] = Depends(deps.get_conversation_context), write_queue: Optional[WriteBehindQueue] = Depends(deps.get_write_queue), admission: AdmissionController = Depends(deps.get_admission_controller), drainer: StreamDrainer = Depends(deps.get_stream_drainer), push_hub: PushHub = Depends(deps.get_push_hub)) -> None:
+    """WebSocket 聊天：连接时认证一次，之后可以同时发送多条消息并接收各自的流式回复"""
+    # 停机过程中不再接受新连接
+    if drainer.draining:
+        await websocket.close(code=status.WS_1012_SERVICE_RESTART)
+        return
+    await websocket.accept()
+    try:
+        # 浏览器无法为 WebSocket 设置请求头，token 放在查询参数或首条消息中
+        if token is None:
+            token = await _receive_auth_token(websocket)
+        user = None
+        if token:
+            async with session_factory() as db:
+                user = await deps.authenticate_token(db, token)
+        if user is None or not user.is_active:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        await websocket.send_text(json.dumps({"type": "ready", "user_id": user.id, "heartbeat": settings.WS_HEARTBEAT_INTERVAL}))
+    except WebSocketDisconnect:
+        return
+
+    connection = _ChatConnection(
+        websocket, user, session_factory=session_factory, text_gen_api=text_gen_api, response_cache=response_cache,
+        conversation_context=conversation_context, write_queue=write_queue, admission=admission, drainer=drainer,
+        push_hub=push_hub
+    )
+    await connection.run()
 
 @router.get("/history", response_model=List[ChatResponse])
-def get_chat_history(*, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_active_user), skip: int = 0, limit: int = 100) -> Any:
+async def get_chat_history(*, db: AsyncSession = Depends(deps.get_read_db), current_user: User = Depends(deps.get_current_active_user), skip: int = 0, limit: int = 100) -> Any:
     """获取用户的聊天历史记录"""
-    chat_logs = db.query(ChatLog).filter(ChatLog.user_id == current_user.id).order_by(ChatLog.timestamp.desc()).offset(skip).limit(limit).all()
-    return chat_logs
+    result = await db.execute(select(*CHAT_COLUMNS).where(ChatLog.user_id == current_user.id).order_by(ChatLog.timestamp.desc(), ChatLog.id.desc()).offset(skip).limit(limit))
+    return ORJSONResponse(rows_to_dicts(ChatResponse, result.all()))
+
+@router.get("/history/page", response_model=ChatList)
+async def get_chat_history_page(*, db: AsyncSession = Depends(deps.get_read_db), current_user: User = Depends(deps.get_current_active_user), cursor: Optional[str] = None, limit: int = Query(20, ge=1, le=100)) -> Any:
+    """按游标分页获取聊天历史，返回 next_cursor 用于获取下一页"""
+    query = select(*CHAT_COLUMNS).where(ChatLog.user_id == current_user.id)
+    if cursor:
+        try:
+            timestamp, chat_id = decode_cursor(cursor)
+        except InvalidCursor:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="无效的分页游标"
+            )
+        # 从上一页最后一条记录之后继续读取，利用 (user_id, timestamp, id) 索引而无需跳过前面的行
+        query = query.where(or_(
+            ChatLog.timestamp < timestamp,
+            and_(ChatLog.timestamp == timestamp, ChatLog.id < chat_id)
+        ))
+    result = await db.execute(query.order_by(ChatLog.timestamp.desc(), ChatLog.id.desc()).limit(limit + 1))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    total = await db.scalar(select(User.chat_count).where(User.id == current_user.id))
+    return ORJSONResponse({"chats": rows_to_dicts(ChatResponse, rows), "total": total or 0, "next_cursor": next_cursor})
+
+@router.get("/search", response_model=ChatSearchResult)
+async def search_chat_history(*, db: AsyncSession = Depends(deps.get_read_db), current_user: User = Depends(deps.get_current_active_user), q: str = Query(..., min_length=1, max_length=200), offset: int = Query(0, ge=0, le=1000), limit: int = Query(20, ge=1, le=100)) -> Any:
+    """在当前用户的聊天记录中全文检索，按相关度排序"""
+    hits = await search_chat_logs(db, current_user.id, q, offset=offset, limit=limit + 1)
+    next_offset = offset + limit if len(hits) > limit else None
+    hits = hits[:limit]
+    results = objects_to_dicts(ChatResponse, (chat_log for chat_log, _ in hits))
+    for result, (_, score) in zip(results, hits):
+        result["score"] = float(score)
+    return ORJSONResponse({"results": results, "next_offset": next_offset})
+
+@router.get("/export")
+async def export_chat_history(*, db: AsyncSession = Depends(deps.get_read_db), current_user: User = Depends(deps.get_current_active_user), format: str = Query("ndjson", regex="^(ndjson|csv)$"), start: Optional[datetime] = None, end: Optional[datetime] = None, compress: bool = False, user_id: Optional[int] = None) -> Any:
+    """以NDJSON或CSV流式导出聊天历史，内存占用与记录数无关；管理员可以导出指定用户的记录"""
+    if user_id is None:
+        user_id = current_user.id
+    elif user_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="权限不足"
+        )
+
+    # 只查询需要的列，避免ORM对象堆积在会话中
+    query = select(ChatLog.id, ChatLog.message, ChatLog.response, ChatLog.timestamp).where(ChatLog.user_id == user_id)
+    if start is not None:
+        query = query.where(ChatLog.timestamp >= start)
+    if end is not None:
+        query = query.where(ChatLog.timestamp < end)
+    query = query.order_by(ChatLog.timestamp, ChatLog.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    async def partitions():
+        result = await db.stream(query)
+        async for rows in result.partitions(EXPORT_BATCH_SIZE):
+            yield rows
+
+    if format == "csv":
+        body, media_type = csv_chunks(partitions()), "text/csv; charset=utf-8"
+    else:
+        body, media_type = ndjson_chunks(partitions()), "application/x-ndjson"
+    filename = f"chat_history_{user_id}.{format}"
+    if compress:
+        body, media_type, filename = gzip_chunks(body), "application/gzip", filename + ".gz"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.get("/history/{chat_id}", response_model=ChatResponse)
-def get_chat_detail(*, db: Session = Depends(deps.get_db), chat_id: int, current_user: User = Depends(deps.get_current_active_user)) -> Any:
+async def get_chat_detail(*, db: AsyncSession = Depends(deps.get_read_db), chat_id: int, current_user: User = Depends(deps.get_current_active_user)) -> Any:
     """获取特定聊天记录的详细信息"""
-    chat_log = db.query(ChatLog).filter(ChatLog.id == chat_id, ChatLog.user_id == current_user.id).first()
+    result = await db.execute(select(ChatLog).where(ChatLog.id == chat_id, ChatLog.user_id == current_user.id))
+    chat_log = result.scalars().first()
     if not chat_log:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -46,16 +566,24 @@ def get_chat_detail(*, db: Session = Depends(deps.get_db), chat_id: int, current
     return chat_log
 
 @router.delete("/history/{chat_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_chat(*, db: Session = Depends(deps.get_db), chat_id: int, current_user: User = Depends(deps.get_current_active_user)) -> Any:
+async def delete_chat(*, db: AsyncSession = Depends(deps.get_db), chat_id: int, current_user: User = Depends(deps.get_current_active_user), conversation_context: Optional[ConversationContext] = Depends(deps.get_conversation_context)) -> Any:
     """删除特定的聊天记录"""
-    chat_log = db.query(ChatLog).filter(ChatLog.id == chat_id, ChatLog.user_id == current_user.id).first()
+    result = await db.execute(select(ChatLog).where(ChatLog.id == chat_id, ChatLog.user_id == current_user.id))
+    chat_log = result.scalars().first()
     if not chat_log:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="聊天记录不存在或无权访问"
         )
     
-    db.delete(chat_log)
-    db.commit()
+    await db.delete(chat_log)
+    log = Log(user_id=current_user.id, action="chat_delete")
+    db.add(log)
+    await increment_chat_count(db, current_user.id, -1)
+    # 每日统计记录的是用户的活动，删除记录不会减少当天的消息数
+    await record_rows(db, [log])
+    await db.commit()
+    if conversation_context is not None:
+        await conversation_context.invalidate(current_user.id)
     
     return None
\ No newline at end of file
@@ -1,63 +1,353 @@
-from typing import Generator
-from fastapi import Depends, HTTPException, status
+from typing import AsyncGenerator, Callable, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from sqlalchemy.orm import Session
-from sqlmodel import Session, create_engine
+from jose.exceptions import JWTError
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.config import settings
-from app.core.security import pwd_context
+from app.core import db as database
+from app.core.config import add_reload_listener, settings
+from app.core.redis import get_redis
+from app.core import security
+from app.core.hashing import PasswordHasher
+from app.core.lifecycle import StreamDrainer
+from app.core.reload import SettingsReloader
+from app.core.replica import RecentWriters, ReplicaRouter
 from app.models.models import User
+from app.services.batching import BatchingTextGenAPI
+from app.services.context import ConversationContext
+from app.services.navigation_cache import NavigationCache
+from app.services.push import PushHub
+from app.services.rate_limit import AdmissionController, RateLimiter, parse_limit, retry_after_header
+from app.services.response_cache import ResponseCache
+from app.services.text_gen import AsyncTextGenAPI
+from app.services.user_cache import UserCache
+from app.services.write_behind import WriteBehindQueue
 
-# 创建数据库引擎
-engine = create_engine(settings.DATABASE_URI)
+# 文本生成服务客户端
+text_gen_api = AsyncTextGenAPI(
+    base_url=settings.TEXT_GEN_API_URL,
+    timeout=settings.TEXT_GEN_TIMEOUT,
+    max_retries=settings.TEXT_GEN_MAX_RETRIES,
+    max_concurrency=settings.TEXT_GEN_MAX_CONCURRENCY,
+    max_connections=settings.TEXT_GEN_POOL_SIZE
+)
+if settings.TEXT_GEN_BATCHING:
+    text_gen_api = BatchingTextGenAPI(
+        text_gen_api,
+        max_batch_size=settings.TEXT_GEN_BATCH_SIZE,
+        max_wait=settings.TEXT_GEN_BATCH_MAX_WAIT_MS / 1000
+    )
+
+# 聊天回复缓存
+response_cache = None
+if settings.RESPONSE_CACHE_ENABLED:
+    response_cache = ResponseCache(
+        max_size=settings.RESPONSE_CACHE_MAX_SIZE,
+        ttl=settings.RESPONSE_CACHE_TTL,
+        redis_client=get_redis() if settings.RESPONSE_CACHE_USE_REDIS else None,
+        similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY
+    )
+
+# 对话上下文窗口
+conversation_context = None
+if settings.CHAT_CONTEXT_ENABLED:
+    conversation_context = ConversationContext(
+        max_turns=settings.CHAT_CONTEXT_MAX_TURNS,
+        token_budget=settings.CHAT_CONTEXT_TOKEN_BUDGET,
+        ttl=settings.CHAT_CONTEXT_TTL,
+        redis_client=get_redis() if settings.chat_context_use_redis else None
+    )
+
+# 当前用户缓存，避免每个请求都查询 users 表
+user_cache = None
+if settings.USER_CACHE_ENABLED:
+    user_cache = UserCache(
+        ttl=settings.USER_CACHE_TTL,
+        max_size=settings.USER_CACHE_MAX_SIZE,
+        redis_client=get_redis() if settings.USER_CACHE_USE_REDIS else None
+    )
+
+# 聊天记录和审计日志的批量写入队列
+write_queue = None
+if settings.WRITE_BEHIND_ENABLED:
+    write_queue = WriteBehindQueue(
+        database.session_scope,
+        max_batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+        flush_interval=settings.WRITE_BEHIND_FLUSH_MS / 1000,
+        max_queue_size=settings.WRITE_BEHIND_QUEUE_SIZE,
+        put_timeout=settings.WRITE_BEHIND_PUT_TIMEOUT,
+        max_retries=settings.WRITE_BEHIND_MAX_RETRIES
+    )
+
+# 密码哈希进程池；各 worker 自行校准会得到不同的 cost，导致哈希在不同 worker 登录时反复重写
+if settings.PASSWORD_HASH_TARGET_MS > 0 and settings.multi_worker:
+    raise RuntimeError(
+        "多 worker 部署需通过 app.server 或 gunicorn.conf.py 启动以统一校准 bcrypt cost，"
+        "或将 PASSWORD_HASH_TARGET_MS 设为 0 并使用固定的 PASSWORD_BCRYPT_ROUNDS"
+    )
+password_hasher = PasswordHasher(
+    rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    target_ms=settings.PASSWORD_HASH_TARGET_MS,
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING
+)
+
+# 导航内容读缓存
+navigation_cache = NavigationCache(
+    ttl=settings.NAVIGATION_CACHE_TTL,
+    max_size=settings.NAVIGATION_CACHE_MAX_SIZE,
+    redis_client=get_redis() if settings.NAVIGATION_CACHE_USE_REDIS else None
+)
+
+# 按用户和IP的限流器
+rate_limiter = RateLimiter(redis_client=get_redis() if settings.RATE_LIMIT_USE_REDIS else None)
+
+# 文本生成的全局准入控制
+admission_controller = AdmissionController(max_inflight=settings.TEXT_GEN_MAX_QUEUE_DEPTH)
+
+# 停机时等待进行中的流式回复
+stream_drainer = StreamDrainer(timeout=settings.SHUTDOWN_DRAIN_TIMEOUT)
+
+# 向在线用户的 WebSocket 连接推送消息
+push_hub = PushHub(redis_client=get_redis() if settings.WS_PUSH_USE_REDIS else None)
+
+# 收到 SIGHUP 或 Redis 通知时热更新配置
+settings_reloader = SettingsReloader(redis_client=get_redis() if settings.SETTINGS_RELOAD_USE_REDIS else None)
+
+# 只读副本，未配置时只读接口也使用主库
+replica_router = None
+if settings.DATABASE_REPLICA_URIS:
+    replica_router = ReplicaRouter(
+        settings.DATABASE_REPLICA_URIS,
+        max_lag=settings.DB_REPLICA_MAX_LAG,
+        check_interval=settings.DB_REPLICA_CHECK_INTERVAL
+    )
+
+# 最近写入过数据的用户，其只读请求在一段时间内仍使用主库
+recent_writers = RecentWriters(
+    window=settings.DB_READ_YOUR_WRITES_SECONDS,
+    redis_client=get_redis() if settings.DB_READ_YOUR_WRITES_USE_REDIS else None
+)
+
+
+def apply_settings() -> None:
+    """把热更新后的配置应用到启动时已创建的对象上；按请求读取 settings 的配置项（限流规则等）无需处理"""
+    backend = getattr(text_gen_api, "backend", text_gen_api)
+    backend.timeout = settings.TEXT_GEN_TIMEOUT
+    backend.max_retries = settings.TEXT_GEN_MAX_RETRIES
+    if isinstance(text_gen_api, BatchingTextGenAPI):
+        text_gen_api.max_batch_size = settings.TEXT_GEN_BATCH_SIZE
+        text_gen_api.max_wait = settings.TEXT_GEN_BATCH_MAX_WAIT_MS / 1000
+    admission_controller.max_inflight = settings.TEXT_GEN_MAX_QUEUE_DEPTH
+    stream_drainer.timeout = settings.SHUTDOWN_DRAIN_TIMEOUT
+    # 已缓存的条目按原有的过期时间失效，新的 ttl 只影响之后写入的条目
+    if response_cache is not None:
+        response_cache.ttl = response_cache.local.ttl = settings.RESPONSE_CACHE_TTL
+        response_cache.similarity_threshold = settings.RESPONSE_CACHE_SIMILARITY
+    if conversation_context is not None:
+        conversation_context.max_turns = settings.CHAT_CONTEXT_MAX_TURNS
+        conversation_context.token_budget = settings.CHAT_CONTEXT_TOKEN_BUDGET
+        conversation_context.ttl = settings.CHAT_CONTEXT_TTL
+    if user_cache is not None:
+        user_cache.ttl = user_cache.local.ttl = settings.USER_CACHE_TTL
+    navigation_cache.ttl = navigation_cache.local.ttl = settings.NAVIGATION_CACHE_TTL
+    if replica_router is not None:
+        replica_router.max_lag = settings.DB_REPLICA_MAX_LAG
+    recent_writers.window = recent_writers.local.ttl = settings.DB_READ_YOUR_WRITES_SECONDS
+
+
+add_reload_listener(apply_settings)
 
 # OAuth2 token URL
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
 
-def get_db() -> Generator:
-    """获取数据库会话"""
-    with Session(engine) as session:
+# 不修改数据的请求方法
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+async def get_db(request: Request) -> AsyncGenerator:
+    """获取主库会话；同步模式下返回包装后的同步会话，接口与 AsyncSession 一致
+
+    其他请求方法视为写入，请求开始和结束时都记录该用户，使其随后的只读请求在一段时间内也使用主库。
+    """
+    user_id = None if request.method in SAFE_METHODS else _token_user_id(request)
+    if user_id is not None:
+        await recent_writers.mark(user_id)
+    async with database.session_scope() as session:
         yield session
+    if user_id is not None:
+        await recent_writers.mark(user_id)
 
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
-    """获取当前用户"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="无法验证凭据",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
+async def get_read_db(request: Request, db: AsyncSession = Depends(get_db)) -> AsyncGenerator:
+    """获取只读接口使用的数据库会话：优先使用健康且复制延迟在允许范围内的副本
+
+    没有可用副本、请求会修改数据或当前用户刚写入过数据时返回主库会话（与 get_db 为同一个）。
+    """
+    replica = replica_router.choose() if replica_router is not None else None
+    if replica is None or request.method not in SAFE_METHODS:
+        yield db
+        return
+    user_id = _token_user_id(request)
+    if user_id is not None and await recent_writers.contains(user_id):
+        yield db
+        return
+    async with replica.session_scope() as session:
+        yield session
+
+
+def get_session_factory() -> Callable:
+    """获取数据库会话工厂；WebSocket 等长连接按需打开短会话，而不是在整个连接期间占用一个"""
+    return database.session_scope
+
+
+def get_text_gen_api() -> AsyncTextGenAPI:
+    """获取文本生成服务客户端"""
+    return text_gen_api
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """获取聊天回复缓存，未启用时返回 None"""
+    return response_cache
+
+
+def get_conversation_context() -> Optional[ConversationContext]:
+    """获取对话上下文窗口，未启用时返回 None"""
+    return conversation_context
+
+
+def get_write_queue() -> Optional[WriteBehindQueue]:
+    """获取批量写入队列，未启用时返回 None"""
+    return write_queue
+
+
+def get_stream_drainer() -> StreamDrainer:
+    """获取流式回复的停机跟踪器"""
+    return stream_drainer
+
+
+def get_push_hub() -> PushHub:
+    """获取在线用户推送中心"""
+    return push_hub
+
+
+def get_password_hasher() -> PasswordHasher:
+    """获取密码哈希执行器"""
+    return password_hasher
+
+
+def get_navigation_cache() -> NavigationCache:
+    """获取导航内容缓存"""
+    return navigation_cache
+
+
+def get_admission_controller() -> AdmissionController:
+    """获取文本生成的准入控制器"""
+    return admission_controller
+
+
+def _client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _token_user_id(request: Request) -> Optional[int]:
+    """从 Authorization 头取出用户ID，不查询数据库；token 无效时返回 None"""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        user_id: int = int(payload.get("sub"))
-        if user_id is None:
-            raise credentials_exception
+        return security.decode_access_token(token)
     except JWTError:
-        raise credentials_exception
-        
-    user = db.query(User).filter(User.id == user_id).first()
+        return None
+
+
+class RateLimit:
+    """按路由限流的依赖，规则取自 settings.RATE_LIMITS
+
+    在路由的 dependencies 中使用，先于身份验证执行：携带有效 token 的请求按用户ID计数，
+    同时按客户端IP计数，任一维度超限即返回 429。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def __call__(self, request: Request) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        buckets = []
+        user_limit = settings.RATE_LIMITS.get(self.name)
+        if user_limit:
+            user_id = _token_user_id(request)
+            if user_id is not None:
+                buckets.append((f"{self.name}:user:{user_id}", *parse_limit(user_limit)))
+        ip_limit = settings.RATE_LIMITS.get(f"{self.name}:ip")
+        if ip_limit:
+            buckets.append((f"{self.name}:ip:{_client_ip(request)}", *parse_limit(ip_limit)))
+
+        allowed, retry_after = await rate_limiter.check(buckets)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="请求过于频繁，请稍后重试",
+                headers=retry_after_header(retry_after)
+            )
+
+    async def check_user(self, user_id: int) -> Tuple[bool, float]:
+        """只按用户计数，供不经过 HTTP 请求的 WebSocket 消息使用；返回 (是否允许, 需等待的秒数)"""
+        user_limit = settings.RATE_LIMITS.get(self.name)
+        if not settings.RATE_LIMIT_ENABLED or not user_limit:
+            return True, 0.0
+        return await rate_limiter.check([(f"{self.name}:user:{user_id}", *parse_limit(user_limit))])
+
+
+async def authenticate_token(db: AsyncSession, token: str) -> Optional[User]:
+    """验证 token 并返回对应的用户，token 无效或用户不存在时返回 None"""
+    try:
+        user_id = security.decode_access_token(token)
+    except JWTError:
+        return None
+    if user_cache is not None:
+        return await user_cache.get(db, user_id)
+    return await db.get(User, user_id)
+
+
+async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
+    """获取当前用户"""
+    user = await authenticate_token(db, token)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无法验证凭据",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """获取当前活跃用户"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="用户未激活")
     return current_user
 
 
-def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
     """获取当前管理员用户"""
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
             detail="权限不足"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+def __getattr__(name: str):
+    # 同步数据库引擎（保留原有的导入路径 deps.engine），首次访问时才创建
+    if name == "engine":
+        return database.get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,16 @@
+from typing import Any
+from fastapi import APIRouter, Depends
+
+from app.api import deps
+from app.core import db
+from app.models.models import User
+
+router = APIRouter()
+
+@router.get("/db/pool")
+async def get_db_pool_status(current_user: User = Depends(deps.get_current_admin_user)) -> Any:
+    """获取数据库连接池的实时统计（已借出连接数、溢出连接数、等待时间分布），以及只读副本的健康状态和复制延迟"""
+    status = db.pool_status()
+    if deps.replica_router is not None:
+        status["replicas"] = deps.replica_router.status()
+    return status
@@ -1,15 +1,35 @@
 from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.api import deps
-from app.models.models import User, Navigation
-from app.schemas.navigation import NavigationCreate, NavigationResponse, NavigationUpdate
+from app.core.responses import ORJSONResponse, objects_to_dicts, response_fields, rows_to_dicts
+from app.models.models import User, Navigation, RecommendationScore
+from app.schemas.navigation import NavigationCreate, NavigationResponse, NavigationSearchResult, NavigationUpdate, RecommendedNavigation
+from app.services.navigation_cache import CachedBody, NavigationCache
+from app.services.search import search_navigations
 
 router = APIRouter()
 
+# 列表接口只查询响应需要的列并直接编码为 JSON，不逐行构造 ORM 对象和 Pydantic 模型
+NAVIGATION_COLUMNS = [getattr(Navigation, name) for name in response_fields(NavigationResponse)]
+
+
+async def load_navigation_list(db: AsyncSession, navigation_cache: NavigationCache, skip: int = 0, limit: int = 100) -> CachedBody:
+    """从缓存读取导航列表，未命中时查询并写入缓存（启动预热也使用）"""
+    key = ("list", skip, limit)
+    cached = navigation_cache.get(key)
+    if cached is None:
+        generation = navigation_cache.generation
+        result = await db.execute(select(*NAVIGATION_COLUMNS).offset(skip).limit(limit))
+        content = rows_to_dicts(NavigationResponse, result.all())
+        cached = navigation_cache.set(key, content, generation)
+    return cached
+
+
 @router.post("/", response_model=NavigationResponse)
-def create_navigation(*, db: Session = Depends(deps.get_db), navigation_in: NavigationCreate, current_user: User = Depends(deps.get_current_active_user)) -> Any:
+async def create_navigation(*, db: AsyncSession = Depends(deps.get_db), navigation_in: NavigationCreate, current_user: User = Depends(deps.get_current_active_user), navigation_cache: NavigationCache = Depends(deps.get_navigation_cache)) -> Any:
     """创建导航内容"""
     navigation = Navigation(
         title=navigation_in.title,
@@ -19,32 +39,66 @@ def create_navigation(*, db: Session = Depends(deps.get_db), navigation_in: Navi
     )
     
     db.add(navigation)
-    db.commit()
-    db.refresh(navigation)
+    await db.commit()
+    await db.refresh(navigation)
+    await navigation_cache.invalidate()
     
     return navigation
 
+# 列表和详情的结果会写入缓存，从主库加载，避免把副本上的旧数据缓存到下一次失效之前
 @router.get("/", response_model=List[NavigationResponse])
-def get_navigations(*, db: Session = Depends(deps.get_db), skip: int = 0, limit: int = 100) -> Any:
-    """获取所有导航内容"""
-    navigations = db.query(Navigation).offset(skip).limit(limit).all()
-    return navigations
+async def get_navigations(*, db: AsyncSession = Depends(deps.get_db), request: Request, skip: int = 0, limit: int = 100, navigation_cache: NavigationCache = Depends(deps.get_navigation_cache)) -> Any:
+    """获取所有导航内容（带 ETag/Last-Modified，支持条件请求）"""
+    cached = await load_navigation_list(db, navigation_cache, skip, limit)
+    return navigation_cache.respond(request, cached)
 
-@router.get("/{navigation_id}", response_model=NavigationResponse)
-def get_navigation(*, db: Session = Depends(deps.get_db), navigation_id: int) -> Any:
-    """获取特定导航内容的详细信息"""
-    navigation = db.query(Navigation).filter(Navigation.id == navigation_id).first()
-    if not navigation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="导航内容不存在"
+@router.get("/recommended", response_model=List[RecommendedNavigation])
+async def get_recommended_navigations(*, db: AsyncSession = Depends(deps.get_read_db), current_user: User = Depends(deps.get_current_active_user), limit: int = Query(10, ge=1, le=50)) -> Any:
+    """获取离线任务为当前用户计算好的推荐内容；还没有个性化结果时返回全站热门"""
+    for condition in (RecommendationScore.user_id == current_user.id, RecommendationScore.user_id.is_(None)):
+        result = await db.execute(
+            select(*NAVIGATION_COLUMNS, RecommendationScore.score)
+            .join(RecommendationScore, RecommendationScore.content_id == Navigation.id)
+            .where(condition)
+            .order_by(RecommendationScore.rank)
+            .limit(limit)
         )
-    return navigation
+        rows = result.all()
+        if rows:
+            return ORJSONResponse(rows_to_dicts(RecommendedNavigation, rows))
+    return ORJSONResponse([])
+
+@router.get("/search", response_model=NavigationSearchResult)
+async def search_navigation(*, db: AsyncSession = Depends(deps.get_read_db), q: str = Query(..., min_length=1, max_length=200), offset: int = Query(0, ge=0, le=1000), limit: int = Query(20, ge=1, le=100)) -> Any:
+    """按标题和描述全文检索导航内容，按相关度排序"""
+    hits = await search_navigations(db, q, offset=offset, limit=limit + 1)
+    next_offset = offset + limit if len(hits) > limit else None
+    hits = hits[:limit]
+    results = objects_to_dicts(NavigationResponse, (navigation for navigation, _ in hits))
+    for result, (_, score) in zip(results, hits):
+        result["score"] = float(score)
+    return ORJSONResponse({"results": results, "next_offset": next_offset})
+
+@router.get("/{navigation_id}", response_model=NavigationResponse)
+async def get_navigation(*, db: AsyncSession = Depends(deps.get_db), request: Request, navigation_id: int, navigation_cache: NavigationCache = Depends(deps.get_navigation_cache)) -> Any:
+    """获取特定导航内容的详细信息（带 ETag/Last-Modified，支持条件请求）"""
+    key = ("item", navigation_id)
+    cached = navigation_cache.get(key)
+    if cached is None:
+        generation = navigation_cache.generation
+        navigation = await db.get(Navigation, navigation_id)
+        if not navigation:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="导航内容不存在"
+            )
+        cached = navigation_cache.set(key, NavigationResponse.from_orm(navigation).dict(), generation)
+    return navigation_cache.respond(request, cached)
 
 @router.put("/{navigation_id}", response_model=NavigationResponse)
-def update_navigation(*, db: Session = Depends(deps.get_db), navigation_id: int, navigation_in: NavigationUpdate, current_user: User = Depends(deps.get_current_active_user)) -> Any:
+async def update_navigation(*, db: AsyncSession = Depends(deps.get_db), navigation_id: int, navigation_in: NavigationUpdate, current_user: User = Depends(deps.get_current_active_user), navigation_cache: NavigationCache = Depends(deps.get_navigation_cache)) -> Any:
     """更新导航内容"""
-    navigation = db.query(Navigation).filter(Navigation.id == navigation_id).first()
+    navigation = await db.get(Navigation, navigation_id)
     if not navigation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -67,15 +121,16 @@ def update_navigation(*, db: Session = Depends(deps.get_db), navigation_id: int,
         navigation.url = navigation_in.url
     
     db.add(navigation)
-    db.commit()
-    db.refresh(navigation)
+    await db.commit()
+    await db.refresh(navigation)
+    await navigation_cache.invalidate()
     
     return navigation
 
 @router.delete("/{navigation_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_navigation(*, db: Session = Depends(deps.get_db), navigation_id: int, current_user: User = Depends(deps.get_current_active_user)) -> Any:
+async def delete_navigation(*, db: AsyncSession = Depends(deps.get_db), navigation_id: int, current_user: User = Depends(deps.get_current_active_user), navigation_cache: NavigationCache = Depends(deps.get_navigation_cache)) -> Any:
     """删除导航内容"""
-    navigation = db.query(Navigation).filter(Navigation.id == navigation_id).first()
+    navigation = await db.get(Navigation, navigation_id)
     if not navigation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -89,7 +144,8 @@ def delete_navigation(*, db: Session = Depends(deps.get_db), navigation_id: int,
             detail="权限不足"
         )
     
-    db.delete(navigation)
-    db.commit()
+    await db.delete(navigation)
+    await db.commit()
+    await navigation_cache.invalidate()
     
     return None
\ No newline at end of file
@@ -1,45 +1,77 @@
 from datetime import timedelta
-from typing import Any
+from typing import Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app import schemas
 from app.core import security
 from app.core.config import settings
+from app.core.hashing import PasswordHasher, PasswordHasherBusy
 from app.models.models import User
 from app.api import deps
+from app.services.write_behind import WriteBehindQueue, record_action
 
 router = APIRouter()
 
-@router.post("/register", response_model=schemas.UserResponse)
-def register(*, db: Session = Depends(deps.get_db), user_in: schemas.UserCreate) -> Any:
+
+async def _hash_or_503(coroutine):
+    """等待密码哈希结果；哈希任务积压时返回 503，而不是让请求无限排队"""
+    try:
+        return await coroutine
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务繁忙，请稍后重试",
+            headers={"Retry-After": "1"}
+        )
+
+
+@router.post("/register", response_model=schemas.UserResponse, dependencies=[Depends(deps.RateLimit("register"))])
+async def register(*, db: AsyncSession = Depends(deps.get_db), user_in: schemas.UserCreate, password_hasher: PasswordHasher = Depends(deps.get_password_hasher)) -> Any:
     """用户注册"""
-    user = db.query(User).filter(User.email == user_in.email).first()
+    result = await db.execute(select(User).where(User.email == user_in.email))
+    user = result.scalars().first()
     if user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="该邮箱已被注册"
         )
     
+    # bcrypt 计算耗时较长，在独立的进程池中执行以免阻塞事件循环
+    password_hash = await _hash_or_503(password_hasher.hash(user_in.password))
     user = User(
         email=user_in.email,
         username=user_in.username,
-        password_hash=security.get_password_hash(user_in.password)
+        password_hash=password_hash
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
-@router.post("/login", response_model=schemas.Token)
-def login(*, db: Session = Depends(deps.get_db), user_in: schemas.UserLogin) -> Any:
+@router.post("/login", response_model=schemas.Token, dependencies=[Depends(deps.RateLimit("login"))])
+async def login(*, db: AsyncSession = Depends(deps.get_db), user_in: schemas.UserLogin, write_queue: Optional[WriteBehindQueue] = Depends(deps.get_write_queue), password_hasher: PasswordHasher = Depends(deps.get_password_hasher)) -> Any:
     """用户登录"""
-    user = db.query(User).filter(User.email == user_in.email).first()
-    if not user or not security.verify_password(user_in.password, user.password_hash):
+    result = await db.execute(select(User).where(User.email == user_in.email))
+    user = result.scalars().first()
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await _hash_or_503(password_hasher.verify(user_in.password, user.password_hash))
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="邮箱或密码错误"
         )
     
+    if new_hash is not None:
+        # bcrypt cost 已调整，用本次登录的明文按新 cost 重新哈希
+        user.password_hash = new_hash
+        db.add(user)
+        await db.commit()
+        if deps.user_cache is not None:
+            await deps.user_cache.invalidate(user.id)
+    
+    await record_action(db, write_queue, user.id, "login")
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
         user.id, expires_delta=access_token_expires
@@ -47,21 +79,27 @@ def login(*, db: Session = Depends(deps.get_db), user_in: schemas.UserLogin) ->
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.put("/me", response_model=schemas.UserResponse)
-def update_user_me(*, db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user), user_in: schemas.UserUpdate) -> Any:
+async def update_user_me(*, db: AsyncSession = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user), user_in: schemas.UserUpdate, password_hasher: PasswordHasher = Depends(deps.get_password_hasher)) -> Any:
     """更新当前用户信息"""
+    # current_user 可能来自用户缓存，修改前从数据库重新加载
+    current_user = await db.get(User, current_user.id)
     if user_in.email is not None:
         current_user.email = user_in.email
     if user_in.username is not None:
         current_user.username = user_in.username
     if user_in.password is not None:
-        current_user.password_hash = security.get_password_hash(user_in.password)
+        current_user.password_hash = await _hash_or_503(password_hasher.hash(user_in.password))
+    if user_in.allow_response_cache is not None:
+        current_user.allow_response_cache = user_in.allow_response_cache
     
     db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
+    if deps.user_cache is not None:
+        await deps.user_cache.invalidate(current_user.id)
     return current_user
 
 @router.get("/me", response_model=schemas.UserResponse)
-def read_user_me(current_user: User = Depends(deps.get_current_user)) -> Any:
+async def read_user_me(current_user: User = Depends(deps.get_current_user)) -> Any:
     """获取当前用户信息"""
-    return current_user
\ No newline at end of file
+    return current_user
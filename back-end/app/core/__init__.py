@@ -1,18 +1,10 @@
-# 核心配置模块
-from typing import List
-from pydantic import BaseSettings
+# 核心模块；配置统一由 app.core.config 提供
 
-class Settings(BaseSettings):
-    API_V1_STR: str
-    PROJECT_NAME: str
-    BACKEND_CORS_ORIGINS: List[str]
-    DATABASE_URL: str
-    SECRET_KEY: str
-    ALGORITHM: str
-    ACCESS_TOKEN_EXPIRE_MINUTES: int
 
-    class Config:
-        case_sensitive = True
-        env_file = ".env"
+def __getattr__(name: str):
+    # 兼容 from app.core import settings，首次访问时才导入配置模块
+    if name == "settings":
+        from app.core.config import settings
 
-settings = Settings()
\ No newline at end of file
+        return settings
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,5 +1,12 @@
-from typing import List
-from pydantic import BaseSettings, AnyHttpUrl
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote_plus
+
+from pydantic import BaseSettings, AnyHttpUrl, validator
+
+logger = logging.getLogger(__name__)
+
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "PsyChat"
@@ -12,7 +19,31 @@ class Settings(BaseSettings):
     MYSQL_HOST: str = "localhost"
     MYSQL_PORT: str = "3306"
     MYSQL_DATABASE: str = "psychat"
-    DATABASE_URI: str = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
+    DATABASE_URI: str = ""  # 为空时由实际生效的 MYSQL_* 拼接
+    DATABASE_ASYNC: bool = True  # 关闭后请求改为在线程池中使用同步驱动访问数据库
+    ASYNC_DATABASE_URI: Optional[str] = None  # 为空时由 DATABASE_URI 推导（pymysql -> aiomysql）
+    
+    # 数据库连接池配置
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20  # 超出 DB_POOL_SIZE 后最多再临时创建的连接数
+    DB_POOL_TIMEOUT: float = 30.0  # 等待可用连接的最长时间（秒）
+    DB_POOL_RECYCLE: int = 1800  # 连接最长使用时间（秒），需小于 MySQL 的 wait_timeout
+    DB_POOL_PRE_PING: bool = True  # 取出连接前先检测是否可用
+    
+    # 只读副本配置
+    DATABASE_REPLICA_URIS: List[str] = []  # 只读副本的连接串（同步驱动），为空时所有请求使用主库
+    DB_REPLICA_MAX_LAG: float = 5.0  # 复制延迟超过该值（秒）的副本不再接收读请求
+    DB_REPLICA_CHECK_INTERVAL: float = 5.0  # 写入心跳并检查副本延迟的间隔（秒）
+    DB_READ_YOUR_WRITES_SECONDS: float = 10.0  # 用户写入数据后，其只读请求继续使用主库的时长（秒）
+    DB_READ_YOUR_WRITES_USE_REDIS: bool = False  # 多 worker 部署时应启用，使其他 worker 也知道用户刚写入过数据
+    
+    # 聊天记录/审计日志批量写入配置
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_BATCH_SIZE: int = 100  # 每个事务最多写入的行数
+    WRITE_BEHIND_FLUSH_MS: int = 10  # 攒批的最长等待时间（毫秒）
+    WRITE_BEHIND_QUEUE_SIZE: int = 10000  # 队列容量，满后新的写入会被拒绝
+    WRITE_BEHIND_PUT_TIMEOUT: float = 1.0  # 队列满时最多等待多久（秒）
+    WRITE_BEHIND_MAX_RETRIES: int = 2  # 批次写入失败后的重试次数，仍失败时丢弃该批次
     
     # Redis配置
     REDIS_HOST: str = "localhost"
@@ -20,9 +51,97 @@ class Settings(BaseSettings):
     REDIS_DB: int = 0
     REDIS_PASSWORD: str = ""
     
+    # 文本生成服务配置
+    TEXT_GEN_API_URL: str = "http://localhost:7860"
+    TEXT_GEN_MAX_LENGTH: int = 100
+    TEXT_GEN_TIMEOUT: float = 60.0  # 单次生成的整体截止时间（秒），包含重试
+    TEXT_GEN_MAX_RETRIES: int = 2
+    TEXT_GEN_MAX_CONCURRENCY: int = 8  # 同时发往生成服务的最大请求数
+    TEXT_GEN_POOL_SIZE: int = 16  # keep-alive 连接池大小
+    TEXT_GEN_BATCHING: bool = False  # 是否启用动态批处理
+    TEXT_GEN_BATCH_SIZE: int = 8  # 每批最多合并的提示词数
+    TEXT_GEN_BATCH_MAX_WAIT_MS: int = 5  # 凑批的最长等待时间（毫秒）
+    TEXT_GEN_MAX_QUEUE_DEPTH: int = 64  # 正在生成和排队等待生成的请求上限，超出时返回 503，0 表示不限制
+    
+    # 导航内容缓存配置
+    NAVIGATION_CACHE_TTL: int = 300  # 秒；漏收失效通知时数据陈旧的上限，0 表示不缓存
+    NAVIGATION_CACHE_MAX_SIZE: int = 1024
+    NAVIGATION_CACHE_USE_REDIS: bool = False  # 多 worker 部署时应启用，通过 pub/sub 同步失效
+    
+    # 推荐配置（离线任务 python -m app.services.recommendation 使用）
+    RECOMMENDATION_TOP_K: int = 20  # 每个用户保存的推荐条数
+    RECOMMENDATION_CHAT_WEIGHT: float = 0.3  # 聊天内容相似度在总分中的权重
+    RECOMMENDATION_HALF_LIFE_DAYS: float = 30.0  # 交互权重的半衰期
+    RECOMMENDATION_CHAT_HISTORY: int = 50  # 参与计算的最近聊天消息数
+    
+    # 限流配置
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_USE_REDIS: bool = False  # 多 worker 部署时应启用，使各 worker 共享计数
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # 部署在反向代理之后时按 X-Forwarded-For 识别客户端IP
+    # 按路由配置的令牌桶规则；"<路由>" 按登录用户计数，"<路由>:ip" 按客户端IP计数
+    RATE_LIMITS: Dict[str, str] = {
+        "chat_send": "30/minute",
+        "chat_send:ip": "120/minute",
+        "chat_stream": "30/minute",
+        "chat_stream:ip": "120/minute",
+        "login:ip": "20/minute",
+        "register:ip": "10/minute",
+    }
+    
+    # 回复缓存配置
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL: int = 3600  # 秒
+    RESPONSE_CACHE_MAX_SIZE: int = 1024  # 进程内缓存的最大条目数
+    RESPONSE_CACHE_USE_REDIS: bool = False  # 是否启用 Redis 二级缓存
+    RESPONSE_CACHE_SIMILARITY: float = 0.0  # 近似匹配的相似度阈值，0 表示只做精确匹配
+    
+    # 对话上下文配置
+    CHAT_CONTEXT_ENABLED: bool = True
+    CHAT_CONTEXT_MAX_TURNS: int = 10  # 滚动窗口保留的最大轮数
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 1024  # 拼接到提示词中的历史最多占用的 token 数
+    CHAT_CONTEXT_TTL: int = 3600  # 窗口在缓存中的保留时间（秒）
+    CHAT_CONTEXT_USE_REDIS: Optional[bool] = None  # 未设置时多 worker 部署自动启用，使各 worker 共享同一窗口
+    
     # 安全配置
     SECRET_KEY: str = "your-secret-key"
+    ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+    TOKEN_CACHE_TTL: int = 300  # JWT 验证结果的缓存时间（秒），不会超过 token 本身的有效期
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    
+    # 用户缓存配置
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_TTL: int = 60  # 秒；其他 worker 的进程内缓存最多滞后这么久
+    USER_CACHE_MAX_SIZE: int = 10000
+    USER_CACHE_USE_REDIS: bool = False
+    
+    # 密码哈希配置
+    PASSWORD_BCRYPT_ROUNDS: int = 12  # bcrypt cost，修改后旧哈希在用户下次登录时按新 cost 重新计算
+    PASSWORD_HASH_TARGET_MS: int = 0  # 大于 0 时按本机实测耗时自动选择 cost，覆盖 PASSWORD_BCRYPT_ROUNDS；多 worker 时由启动入口校准一次
+    PASSWORD_HASH_EXECUTOR: str = "process"  # process 或 thread
+    PASSWORD_HASH_WORKERS: int = 2  # 哈希进程/线程数
+    PASSWORD_HASH_MAX_PENDING: int = 64  # 同时提交的哈希任务上限，超出时返回 503
+    
+    # 监控指标配置
+    METRICS_ENABLED: bool = True  # 记录请求、SQL和文本生成指标，并开放 /metrics
+    METRICS_SLOW_REQUEST_MS: int = 0  # 超过该耗时（毫秒）的请求连同SQL明细写入日志，0 表示关闭
+    
+    # WebSocket 聊天配置
+    WS_HEARTBEAT_INTERVAL: float = 20.0  # 服务端发送 ping 的间隔（秒），超过两个间隔没有收到任何消息即断开
+    WS_AUTH_TIMEOUT: float = 10.0  # 未在 URL 中携带 token 时，等待首条 auth 消息的最长时间（秒）
+    WS_MAX_STREAMS: int = 4  # 每个连接同时进行的回复数
+    WS_SEND_QUEUE_SIZE: int = 256  # 每个连接的发送缓冲区（消息数），写满说明客户端读取过慢
+    WS_SEND_TIMEOUT: float = 10.0  # 发送缓冲区满时最多等待多久（秒），超时后断开连接
+    WS_PUSH_USE_REDIS: bool = False  # 多 worker 部署时应启用，通过 pub/sub 推送给连接在其他 worker 上的用户
+    
+    # 配置热更新（仅限 RELOADABLE_SETTINGS 中的配置项）
+    SETTINGS_RELOAD_USE_REDIS: bool = False  # 从 Redis 读取覆盖值，并订阅变更通知使所有 worker 同时生效
+    
+    # 进程与启停配置
+    WEB_CONCURRENCY: int = 0  # worker 进程数，0 表示按容器可用的CPU核数；由启动入口改写为实际的进程数
+    SHUTDOWN_DRAIN_TIMEOUT: float = 20.0  # 收到 SIGTERM 后等待流式回复完成的最长时间（秒），需小于 gunicorn 的 graceful_timeout
+    WARMUP_ENABLED: bool = True  # 启动时预先建立数据库和生成服务的连接、启动哈希进程、加载导航缓存
+    WARMUP_DB_CONNECTIONS: int = 2  # 每个 worker 启动时预先建立的数据库连接数
     
     # CORS配置
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
@@ -31,4 +150,76 @@ class Settings(BaseSettings):
         case_sensitive = True
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+    @validator("DATABASE_URI", pre=True, always=True)
+    def assemble_database_uri(cls, value: Optional[str], values: Dict[str, Any]) -> str:
+        # 在读取环境变量之后拼接，MYSQL_* 的覆盖值才会生效
+        if value:
+            return value
+        return (
+            f"mysql+pymysql://{quote_plus(values['MYSQL_USER'])}:{quote_plus(values['MYSQL_PASSWORD'])}"
+            f"@{values['MYSQL_HOST']}:{values['MYSQL_PORT']}/{values['MYSQL_DATABASE']}"
+        )
+
+    @property
+    def multi_worker(self) -> bool:
+        """是否以多个 worker 进程运行；直接用 uvicorn 启动、未经过 app.server 时视为单进程"""
+        return self.WEB_CONCURRENCY > 1
+
+    @property
+    def chat_context_use_redis(self) -> bool:
+        """对话窗口是否使用 Redis；未配置时多 worker 部署使用，进程内窗口看不到其他 worker 追加的对话"""
+        if self.CHAT_CONTEXT_USE_REDIS is None:
+            return self.multi_worker
+        return self.CHAT_CONTEXT_USE_REDIS
+
+
+# 可以在运行中修改的配置项；连接池、进程数、Redis 开关等结构性配置只在启动时读取
+RELOADABLE_SETTINGS = frozenset({
+    "RATE_LIMIT_ENABLED", "RATE_LIMITS",
+    "TEXT_GEN_MAX_LENGTH", "TEXT_GEN_TIMEOUT", "TEXT_GEN_MAX_RETRIES", "TEXT_GEN_BATCH_SIZE",
+    "TEXT_GEN_BATCH_MAX_WAIT_MS", "TEXT_GEN_MAX_QUEUE_DEPTH",
+    "RESPONSE_CACHE_TTL", "RESPONSE_CACHE_SIMILARITY",
+    "CHAT_CONTEXT_MAX_TURNS", "CHAT_CONTEXT_TOKEN_BUDGET", "CHAT_CONTEXT_TTL",
+    "USER_CACHE_TTL", "NAVIGATION_CACHE_TTL", "TOKEN_CACHE_TTL",
+    "WS_HEARTBEAT_INTERVAL", "WS_AUTH_TIMEOUT", "WS_MAX_STREAMS", "WS_SEND_TIMEOUT",
+    "SHUTDOWN_DRAIN_TIMEOUT", "DB_REPLICA_MAX_LAG", "DB_READ_YOUR_WRITES_SECONDS",
+})
+
+_reload_listeners: List[Callable[[], None]] = []
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    """进程内唯一的配置实例；热更新时原地修改，已导入的 settings 引用也能看到新值"""
+    return Settings()
+
+
+def add_reload_listener(callback: Callable[[], None]) -> None:
+    """配置热更新后调用 callback，用于把新值应用到启动时已创建的对象上"""
+    _reload_listeners.append(callback)
+
+
+def reload_settings(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Tuple[Any, Any]]:
+    """重新读取环境变量和 .env，按 overrides 覆盖后更新可热更新的配置项，返回 {名称: (旧值, 新值)}
+
+    overrides 中不可热更新的配置项会被忽略；新值校验失败时抛出 ValidationError，当前配置保持不变。
+    """
+    overrides = overrides or {}
+    ignored = set(overrides) - RELOADABLE_SETTINGS
+    if ignored:
+        logger.warning("以下配置项不支持热更新，已忽略: %s", ", ".join(sorted(ignored)))
+    fresh = Settings(**{name: value for name, value in overrides.items() if name in RELOADABLE_SETTINGS})
+    current = get_settings()
+    changed = {}
+    for name in RELOADABLE_SETTINGS:
+        old, new = getattr(current, name), getattr(fresh, name)
+        if old != new:
+            setattr(current, name, new)
+            changed[name] = (old, new)
+    if changed:
+        for callback in _reload_listeners:
+            callback()
+    return changed
+
+
+settings = get_settings()
\ No newline at end of file
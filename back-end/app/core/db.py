@@ -0,0 +1,176 @@
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.pool import PoolStats, pool_options
+
+# 同步驱动到异步驱动的映射
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_uri(uri: str) -> str:
+    """把同步数据库连接串转换为对应异步驱动的连接串"""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"不支持异步访问的数据库: {backend}")
+    return str(url.set(drivername=ASYNC_DRIVERS[backend]))
+
+
+# 连接池统计，引擎在首次使用时才创建（导入 app 时不加载数据库驱动）
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[sessionmaker] = None
+_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """同步引擎：同步模式下的请求、迁移和离线脚本使用"""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                engine = create_engine(settings.DATABASE_URI, **pool_options(settings.DATABASE_URI, QueuePool, sync_pool_stats))
+                metrics.instrument_engine(engine)
+                _engine = engine
+    return _engine
+
+
+def get_async_engine() -> Optional[AsyncEngine]:
+    """异步引擎：DATABASE_ASYNC 开启时请求处理使用，关闭时返回 None"""
+    global _async_engine, _async_session_factory
+    if _async_engine is None and settings.DATABASE_ASYNC:
+        with _lock:
+            if _async_engine is None:
+                async_database_uri = settings.ASYNC_DATABASE_URI or to_async_uri(settings.DATABASE_URI)
+                async_engine = create_async_engine(
+                    async_database_uri, **pool_options(async_database_uri, AsyncAdaptedQueuePool, async_pool_stats)
+                )
+                metrics.instrument_engine(async_engine.sync_engine)
+                # 异步会话中访问过期属性会触发隐式IO，因此提交后不过期对象
+                _async_session_factory = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+                _async_engine = async_engine
+    return _async_engine
+
+
+def __getattr__(name: str) -> Any:
+    # 兼容 db.engine / db.async_engine / db.async_session_factory 的访问方式
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    if name == "async_session_factory":
+        get_async_engine()
+        return _async_session_factory
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def dispose() -> None:
+    """释放已经创建的连接池"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[Any]:
+    """创建数据库会话；同步模式下返回接口与 AsyncSession 一致的 SyncSessionAdapter
+
+    两种模式都不在提交后使实例过期：同步模式下过期属性的延迟加载会在事件循环线程上执行SQL。
+    """
+    if get_async_engine() is not None:
+        async with _async_session_factory() as session:
+            yield session
+    else:
+        with Session(get_engine(), expire_on_commit=False) as session:
+            yield SyncSessionAdapter(session)
+
+
+def pool_status() -> Dict[str, Any]:
+    """返回各数据库引擎连接池的实时统计"""
+    status = {"sync": sync_pool_stats.snapshot(get_engine().pool)}
+    if get_async_engine() is not None:
+        status["async"] = async_pool_stats.snapshot(_async_engine.sync_engine.pool)
+    return status
+
+
+class SyncSessionAdapter:
+    """把同步 Session 包装成与 AsyncSession 相同的 await 接口
+
+    同步模式下路由仍然使用 await 访问数据库，实际的数据库调用在线程池中执行。
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance: Any) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances: Any) -> None:
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement: Any, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+
+    async def stream(self, statement: Any, *args: Any, **kwargs: Any) -> "SyncStreamResult":
+        """使用服务端游标执行查询，结果按批在线程池中读取"""
+        statement = statement.execution_options(stream_results=True)
+        result = await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+        return SyncStreamResult(result)
+
+    async def scalar(self, statement: Any, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def get(self, entity: Any, ident: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.get, entity, ident)
+
+    async def delete(self, instance: Any) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance: Any) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+
+class SyncStreamResult:
+    """SyncSessionAdapter.stream 的结果，提供与 AsyncResult.partitions 相同的接口"""
+
+    def __init__(self, result: Any):
+        self._result = result
+
+    async def partitions(self, size: Optional[int] = None) -> AsyncIterator[List[Any]]:
+        try:
+            while True:
+                rows = await run_in_threadpool(self._result.fetchmany, size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            await run_in_threadpool(self._result.close)
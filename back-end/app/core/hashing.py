@@ -0,0 +1,116 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+# 自动选择 bcrypt cost 时的上下限
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+@lru_cache(maxsize=None)
+def crypt_context(rounds: int) -> "CryptContext":
+    # passlib 首次哈希时才导入
+    from passlib.context import CryptContext
+
+    # cost 低于配置的哈希会被标记为需要更新，登录时透明重新哈希；cost 更高的哈希保持不变
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds
+    )
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return crypt_context(rounds).hash(password)
+
+
+def verify_and_update(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    """校验密码；存储的 cost 低于当前 cost 时返回重新计算的哈希，否则第二项为 None"""
+    return crypt_context(rounds).verify_and_update(password, hashed_password)
+
+
+def calibrate_rounds(target_ms: float, min_rounds: int = MIN_ROUNDS, max_rounds: int = MAX_ROUNDS) -> int:
+    """测量本机 bcrypt 耗时，选择单次哈希不超过目标耗时的最大 cost（cost 每加一耗时翻倍）"""
+    start = time.perf_counter()
+    hash_password("calibration", min_rounds)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if elapsed_ms <= 0:
+        return max_rounds
+    rounds = min_rounds + int(math.floor(math.log2(target_ms / elapsed_ms)))
+    return max(min_rounds, min(rounds, max_rounds))
+
+
+class PasswordHasherBusy(Exception):
+    """等待中的哈希任务已达上限"""
+
+
+class PasswordHasher:
+    """在独立的进程池中计算 bcrypt，事件循环和请求线程池不会被登录高峰占满
+
+    同时提交的任务数不超过 max_pending，超出时直接抛出 PasswordHasherBusy 由接口返回 503，
+    而不是无限排队。target_ms 大于 0 时首次使用前按本机实测耗时选择 cost，否则使用 rounds；
+    多 worker 部署由启动入口统一校准（见 app.server.configure_password_rounds），各 worker 使用相同的 rounds。
+    """
+
+    def __init__(self, rounds: int = 12, target_ms: float = 0, executor: str = "process",
+                 max_workers: int = 2, max_pending: int = 64):
+        self._rounds: Optional[int] = None if target_ms > 0 else rounds
+        self.target_ms = target_ms
+        self.executor_type = executor
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                # spawn 启动的子进程不继承父进程的线程和事件循环状态
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            raise PasswordHasherBusy()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def warmup(self) -> None:
+        """预先启动全部哈希进程，需要时同时完成 cost 校准"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, os.getpid) for _ in range(self.max_workers)))
+        await self.get_rounds()
+
+    async def get_rounds(self) -> int:
+        if self._rounds is None:
+            self._rounds = await self._run(calibrate_rounds, self.target_ms)
+        return self._rounds
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, await self.get_rounds())
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """校验密码，返回 (是否正确, 需要保存的新哈希或 None)"""
+        return await self._run(verify_and_update, password, hashed_password, await self.get_rounds())
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,23 @@
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """返回首次访问属性时才真正执行的模块，用于推迟导入只在部分请求中用到的重量级依赖
+
+    模块对象会放入 sys.modules，之后其他地方的 import 拿到的是同一个对象。
+    类型注解中引用惰性模块时应写成字符串，否则定义函数时就会触发导入。
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
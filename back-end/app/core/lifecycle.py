@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from contextlib import AsyncExitStack, ExitStack
+from typing import AsyncIterator, Callable, List, Optional, TypeVar
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.core import db
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class StreamInterrupted(Exception):
+    """停机期限已到，流式回复被提前结束"""
+
+
+class StreamDrainer:
+    """跟踪进行中的流式回复，进程收到 SIGTERM 后让它们在期限内完成
+
+    停机开始后新的流式请求应直接拒绝；进行中的流最多再运行 timeout 秒，之后停止读取生成结果并抛出
+    StreamInterrupted，由接口向客户端发送结束事件。timeout 应小于进程管理器强制结束 worker 的时间。
+    """
+
+    def __init__(self, timeout: float = 20.0):
+        self.timeout = timeout
+        self.draining = False
+        self.active = 0
+        self._expired: Optional[asyncio.Event] = None
+        self._listeners: List[Callable[[], None]] = []
+
+    @property
+    def expired(self) -> asyncio.Event:
+        # 延迟到事件循环中再创建，避免绑定到错误的事件循环
+        if self._expired is None:
+            self._expired = asyncio.Event()
+        return self._expired
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """停机开始时调用 callback，供 WebSocket 等长连接停止接收新消息"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def begin(self) -> None:
+        """开始停机；需在事件循环线程中调用"""
+        if self.draining:
+            return
+        self.draining = True
+        logger.info("开始停机，等待 %d 个流式回复完成（最多 %.0f 秒）", self.active, self.timeout)
+        asyncio.get_event_loop().call_later(self.timeout, self.expired.set)
+        for callback in list(self._listeners):
+            callback()
+
+    async def wait_idle(self) -> None:
+        """等待进行中的流式回复全部结束，最多等到停机期限"""
+        while self.active and not self.expired.is_set():
+            await asyncio.sleep(0.1)
+
+    async def stream(self, source: AsyncIterator[T]) -> AsyncIterator[T]:
+        """转发 source 产出的内容，停机期限到达时提前结束"""
+        expired = self.expired
+        if expired.is_set():
+            raise StreamInterrupted()
+        iterator = source.__aiter__()
+        waiter = asyncio.ensure_future(expired.wait())
+        step: Optional[asyncio.Future] = None
+        self.active += 1
+        try:
+            while True:
+                step = asyncio.ensure_future(iterator.__anext__())
+                await asyncio.wait((step, waiter), return_when=asyncio.FIRST_COMPLETED)
+                if not step.done():
+                    raise StreamInterrupted()
+                try:
+                    item = step.result()
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            self.active -= 1
+            waiter.cancel()
+            if step is not None and not step.done():
+                # 等待取消完成后 source 才能关闭
+                step.cancel()
+                await asyncio.wait((step,))
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+async def warm_database(connections: int) -> None:
+    """预先建立数据库连接放入连接池，首批请求不必等待建连"""
+    if connections <= 0:
+        return
+    async_engine = db.get_async_engine()
+    if async_engine is not None:
+        async with AsyncExitStack() as stack:
+            for _ in range(connections):
+                connection = await stack.enter_async_context(async_engine.connect())
+                await connection.execute(text("SELECT 1"))
+    else:
+        def connect() -> None:
+            with ExitStack() as stack:
+                for _ in range(connections):
+                    stack.enter_context(db.get_engine().connect()).execute(text("SELECT 1"))
+
+        await run_in_threadpool(connect)
@@ -0,0 +1,306 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Coroutine, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 耗时直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 单个请求执行SQL条数的桶上界
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """只增不减的计数器，按标签值分别计数"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram:
+    """按标签值分别统计的直方图，桶计数在输出时转换为 Prometheus 要求的累计值"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # 每组标签值对应 [各桶计数..., +Inf 桶计数, 观测次数, 观测值之和]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * (len(self.buckets) + 2) + [0.0]
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    data[i] += 1
+                    break
+            else:
+                data[len(self.buckets)] += 1
+            data[-2] += 1
+            data[-1] += value
+
+    def count(self, **labels: str) -> int:
+        data = self._values.get(tuple(str(labels[name]) for name in self.labelnames))
+        return data[-2] if data else 0
+
+    def sum(self, **labels: str) -> float:
+        data = self._values.get(tuple(str(labels[name]) for name in self.labelnames))
+        return data[-1] if data else 0.0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(data)) for key, data in self._values.items())
+        lines = []
+        names = self.labelnames + ("le",)
+        for key, data in items:
+            cumulative = 0
+            for upper, count in zip(self.buckets + ("+Inf",), data):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (str(upper),))} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_count{labels} {data[-2]}")
+            lines.append(f"{self.name}_sum{labels} {data[-1]}")
+        return lines
+
+
+class Registry:
+    """指标注册表，负责输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP请求处理耗时（秒），流式响应包含整个响应体",
+    ("method", "route", "status")
+)
+REQUEST_DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries", "单个HTTP请求执行的SQL条数", ("method", "route"), buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_DURATION = REGISTRY.histogram(
+    "http_request_db_duration_seconds", "单个HTTP请求内SQL执行的总耗时（秒）", ("method", "route")
+)
+TEXT_GEN_DURATION = REGISTRY.histogram(
+    "text_gen_request_duration_seconds", "调用文本生成服务的耗时（秒），包含重试", ("operation", "outcome")
+)
+TEXT_GEN_TOKENS = REGISTRY.counter(
+    "text_gen_tokens_total", "文本生成服务输出的 token 数", ("operation",)
+)
+WRITE_BEHIND_DROPPED_ROWS = REGISTRY.counter(
+    "write_behind_dropped_rows_total", "批量写入队列重试后仍写入失败而丢弃的行数", ("table",)
+)
+
+
+class RequestStats:
+    """单个请求内的SQL统计；trace 为 None 时不保留SQL明细"""
+
+    __slots__ = ("query_count", "query_seconds", "trace")
+
+    def __init__(self, trace: bool = False):
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.trace: Optional[List[Tuple[str, float]]] = [] if trace else None
+
+    def record_query(self, statement: str, seconds: float) -> None:
+        self.query_count += 1
+        self.query_seconds += seconds
+        if self.trace is not None:
+            self.trace.append((statement, seconds))
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def create_background_task(coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+    """在不属于任何请求的上下文中创建长期运行的后台任务
+
+    任务会复制创建时的上下文；在请求中直接 create_task 时，后台任务此后执行的SQL都会计入该请求的统计，
+    开启慢请求追踪时 trace 还会无限增长。
+    """
+    context = contextvars.copy_context()
+    context.run(_request_stats.set, None)
+    return context.run(asyncio.get_running_loop().create_task, coro)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request_stats.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    starts = conn.info.get("query_start_time")
+    if stats is None or not starts:
+        return
+    stats.record_query(statement, time.perf_counter() - starts.pop())
+
+
+def instrument_engine(engine: Engine) -> None:
+    """在引擎上挂载SQL计时钩子；异步引擎传入 async_engine.sync_engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class TextGenCall:
+    __slots__ = ("tokens",)
+
+    def __init__(self):
+        self.tokens = 0
+
+
+@contextmanager
+def observe_text_gen(operation: str) -> Iterator[TextGenCall]:
+    """记录一次文本生成调用的耗时、结果和输出 token 数"""
+    call = TextGenCall()
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield call
+        outcome = "ok"
+    except GeneratorExit:
+        # 流式生成被调用方提前关闭（如客户端断开）
+        outcome = "cancelled"
+        raise
+    finally:
+        TEXT_GEN_DURATION.observe(time.perf_counter() - start, operation=operation, outcome=outcome)
+        if call.tokens:
+            TEXT_GEN_TOKENS.inc(call.tokens, operation=operation)
+
+
+class MetricsMiddleware:
+    """记录每个请求的耗时、SQL条数和SQL耗时
+
+    路由标签使用路由模板（如 /api/chat/history/{chat_id}），未匹配的路径统一记为 unmatched，
+    避免标签基数随URL无限增长。slow_request_ms 大于 0 时，超过阈值的请求连同SQL明细写入日志。
+    """
+
+    def __init__(self, app, slow_request_ms: int = 0, trace_limit: int = 50):
+        self.app = app
+        self.slow_request_seconds = slow_request_ms / 1000
+        self.trace_limit = trace_limit
+        self._route_paths: Dict[object, str] = {}
+
+    def _route_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            for route in getattr(scope.get("app"), "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = self._route_paths[endpoint] = route.path
+                    break
+            else:
+                return "unmatched"
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(trace=self.slow_request_seconds > 0)
+        token = _request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            _request_stats.reset(token)
+            self._observe(scope, status_code, duration, stats)
+
+    def _observe(self, scope, status_code: int, duration: float, stats: RequestStats) -> None:
+        method, route = scope["method"], self._route_label(scope)
+        REQUEST_DURATION.observe(duration, method=method, route=route, status=str(status_code))
+        REQUEST_DB_QUERIES.observe(stats.query_count, method=method, route=route)
+        REQUEST_DB_DURATION.observe(stats.query_seconds, method=method, route=route)
+
+        if self.slow_request_seconds and duration >= self.slow_request_seconds:
+            trace = "\n".join(
+                f"  [{seconds * 1000:.1f}ms] {' '.join(statement.split())}"
+                for statement, seconds in stats.trace[:self.trace_limit]
+            )
+            logger.warning(
+                "慢请求 %s %s 状态码 %s 耗时 %.1fms，SQL %d 条共 %.1fms\n%s",
+                method, scope["path"], status_code, duration * 1000,
+                stats.query_count, stats.query_seconds * 1000, trace
+            )
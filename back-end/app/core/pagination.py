@@ -0,0 +1,23 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析"""
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """把最后一行的 (时间戳, ID) 编码为不透明的游标字符串"""
+    raw = json.dumps({"t": timestamp.isoformat(), "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["t"]), int(data["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(str(e))
@@ -0,0 +1,90 @@
+import threading
+import time
+from typing import Any, Dict, List, Type
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import Pool, QueuePool
+
+from app.core.config import settings
+
+# 获取连接等待时间直方图的桶上界（秒）
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolStats:
+    """记录连接池获取连接的等待时间直方图和超时次数"""
+
+    def __init__(self, buckets=WAIT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def observe_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_sum += seconds
+            for i, upper in enumerate(self.buckets):
+                if seconds <= upper:
+                    self.bucket_counts[i] += 1
+                    break
+            else:
+                self.bucket_counts[-1] += 1
+
+    def snapshot(self, pool: Pool) -> Dict[str, Any]:
+        """返回连接池当前状态和累计的等待时间分布（桶计数为累计值）"""
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for upper, count in zip(self.buckets + ("+Inf",), self.bucket_counts):
+                cumulative += count
+                buckets[str(upper)] = cumulative
+            wait = {"count": self.wait_count, "sum": self.wait_sum, "buckets": buckets}
+            timeouts = self.timeouts
+        if not isinstance(pool, QueuePool):
+            # SQLite 等使用的连接池没有容量的概念
+            return {"pool_class": type(pool).__name__, "status": pool.status()}
+        return {
+            "pool_class": type(pool).__name__,
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "timeouts": timeouts,
+            "wait_seconds": wait,
+        }
+
+
+def instrument_pool(pool_class: Type[Pool], stats: PoolStats) -> Type[Pool]:
+    """生成在获取连接时记录等待时间的连接池子类"""
+
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                with stats._lock:
+                    stats.timeouts += 1
+                raise
+            finally:
+                stats.observe_wait(time.perf_counter() - start)
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
+
+
+def pool_options(uri: str, pool_class: Type[Pool], stats: PoolStats) -> Dict[str, Any]:
+    """根据配置生成 create_engine 的连接池参数；SQLite 使用驱动默认的连接池"""
+    if make_url(uri).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": instrument_pool(pool_class, stats),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
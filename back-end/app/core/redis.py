@@ -0,0 +1,42 @@
+import logging
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.lazy import lazy_import
+
+redis = lazy_import("redis")
+
+logger = logging.getLogger(__name__)
+
+# Redis 不可用时，间隔多久再尝试重连（秒）
+RETRY_INTERVAL = 30.0
+
+_client: Optional["redis.Redis"] = None
+_next_retry = 0.0
+
+
+def get_redis() -> Optional["redis.Redis"]:
+    """获取 Redis 客户端；Redis 不可用时返回 None，调用方应退化为仅使用进程内缓存"""
+    global _client, _next_retry
+    if _client is not None:
+        return _client
+    if time.monotonic() < _next_retry:
+        return None
+
+    client = redis.Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD or None,
+        socket_timeout=1.0,
+        socket_connect_timeout=1.0
+    )
+    try:
+        client.ping()
+    except redis.RedisError as e:
+        logger.warning("Redis 不可用，%s 秒后重试: %s", RETRY_INTERVAL, e)
+        _next_retry = time.monotonic() + RETRY_INTERVAL
+        return None
+    _client = client
+    return _client
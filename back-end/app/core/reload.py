@@ -0,0 +1,168 @@
+"""配置热更新
+
+    kill -HUP <worker pid>                                           # 重新读取环境变量和 .env
+    python -m app.core.reload --set TEXT_GEN_MAX_LENGTH=200          # 写入 Redis 覆盖值并通知所有 worker
+    python -m app.core.reload --set RATE_LIMITS='{"chat_send": "10/minute"}'
+    python -m app.core.reload --unset TEXT_GEN_MAX_LENGTH
+    python -m app.core.reload --list
+
+只有 RELOADABLE_SETTINGS 中的配置项会被热更新，缓存内容和连接都会保留。
+Redis 方式需要 worker 启用 SETTINGS_RELOAD_USE_REDIS；gunicorn 主进程收到 SIGHUP 会重启全部 worker，
+因此信号应发给 worker 进程。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import signal
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import RELOADABLE_SETTINGS, Settings, reload_settings
+from app.core.lazy import lazy_import
+
+redis = lazy_import("redis")
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_KEY = "psychat:settings"
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _decode(value: Any) -> Any:
+    # 覆盖值以 JSON 保存，不是合法 JSON 的按原始字符串处理
+    value = _text(value)
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+class SettingsReloader:
+    """收到 SIGHUP 或 Redis 变更通知时重新加载配置
+
+    Redis 中的覆盖值保存在哈希 key 中，优先于环境变量；新启动的 worker 在启动时也会读取一次，
+    与已在运行的 worker 保持一致。
+    """
+
+    def __init__(self, redis_client: Optional["redis.Redis"] = None, key: str = SETTINGS_KEY, channel: str = SETTINGS_KEY):
+        self.redis = redis_client
+        self.key = key
+        self.channel = channel
+        self._overrides: Dict[str, Any] = {}
+        self._listener = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def fetch_overrides(self) -> Dict[str, Any]:
+        """读取 Redis 中的覆盖值；读取失败时沿用上一次的结果"""
+        if self.redis is not None:
+            try:
+                self._overrides = {_text(name): _decode(value) for name, value in self.redis.hgetall(self.key).items()}
+            except redis.RedisError as e:
+                logger.warning("读取配置覆盖值失败，沿用上一次的结果: %s", e)
+        return self._overrides
+
+    async def reload(self) -> Dict[str, Tuple[Any, Any]]:
+        """重新加载配置，新值校验失败时保持当前配置"""
+        overrides = await run_in_threadpool(self.fetch_overrides)
+        try:
+            changed = reload_settings(overrides)
+        except ValidationError as e:
+            logger.error("配置校验失败，保持当前配置: %s", e)
+            return {}
+        for name, (old, new) in changed.items():
+            logger.info("配置已更新 %s: %r -> %r", name, old, new)
+        return changed
+
+    def _schedule_reload(self) -> None:
+        asyncio.ensure_future(self.reload())
+
+    def _on_message(self, message: Any) -> None:
+        # 在订阅线程中调用，重新加载需要回到事件循环
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._schedule_reload)
+
+    def start(self) -> None:
+        """注册 SIGHUP 处理并订阅变更通知；需在事件循环中调用"""
+        self._loop = asyncio.get_event_loop()
+        try:
+            self._loop.add_signal_handler(signal.SIGHUP, self._schedule_reload)
+        except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+            # Windows 没有 SIGHUP；非主线程中无法注册信号处理
+            logger.info("未能注册 SIGHUP 处理，只能通过 Redis 热更新配置")
+        if self.redis is None or self._listener is not None:
+            return
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(**{self.channel: self._on_message})
+            self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except redis.RedisError as e:
+            logger.warning("订阅配置变更通知失败: %s", e)
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            try:
+                self._loop.remove_signal_handler(signal.SIGHUP)
+            except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+                pass
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="修改 Redis 中的配置覆盖值并通知所有 worker")
+    parser.add_argument("--set", action="append", default=[], metavar="名称=值", help="值按 JSON 解析，失败时作为字符串")
+    parser.add_argument("--unset", action="append", default=[], metavar="名称")
+    parser.add_argument("--list", action="store_true", help="列出当前的覆盖值")
+    args = parser.parse_args(argv)
+
+    from app.core.redis import get_redis
+
+    client = get_redis()
+    if client is None:
+        print("无法连接 Redis", file=sys.stderr)
+        return 1
+    updates = {}
+    for item in args.set:
+        name, sep, value = item.partition("=")
+        if not sep or name not in RELOADABLE_SETTINGS:
+            parser.error(f"{name} 不是可热更新的配置项")
+        updates[name] = value
+    for name in args.unset:
+        if name not in RELOADABLE_SETTINGS:
+            parser.error(f"{name} 不是可热更新的配置项")
+
+    if updates or args.unset:
+        current = {_text(name): _text(value) for name, value in client.hgetall(SETTINGS_KEY).items()}
+        current.update(updates)
+        for name in args.unset:
+            current.pop(name, None)
+        # 写入前先校验，避免把无效值推给所有 worker
+        try:
+            Settings(**{name: _decode(value) for name, value in current.items()})
+        except ValidationError as e:
+            print(e, file=sys.stderr)
+            return 1
+        pipe = client.pipeline()
+        if updates:
+            pipe.hset(SETTINGS_KEY, mapping=updates)
+        if args.unset:
+            pipe.hdel(SETTINGS_KEY, *args.unset)
+        pipe.publish(SETTINGS_KEY, "reload")
+        pipe.execute()
+
+    if args.list or not (updates or args.unset):
+        for name, value in sorted(client.hgetall(SETTINGS_KEY).items()):
+            print(f"{_text(name)}={_text(value)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
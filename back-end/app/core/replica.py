@@ -0,0 +1,203 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from sqlalchemy import select, update
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core import db, metrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.core.pool import PoolStats, pool_options
+from app.models.models import ReplicationHeartbeat
+
+redis = lazy_import("redis")
+
+logger = logging.getLogger(__name__)
+
+_heartbeat = ReplicationHeartbeat.__table__
+
+
+class Replica:
+    """一个只读副本：连接池在首次使用时创建，健康状态和复制延迟由 ReplicaRouter 定期更新"""
+
+    def __init__(self, uri: str):
+        self.uri = uri
+        self.name = make_url(uri).render_as_string(hide_password=True)
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.sync_pool_stats = PoolStats()
+        self.async_pool_stats = PoolStats()
+        self._engine: Optional[Engine] = None
+        self._async_engine: Optional[AsyncEngine] = None
+        self._session_factory: Optional[sessionmaker] = None
+
+    def get_engine(self) -> Engine:
+        if self._engine is None:
+            engine = create_engine(self.uri, **pool_options(self.uri, QueuePool, self.sync_pool_stats))
+            metrics.instrument_engine(engine)
+            self._engine = engine
+        return self._engine
+
+    def get_async_engine(self) -> Optional[AsyncEngine]:
+        if self._async_engine is None and settings.DATABASE_ASYNC:
+            async_uri = db.to_async_uri(self.uri)
+            async_engine = create_async_engine(async_uri, **pool_options(async_uri, AsyncAdaptedQueuePool, self.async_pool_stats))
+            metrics.instrument_engine(async_engine.sync_engine)
+            self._session_factory = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+            self._async_engine = async_engine
+        return self._async_engine
+
+    @asynccontextmanager
+    async def session_scope(self) -> AsyncIterator[Any]:
+        """创建副本上的会话，接口与 db.session_scope 相同"""
+        if self.get_async_engine() is not None:
+            async with self._session_factory() as session:
+                yield session
+        else:
+            with Session(self.get_engine(), expire_on_commit=False) as session:
+                yield db.SyncSessionAdapter(session)
+
+    def status(self) -> Dict[str, Any]:
+        status = {"name": self.name, "healthy": self.healthy, "lag": self.lag, "error": self.error, "checked_at": self.checked_at}
+        if self._engine is not None:
+            status["sync"] = self.sync_pool_stats.snapshot(self._engine.pool)
+        if self._async_engine is not None:
+            status["async"] = self.async_pool_stats.snapshot(self._async_engine.sync_engine.pool)
+        return status
+
+    async def dispose(self) -> None:
+        if self._async_engine is not None:
+            await self._async_engine.dispose()
+        if self._engine is not None:
+            self._engine.dispose()
+
+
+class ReplicaRouter:
+    """为只读请求选择副本
+
+    每隔 check_interval 秒在主库写入一次心跳时间，再读取各副本上的心跳：副本已有主库上一次的心跳时延迟记为 0，
+    否则为当前时间与副本心跳之差。连接失败或延迟超过 max_lag 的副本不会被选中，全部不可用时调用方回退到主库。
+    心跳由各 worker 的时钟写入，多台主机之间需要保持时钟同步。
+    """
+
+    def __init__(self, uris: Sequence[str], max_lag: float = 5.0, check_interval: float = 5.0,
+                 primary_engine: Optional[Engine] = None):
+        self.replicas: List[Replica] = [Replica(uri) for uri in uris]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._primary_engine = primary_engine
+        self._cycle = itertools.cycle(self.replicas)
+        self._task: Optional[asyncio.Task] = None
+
+    def choose(self) -> Optional[Replica]:
+        """轮流返回健康且延迟在允许范围内的副本，没有时返回 None"""
+        for _ in range(len(self.replicas)):
+            replica = next(self._cycle)
+            if replica.healthy and replica.lag is not None and replica.lag <= self.max_lag:
+                return replica
+        return None
+
+    def _write_heartbeat(self) -> Optional[float]:
+        """写入主库心跳，返回写入前主库上最新的心跳时间"""
+        engine = self._primary_engine or db.get_engine()
+        now = time.time()
+        with engine.begin() as connection:
+            previous = connection.execute(select(_heartbeat.c.beat_at).where(_heartbeat.c.id == 1)).scalar()
+            if previous is None:
+                connection.execute(_heartbeat.insert().values(id=1, beat_at=now))
+            else:
+                connection.execute(update(_heartbeat).where(_heartbeat.c.id == 1).values(beat_at=now))
+        return previous
+
+    def check(self) -> None:
+        """更新各副本的健康状态和复制延迟（阻塞调用）"""
+        try:
+            previous = self._write_heartbeat()
+        except Exception as e:
+            # 主库不可用时无法判断延迟，保留上一次的结果
+            logger.warning("写入复制心跳失败: %s", e)
+            return
+        for replica in self.replicas:
+            try:
+                with replica.get_engine().connect() as connection:
+                    beat_at = connection.execute(select(_heartbeat.c.beat_at).where(_heartbeat.c.id == 1)).scalar()
+            except Exception as e:
+                if replica.healthy:
+                    logger.warning("只读副本 %s 不可用: %s", replica.name, e)
+                replica.healthy, replica.lag, replica.error = False, None, str(e)
+            else:
+                if previous is None or (beat_at is not None and beat_at >= previous):
+                    lag = 0.0
+                else:
+                    lag = time.time() - beat_at if beat_at is not None else float("inf")
+                if lag > self.max_lag:
+                    logger.warning("只读副本 %s 复制延迟 %.1f 秒，读请求改用主库", replica.name, lag)
+                replica.healthy, replica.lag, replica.error = True, lag, None
+            replica.checked_at = time.time()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await run_in_threadpool(self.check)
+
+    async def start(self) -> None:
+        """先检查一次，使副本在接收请求前就可用，再在后台定期检查"""
+        await run_in_threadpool(self.check)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for replica in self.replicas:
+            await replica.dispose()
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [replica.status() for replica in self.replicas]
+
+
+class RecentWriters:
+    """记录最近写入过数据的用户，在 window 秒内这些用户的只读请求也使用主库，保证能读到自己刚写入的数据
+
+    多 worker 部署时应使用 Redis，否则用户的下一个请求落到其他 worker 上时仍可能读到副本上的旧数据。
+    """
+
+    def __init__(self, window: float = 10.0, max_size: int = 10000, redis_client: Optional["redis.Redis"] = None,
+                 key_prefix: str = "psychat:wrote:"):
+        self.window = window
+        self.local = TTLCache(max_size=max_size, ttl=window)
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+
+    async def mark(self, user_id: int) -> None:
+        self.local.set(user_id, True, ttl=self.window)
+        if self.redis is not None:
+            try:
+                await run_in_threadpool(self.redis.set, f"{self.key_prefix}{user_id}", 1, px=int(self.window * 1000))
+            except redis.RedisError as e:
+                logger.warning("记录用户写入时间失败: %s", e)
+
+    async def contains(self, user_id: int) -> bool:
+        if self.local.get(user_id):
+            return True
+        if self.redis is not None:
+            try:
+                return bool(await run_in_threadpool(self.redis.exists, f"{self.key_prefix}{user_id}"))
+            except redis.RedisError:
+                # 无法确认时使用主库
+                return True
+        return False
@@ -0,0 +1,41 @@
+from typing import Any, Iterable, List, Sequence, Type
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def dumps(content: Any) -> bytes:
+    """编码为 JSON 字节串，非字符串的字典键按 JSON 的惯例转换为字符串"""
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    """用 orjson 序列化的 JSON 响应，应用的默认响应类
+
+    输出与 JSONResponse 相同（UTF-8、无多余空白，datetime 为 isoformat），但快数倍；
+    datetime、date 等类型可以直接放进内容中，无需先经过 jsonable_encoder。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def response_fields(schema: Type[BaseModel]) -> Sequence[str]:
+    """响应模型的字段名，顺序与 schema.dict() 相同"""
+    return tuple(schema.__fields__)
+
+
+def rows_to_dicts(schema: Type[BaseModel], rows: Iterable[Sequence[Any]]) -> List[dict]:
+    """把按 response_fields(schema) 的顺序查询出的列元组转换为字典，不经过 Pydantic 校验
+
+    只用于列类型已与响应模型一致的查询结果，配合直接返回 ORJSONResponse 跳过 response_model 的逐行校验。
+    """
+    names = response_fields(schema)
+    return [dict(zip(names, row)) for row in rows]
+
+
+def objects_to_dicts(schema: Type[BaseModel], objects: Iterable[Any]) -> List[dict]:
+    """按响应模型的字段读取 ORM 对象的属性，相当于不做校验的 schema.from_orm(obj).dict()"""
+    names = response_fields(schema)
+    return [{name: getattr(obj, name) for name in names} for obj in objects]
@@ -1,10 +1,17 @@
+import time
 from datetime import datetime, timedelta
 from typing import Any, Union
-from jose import jwt
-from passlib.context import CryptContext
+from jose.exceptions import JWTError
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.hashing import crypt_context
+from app.core.lazy import lazy_import
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 签发和验证 token 时才导入（会加载加密后端）
+jwt = lazy_import("jose.jwt")
+
+# JWT 验证结果缓存：token -> 用户ID
+token_cache = TTLCache(max_size=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_TTL)
 
 def create_access_token(
     subject: Union[str, Any], expires_delta: timedelta = None
@@ -21,8 +28,30 @@ def create_access_token(
     )
     return encoded_jwt
 
+def decode_access_token(token: str) -> int:
+    """验证 JWT 并返回用户ID，验证失败时抛出 JWTError；结果在 token 过期前缓存"""
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
+    payload = jwt.decode(
+        token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+    )
+    try:
+        user_id = int(payload["sub"])
+    except (KeyError, TypeError, ValueError):
+        raise JWTError("无效的 token 主体")
+
+    ttl = settings.TOKEN_CACHE_TTL
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(token, user_id, ttl=ttl)
+    return user_id
+
+# 同步的密码哈希，供脚本和测试使用；接口中通过 PasswordHasher 在进程池中计算
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return crypt_context(settings.PASSWORD_BCRYPT_ROUNDS).verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return crypt_context(settings.PASSWORD_BCRYPT_ROUNDS).hash(password)
\ No newline at end of file
@@ -1,34 +1,137 @@
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 # 导入API路由模块
-from .api import users, chat, navigation
-
-app = FastAPI(
-    title="PsyChat API",
-    description="PsyChat backend API service",
-    version="0.1.0"
-)
-
-# 配置CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # 在生产环境中应该设置具体的源
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.get("/")
-async def root():
-    return {"message": "Welcome to PsyChat API"}
+from .api import users, chat, navigation, internal, admin, deps
+from .core import db, lifecycle, metrics
+from .core.config import settings
+from .core.responses import ORJSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+async def warmup() -> None:
+    """预先建立连接并加载缓存，使 worker 开始接收请求时不必在首批请求上付出冷启动开销；任何一步失败只记录日志"""
+    steps = (
+        ("数据库连接池", lambda: lifecycle.warm_database(settings.WARMUP_DB_CONNECTIONS)),
+        ("生成服务连接", lambda: deps.text_gen_api.warmup(settings.TEXT_GEN_MAX_CONCURRENCY)),
+        ("密码哈希进程", deps.password_hasher.warmup),
+        ("导航缓存", _warm_navigation_cache),
+    )
+    for name, step in steps:
+        try:
+            await step()
+        except Exception as e:
+            logger.warning("预热%s失败: %s", name, e)
+
+
+async def _warm_navigation_cache() -> None:
+    async with db.session_scope() as session:
+        await navigation.load_navigation_list(session, deps.navigation_cache)
+
+
+def create_app() -> FastAPI:
+    """创建应用并注册路由、中间件和启停钩子"""
+    app = FastAPI(
+        title="PsyChat API",
+        description="PsyChat backend API service",
+        version="0.1.0",
+        default_response_class=ORJSONResponse
+    )
 
-if __name__ == "__main__":
-    import uvicorn
-    
-    
     # 注册API路由
     app.include_router(users.router, prefix="/api", tags=["users"])
     app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
     app.include_router(navigation.router, prefix="/api/navigation", tags=["navigation"])
-    
+    app.include_router(internal.router, prefix="/api/internal", tags=["internal"])
+    app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+
+    # 配置CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # 在生产环境中应该设置具体的源
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # 请求耗时和SQL统计（最后添加，位于中间件最外层）
+    if settings.METRICS_ENABLED:
+        app.add_middleware(metrics.MetricsMiddleware, slow_request_ms=settings.METRICS_SLOW_REQUEST_MS)
+
+        @app.get("/metrics", include_in_schema=False)
+        async def get_metrics():
+            """Prometheus 文本格式的监控指标"""
+            return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+    @app.on_event("startup")
+    async def start_settings_reloader():
+        """读取 Redis 中的配置覆盖值，与已在运行的 worker 保持一致，并开始接收热更新"""
+        await deps.settings_reloader.reload()
+        deps.settings_reloader.start()
+
+    @app.on_event("startup")
+    async def start_navigation_cache_listener():
+        """订阅其他 worker 的导航缓存失效通知"""
+        deps.navigation_cache.start_listener()
+
+    @app.on_event("startup")
+    async def start_push_listener():
+        """订阅其他 worker 发往本进程 WebSocket 连接的推送"""
+        deps.push_hub.start_listener()
+
+    @app.on_event("startup")
+    async def start_replica_router():
+        """检查只读副本的复制延迟，并开始定期写入心跳"""
+        if deps.replica_router is not None:
+            await deps.replica_router.start()
+
+    if settings.WARMUP_ENABLED:
+        app.add_event_handler("startup", warmup)
+
+    @app.on_event("shutdown")
+    async def stop_listeners():
+        deps.navigation_cache.stop_listener()
+        deps.push_hub.stop_listener()
+        deps.settings_reloader.stop()
+
+    @app.on_event("shutdown")
+    async def close_text_gen_api():
+        """关闭文本生成服务的连接池"""
+        await deps.text_gen_api.aclose()
+
+    @app.on_event("shutdown")
+    async def shutdown_password_hasher():
+        """关闭密码哈希进程池"""
+        deps.password_hasher.shutdown()
+
+    @app.on_event("shutdown")
+    async def flush_write_queue():
+        """写完队列中剩余的聊天记录和审计日志（需在释放数据库连接池之前）"""
+        if deps.write_queue is not None:
+            await deps.write_queue.stop()
+
+    @app.on_event("shutdown")
+    async def dispose_engines():
+        """释放数据库连接池"""
+        if deps.replica_router is not None:
+            await deps.replica_router.stop()
+        await db.dispose()
+
+    @app.get("/")
+    async def root():
+        return {"message": "Welcome to PsyChat API"}
+
+    return app
+
+
+# uvicorn app.main:app / gunicorn app.main:app 使用的应用实例
+app = create_app()
+
+if __name__ == "__main__":
+    from app.server import main
+
+    main()
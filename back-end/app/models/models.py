@@ -1,14 +1,19 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
+from sqlalchemy import Index, UniqueConstraint
 from sqlmodel import SQLModel, Field, Relationship
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
     
     id: Optional[int] = Field(default=None, primary_key=True)
+    email: str = Field(unique=True, index=True)
     username: str = Field(unique=True, index=True)
     password_hash: str
     role: str = Field(default="user")
+    is_active: bool = Field(default=True)
+    allow_response_cache: bool = Field(default=True)  # 是否允许使用共享的回复缓存
+    chat_count: int = Field(default=0)  # 聊天记录数，随记录的写入和删除同步维护
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     # 关系
@@ -32,18 +37,29 @@ class Navigation(SQLModel, table=True):
 
 class ChatLog(SQLModel, table=True):
     __tablename__ = "chat_logs"
+    # 按用户分页查询历史记录使用的复合索引
+    __table_args__ = (
+        Index("ix_chat_logs_user_id_timestamp_id", "user_id", "timestamp", "id"),
+        # 统计任务按天重算时使用
+        Index("ix_chat_logs_timestamp", "timestamp"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id")
     message: str
     response: str
+    response_ms: Optional[int] = None  # 从收到消息到回复生成完毕的耗时（毫秒）
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    write_batch: Optional[str] = Field(default=None, max_length=32, index=True)  # 写入队列的批次标识，批量插入后据此取回自增ID
     
     # 关系
     user: Optional[User] = Relationship(back_populates="chat_logs")
 
 class Log(SQLModel, table=True):
     __tablename__ = "logs"
+    __table_args__ = (
+        Index("ix_logs_timestamp", "timestamp"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id")
@@ -63,4 +79,61 @@ class Recommendation(SQLModel, table=True):
     
     # 关系
     user: Optional[User] = Relationship(back_populates="recommendations")
-    content: Optional[Navigation] = Relationship(back_populates="recommendations")
\ No newline at end of file
+    content: Optional[Navigation] = Relationship(back_populates="recommendations")
+
+
+class RecommendationScore(SQLModel, table=True):
+    """离线任务预先计算的推荐结果；user_id 为空的行是冷启动用户使用的全站热门内容"""
+    __tablename__ = "recommendation_scores"
+    __table_args__ = (
+        Index("ix_recommendation_scores_user_id_rank", "user_id", "rank"),
+    )
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: Optional[int] = Field(default=None)
+    # 派生数据，不设外键；读取时与 navigation 表连接，已删除的内容自然被过滤
+    content_id: int
+    score: float
+    rank: int
+    computed_at: datetime = Field(default_factory=datetime.utcnow)
+
+class UserDailyStats(SQLModel, table=True):
+    """按用户和日期（UTC）汇总的聊天统计，写入聊天记录时增量维护"""
+    __tablename__ = "user_daily_stats"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", name="uq_user_daily_stats_user_id_day"),
+        Index("ix_user_daily_stats_day", "day"),
+    )
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # 派生数据，不设外键
+    user_id: int
+    day: date
+    message_count: int = Field(default=0)
+    session_count: int = Field(default=0)  # 当天开始的会话数
+    session_seconds: int = Field(default=0)  # 当天会话内相邻消息的间隔之和
+    response_count: int = Field(default=0)  # 记录了回复耗时的消息数
+    response_ms_total: int = Field(default=0)
+    response_ms_max: int = Field(default=0)
+    last_message_at: Optional[datetime] = None
+
+class UserDailyActions(SQLModel, table=True):
+    """按用户、日期（UTC）和操作类型汇总的审计日志条数"""
+    __tablename__ = "user_daily_actions"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", "action", name="uq_user_daily_actions_user_id_day_action"),
+        Index("ix_user_daily_actions_day", "day"),
+    )
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int
+    day: date
+    action: str
+    count: int = Field(default=0)
+
+class ReplicationHeartbeat(SQLModel, table=True):
+    """主库定期写入的心跳时间，通过复制到达只读副本后用于计算副本的复制延迟"""
+    __tablename__ = "replication_heartbeat"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    beat_at: float  # Unix 时间戳（秒）
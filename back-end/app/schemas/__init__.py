@@ -1,8 +1,28 @@
 # 数据验证模型模块
-from pydantic import BaseModel
+import importlib
 
-# 导入所有数据验证模型
-from .user import UserBase, UserCreate, UserUpdate, UserInDB, UserResponse, UserLogin
-from .token import Token, TokenPayload
-from .chat import ChatBase, ChatCreate, ChatUpdate, ChatResponse, ChatList
-from .navigation import NavigationBase, NavigationCreate, NavigationUpdate, NavigationResponse, NavigationList
\ No newline at end of file
+# 所有数据验证模型及其所在的子模块；首次访问 schemas.<名称> 时才导入对应子模块
+_EXPORTS = {
+    "user": ["UserBase", "UserCreate", "UserUpdate", "UserInDB", "UserResponse", "UserLogin"],
+    "token": ["Token", "TokenPayload"],
+    "chat": ["ChatBase", "ChatCreate", "ChatUpdate", "ChatResponse", "ChatList", "ChatSearchHit", "ChatSearchResult"],
+    "navigation": ["NavigationBase", "NavigationCreate", "NavigationUpdate", "NavigationResponse", "NavigationList",
+                   "RecommendedNavigation", "NavigationSearchHit", "NavigationSearchResult"],
+    "stats": ["StatsSummary", "DailyStats", "UserStatsResult"],
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name: str):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
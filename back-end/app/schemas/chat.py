@@ -28,4 +28,13 @@ class ChatResponse(ChatBase):
 
 class ChatList(BaseModel):
     chats: List[ChatResponse]
-    total: int
\ No newline at end of file
+    total: int
+    next_cursor: Optional[str] = None
+
+class ChatSearchHit(ChatResponse):
+    score: float
+
+
+class ChatSearchResult(BaseModel):
+    results: List[ChatSearchHit]
+    next_offset: Optional[int] = None
@@ -26,6 +26,19 @@ class NavigationResponse(NavigationBase):
         orm_mode = True
 
 
+class RecommendedNavigation(NavigationResponse):
+    score: float
+
+
+class NavigationSearchHit(NavigationResponse):
+    score: float
+
+
+class NavigationSearchResult(BaseModel):
+    results: List[NavigationSearchHit]
+    next_offset: Optional[int] = None
+
+
 class NavigationList(BaseModel):
     navigations: List[NavigationResponse]
     total: int
\ No newline at end of file
@@ -0,0 +1,24 @@
+from datetime import date
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+
+class StatsSummary(BaseModel):
+    message_count: int = 0
+    session_count: int = 0
+    avg_session_seconds: float = 0.0
+    avg_response_ms: Optional[float] = None
+    max_response_ms: Optional[int] = None
+    actions: Dict[str, int] = {}
+
+
+class DailyStats(StatsSummary):
+    day: date
+
+
+class UserStatsResult(BaseModel):
+    user_id: Optional[int] = None  # 为空表示全部用户的汇总
+    start: date
+    end: date
+    total: StatsSummary
+    days: List[DailyStats]
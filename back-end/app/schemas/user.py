@@ -13,6 +13,7 @@ class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None
     username: Optional[str] = None
     password: Optional[str] = None
+    allow_response_cache: Optional[bool] = None
 
 class UserInDB(UserBase):
     id: int
@@ -23,6 +24,7 @@ class UserInDB(UserBase):
 
 class UserResponse(UserBase):
     id: int
+    allow_response_cache: bool = True
 
     class Config:
         orm_mode = True
@@ -0,0 +1,128 @@
+"""生产环境启动入口
+
+    python -m app.server --workers 4          # uvicorn 多进程模式
+    gunicorn -c gunicorn.conf.py app.main:app  # gunicorn 管理 worker（使用 DrainingUvicornWorker）
+
+两种方式下 worker 收到 SIGTERM 后都会先停止接收新连接，再等待进行中的请求完成；
+流式回复（SSE 和 WebSocket）最多再运行 SHUTDOWN_DRAIN_TIMEOUT 秒，之后向客户端发送结束事件并关闭。
+"""
+import argparse
+import math
+import os
+import socket
+from typing import List, Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from app.core.config import settings
+from app.core.hashing import calibrate_rounds
+
+
+def available_cpus() -> int:
+    """容器可用的CPU核数：取CPU亲和性与 cgroup 配额中较小的一个"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+
+def worker_count(workers: Optional[int] = None) -> int:
+    return workers or settings.WEB_CONCURRENCY or available_cpus()
+
+
+def configure_workers(workers: Optional[int] = None) -> int:
+    """确定 worker 进程数并写回 WEB_CONCURRENCY，使 worker 中按进程数决定的默认配置（如共享状态使用 Redis）生效
+
+    uvicorn 以 spawn 方式启动的 worker 从环境变量读取配置，gunicorn fork 出的 worker 继承已加载的 settings，两者都需要更新。
+    """
+    count = worker_count(workers)
+    os.environ["WEB_CONCURRENCY"] = str(count)
+    settings.WEB_CONCURRENCY = count
+    return count
+
+
+def configure_password_rounds() -> int:
+    """PASSWORD_HASH_TARGET_MS 大于 0 时在启动入口校准一次 bcrypt cost，写回 PASSWORD_BCRYPT_ROUNDS 供所有 worker 使用"""
+    if settings.PASSWORD_HASH_TARGET_MS > 0:
+        rounds = calibrate_rounds(settings.PASSWORD_HASH_TARGET_MS)
+        for name, value in (("PASSWORD_BCRYPT_ROUNDS", rounds), ("PASSWORD_HASH_TARGET_MS", 0)):
+            os.environ[name] = str(value)
+            setattr(settings, name, value)
+    return settings.PASSWORD_BCRYPT_ROUNDS
+
+
+def _stream_drainer():
+    # 应用在 worker 进程中加载，此时 deps 已经导入
+    from app.api import deps
+
+    return deps.stream_drainer
+
+
+class DrainingServer(uvicorn.Server):
+    """收到退出信号时先通知应用开始停机，再按 uvicorn 的流程关闭"""
+
+    def handle_exit(self, sig, frame) -> None:
+        if self.started:
+            _stream_drainer().begin()
+        super().handle_exit(sig, frame)
+
+    async def shutdown(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        # uvicorn 关闭时会立即断开 WebSocket 连接，因此先停止接收新连接，等进行中的流式回复结束后再关闭
+        for server in self.servers:
+            server.close()
+        for sock in sockets or []:
+            sock.close()
+        if self.started:
+            await _stream_drainer().wait_idle()
+        await super().shutdown(sockets=sockets)
+
+
+try:
+    from gunicorn.arbiter import Arbiter
+    from uvicorn.workers import UvicornWorker
+except ImportError:  # 未安装 gunicorn
+    UvicornWorker = None
+
+if UvicornWorker is not None:
+    class DrainingUvicornWorker(UvicornWorker):
+        """使用 DrainingServer 的 gunicorn worker"""
+
+        async def _serve(self) -> None:
+            self.config.app = self.wsgi
+            server = DrainingServer(config=self.config)
+            await server.serve(sockets=self.sockets)
+            if not server.started:
+                raise SystemExit(Arbiter.WORKER_BOOT_ERROR)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="启动 PsyChat API 服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="worker 进程数，默认取 WEB_CONCURRENCY 或可用CPU核数")
+    args = parser.parse_args(argv)
+
+    configure_password_rounds()
+    config = uvicorn.Config(
+        "app.main:app", host=args.host, port=args.port, workers=configure_workers(args.workers),
+        proxy_headers=True, lifespan="on"
+    )
+    server = DrainingServer(config=config)
+    if config.workers > 1:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# 业务服务模块（文本生成等外部服务的客户端）
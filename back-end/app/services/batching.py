@@ -0,0 +1,141 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set
+
+from app.core.metrics import create_background_task
+
+# 优先级从高到低排列，组批时优先取高优先级队列中的请求
+PRIORITIES = ("high", "normal", "low")
+
+
+class _PendingPrompt:
+    __slots__ = ("prompt", "max_length", "future")
+
+    def __init__(self, prompt: str, max_length: int, future: asyncio.Future):
+        self.prompt = prompt
+        self.max_length = max_length
+        self.future = future
+
+
+class BatchingTextGenAPI:
+    """文本生成请求的动态批处理调度器
+
+    并发到达的提示词先进入按优先级划分的队列，攒满 max_batch_size 条或等待
+    max_wait 秒后合并为一次批量生成请求，再把结果分发回各自的调用方。
+    只有生成参数（max_length）相同的请求才会合并到同一批。
+    流式生成无法合批，直接透传给底层客户端。aclose() 时仍在排队的请求以 RuntimeError 结束。
+    WebSocket 回复以 high 优先级提交（见 app.api.chat），/send 使用默认的 normal。
+    """
+
+    def __init__(self, backend, max_batch_size=8, max_wait=0.005, priorities=PRIORITIES):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.priorities = tuple(priorities)
+        self._queues: Dict[str, Deque[_PendingPrompt]] = {priority: deque() for priority in self.priorities}
+        self._not_empty: Optional[asyncio.Event] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._dispatching: Set[asyncio.Task] = set()
+
+    def _pending_count(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _ensure_worker(self) -> None:
+        # 延迟到事件循环中再创建，避免绑定到错误的事件循环
+        if self._worker is None or self._worker.done():
+            self._not_empty = asyncio.Event()
+            self._batch_full = asyncio.Event()
+            # 由第一个请求触发创建，不能继承该请求的SQL统计上下文
+            self._worker = create_background_task(self._run())
+
+    async def generate_text(self, prompt, max_length=100, priority="normal"):
+        if priority not in self._queues:
+            raise ValueError(f"未知的优先级: {priority}")
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].append(_PendingPrompt(prompt, max_length, future))
+        self._not_empty.set()
+        if self._pending_count() >= self.max_batch_size:
+            self._batch_full.set()
+        return await future
+
+    def stream_text(self, prompt, max_length=100) -> AsyncIterator[str]:
+        return self.backend.stream_text(prompt, max_length=max_length)
+
+    def _take_batch(self) -> List[_PendingPrompt]:
+        """按优先级取出一批生成参数相同的请求"""
+        head = next(queue[0] for queue in self._queues.values() if queue)
+        batch: List[_PendingPrompt] = []
+        for priority in self.priorities:
+            queue = self._queues[priority]
+            skipped: Deque[_PendingPrompt] = deque()
+            while queue and len(batch) < self.max_batch_size:
+                pending = queue.popleft()
+                if pending.future.done():
+                    # 调用方已取消，直接丢弃
+                    continue
+                if pending.max_length == head.max_length:
+                    batch.append(pending)
+                else:
+                    skipped.append(pending)
+            skipped.extend(queue)
+            self._queues[priority] = skipped
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            await self._not_empty.wait()
+            if self._pending_count() < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._take_batch()
+            remaining = self._pending_count()
+            if remaining == 0:
+                self._not_empty.clear()
+            if remaining < self.max_batch_size:
+                self._batch_full.clear()
+            if batch:
+                task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+                self._dispatching.add(task)
+                task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, batch: List[_PendingPrompt]) -> None:
+        try:
+            results = await self.backend.generate_batch(
+                [pending.prompt for pending in batch], max_length=batch[0].max_length
+            )
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        for pending, result in zip(batch, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    async def warmup(self, connections: int = 1) -> None:
+        warmup = getattr(self.backend, "warmup", None)
+        if warmup is not None:
+            await warmup(connections)
+
+    async def aclose(self) -> None:
+        """停止调度，让尚在排队的请求以异常结束，等待已发出的批次完成后关闭底层客户端"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for queue in self._queues.values():
+            while queue:
+                pending = queue.popleft()
+                if not pending.future.done():
+                    pending.future.set_exception(RuntimeError("文本生成服务已关闭"))
+        if self._dispatching:
+            await asyncio.gather(*self._dispatching, return_exceptions=True)
+        await self.backend.aclose()
@@ -0,0 +1,142 @@
+import json
+import logging
+import re
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.lazy import lazy_import
+from app.models.models import ChatLog
+
+redis = lazy_import("redis")
+
+logger = logging.getLogger(__name__)
+
+Turn = Tuple[str, str]
+
+# 中日韩字符按一个 token 计，其余按约 4 个字符一个 token 估算
+_CJK = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def bare_prompt(message: str) -> str:
+    """不带历史对话时的提示词"""
+    return f"用户: {message}\n助手:"
+
+
+class ConversationContext:
+    """按用户维护最近几轮对话的滚动窗口，用于拼接带上下文的提示词
+
+    窗口保存在进程内（或 Redis）并在每条新聊天记录写入后增量追加，最多保留
+    max_turns 轮；拼接提示词时从最新一轮往前取，直到用完 token_budget。
+    只有窗口未命中时才回源数据库读取最近的记录，因此每轮的开销与对话总长度无关。
+    """
+
+    def __init__(self, max_turns: int = 10, token_budget: int = 1024, ttl: float = 3600.0,
+                 max_users: int = 10000, redis_client: Optional["redis.Redis"] = None,
+                 key_prefix: str = "psychat:context:"):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.ttl = ttl
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self._windows = TTLCache(max_size=max_users, ttl=ttl)
+        self._lock = threading.Lock()
+
+    async def _load_from_db(self, db: AsyncSession, user_id: int) -> List[Turn]:
+        result = await db.execute(select(ChatLog.message, ChatLog.response).where(ChatLog.user_id == user_id).order_by(ChatLog.timestamp.desc()).limit(self.max_turns))
+        return [(message, response) for message, response in reversed(result.all())]
+
+    def _redis_key(self, user_id: int) -> str:
+        return f"{self.key_prefix}{user_id}"
+
+    def _redis_read(self, user_id: int) -> List[Turn]:
+        return [tuple(json.loads(raw)) for raw in self.redis.lrange(self._redis_key(user_id), 0, -1)]
+
+    def _redis_fill(self, user_id: int, turns: List[Turn]) -> None:
+        key = self._redis_key(user_id)
+        pipe = self.redis.pipeline()
+        pipe.delete(key)
+        pipe.rpush(key, *[json.dumps(turn, ensure_ascii=False) for turn in turns])
+        pipe.expire(key, int(self.ttl))
+        pipe.execute()
+
+    def _redis_append(self, user_id: int, turn: Turn) -> None:
+        key = self._redis_key(user_id)
+        # RPUSHX 只在窗口已存在时追加
+        pipe = self.redis.pipeline()
+        pipe.rpushx(key, json.dumps(turn, ensure_ascii=False))
+        pipe.ltrim(key, -self.max_turns, -1)
+        pipe.expire(key, int(self.ttl))
+        pipe.execute()
+
+    async def _get_window(self, db: AsyncSession, user_id: int) -> List[Turn]:
+        if self.redis is not None:
+            try:
+                turns = await run_in_threadpool(self._redis_read, user_id)
+            except redis.RedisError as e:
+                logger.warning("读取 Redis 对话窗口失败: %s", e)
+                return await self._load_from_db(db, user_id)
+            if turns:
+                return turns
+            turns = await self._load_from_db(db, user_id)
+            if turns:
+                try:
+                    await run_in_threadpool(self._redis_fill, user_id, turns)
+                except redis.RedisError as e:
+                    logger.warning("写入 Redis 对话窗口失败: %s", e)
+            return turns
+
+        window = self._windows.get(user_id)
+        if window is None:
+            window = deque(await self._load_from_db(db, user_id), maxlen=self.max_turns)
+            self._windows.set(user_id, window, ttl=self.ttl)
+        with self._lock:
+            return list(window)
+
+    async def build_prompt(self, db: AsyncSession, user_id: int, message: str) -> str:
+        """拼接带有历史对话的提示词，历史部分不超过 token 预算"""
+        remaining = self.token_budget - estimate_tokens(message)
+        lines: List[str] = []
+        for user_message, response in reversed(await self._get_window(db, user_id)):
+            turn_lines = [f"用户: {user_message}", f"助手: {response}"]
+            cost = sum(estimate_tokens(line) for line in turn_lines)
+            if cost > remaining:
+                break
+            remaining -= cost
+            lines[:0] = turn_lines
+        lines.append(bare_prompt(message))
+        return "\n".join(lines)
+
+    async def append(self, user_id: int, message: str, response: str) -> None:
+        """新聊天记录写入后追加到窗口；窗口未缓存时不做处理，下次读取会回源数据库"""
+        if self.redis is not None:
+            try:
+                await run_in_threadpool(self._redis_append, user_id, (message, response))
+            except redis.RedisError as e:
+                logger.warning("追加 Redis 对话窗口失败: %s", e)
+            return
+
+        window: Optional[Deque[Turn]] = self._windows.get(user_id)
+        if window is not None:
+            with self._lock:
+                window.append((message, response))
+
+    async def invalidate(self, user_id: int) -> None:
+        """删除聊天记录后清除该用户的窗口"""
+        if self.redis is not None:
+            try:
+                await run_in_threadpool(self.redis.delete, self._redis_key(user_id))
+            except redis.RedisError as e:
+                logger.warning("清除 Redis 对话窗口失败: %s", e)
+        self._windows.delete(user_id)
@@ -0,0 +1,44 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Sequence
+
+# 导出的列，顺序即 CSV 的列顺序
+EXPORT_COLUMNS = ("id", "message", "response", "timestamp")
+
+
+def _row_dict(row: Sequence) -> dict:
+    data = dict(zip(EXPORT_COLUMNS, row))
+    data["timestamp"] = data["timestamp"].isoformat()
+    return data
+
+
+async def ndjson_chunks(partitions: AsyncIterator[Sequence]) -> AsyncIterator[bytes]:
+    """每批记录编码为一段 NDJSON（每行一个 JSON 对象）"""
+    async for rows in partitions:
+        lines = [json.dumps(_row_dict(row), ensure_ascii=False) for row in rows]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def csv_chunks(partitions: AsyncIterator[Sequence]) -> AsyncIterator[bytes]:
+    """先输出表头，之后每批记录编码为一段 CSV；带 BOM 以便 Excel 正确识别中文"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    async for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_row_dict(row).values() for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """把字节流增量压缩为 gzip 格式"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,45 @@
+import asyncio
+from typing import AsyncIterator, List, Optional, Sequence
+
+
+class FakeTextGenAPI:
+    """本地模拟的文本生成服务，接口与 AsyncTextGenAPI 一致，用于测试和压测
+
+    默认按字流式返回根据提示词生成的回复；指定 chunks 时固定回复这些片段，流式生成逐段返回。
+    """
+
+    def __init__(self, latency=0.0, token_latency=0.0, chunks: Optional[Sequence[str]] = None):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.chunks = chunks
+        self.batch_sizes: List[int] = []
+
+    def reply(self, prompt: str) -> str:
+        if self.chunks is not None:
+            return "".join(self.chunks)
+        return f"这是对'{prompt}'的自动回复"
+
+    def _tokens(self, prompt: str, max_length: int) -> Sequence[str]:
+        if self.chunks is not None:
+            return self.chunks
+        return self.reply(prompt)[:max_length]
+
+    async def generate_text(self, prompt, max_length=100, timeout=None):
+        return (await self.generate_batch([prompt], max_length=max_length))[0]
+
+    async def generate_batch(self, prompts: List[str], max_length=100, timeout=None) -> List[str]:
+        self.batch_sizes.append(len(prompts))
+        await asyncio.sleep(self.latency)
+        return [self.reply(prompt)[:max_length] for prompt in prompts]
+
+    async def stream_text(self, prompt, max_length=100, timeout=None) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency)
+        for token in self._tokens(prompt, max_length):
+            await asyncio.sleep(self.token_latency)
+            yield token
+
+    async def warmup(self, connections: int = 1) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Hashable, NamedTuple, Optional
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.lazy import lazy_import
+from app.core import responses
+
+redis = lazy_import("redis")
+
+logger = logging.getLogger(__name__)
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: float
+
+
+def render_json(content: Any) -> bytes:
+    """与默认响应类 ORJSONResponse 相同的序列化方式"""
+    return responses.dumps(content)
+
+
+class NavigationCache:
+    """导航内容的进程内读缓存
+
+    缓存序列化后的响应体和对应的 ETag，导航内容的任何写操作都会清空整个缓存；
+    启用 Redis 时通过 pub/sub 通知其他 worker 同步清空。ttl 是漏收失效通知时数据陈旧的上限，为 0 时不缓存。
+
+    ETag 是响应体的哈希，各 worker 对相同内容给出相同的 ETag。Last-Modified 取导航内容最后一次修改的时间：
+    启用 Redis 时该时间保存在 version_key 中，所有 worker 共用（还没有修改过时取第一个启动的 worker 的启动时间）；
+    未启用 Redis 时只能取本进程内最后一次修改或启动的时间，多 worker 部署时各 worker 的 Last-Modified 不一致。
+    """
+
+    def __init__(self, ttl: float = 300.0, max_size: int = 1024, redis_client: Optional["redis.Redis"] = None,
+                 channel: str = "psychat:navigation:invalidate", version_key: str = "psychat:navigation:modified_at"):
+        self.ttl = ttl
+        self.local = TTLCache(max_size=max_size, ttl=ttl)
+        self.redis = redis_client
+        self.channel = channel
+        self.version_key = version_key
+        self.last_modified = time.time()
+        # 每次失效加一；查询开始后发生过失效的结果不写入缓存
+        self.generation = 0
+        self._origin = f"{os.getpid()}:{id(self)}"
+        self._listener = None
+
+    def get(self, key: Hashable) -> Optional[CachedBody]:
+        return self.local.get(key)
+
+    def set(self, key: Hashable, content: Any, generation: int) -> CachedBody:
+        """序列化并缓存响应内容；generation 为查询数据库前读取的 self.generation"""
+        body = render_json(content)
+        cached = CachedBody(body, f'"{hashlib.sha1(body).hexdigest()[:20]}"', self.last_modified)
+        if self.ttl > 0 and generation == self.generation:
+            self.local.set(key, cached)
+        return cached
+
+    def _clear(self, modified_at: float) -> None:
+        self.generation += 1
+        self.last_modified = max(self.last_modified, modified_at)
+        self.local.clear()
+
+    def _publish(self, modified_at: float) -> None:
+        self.redis.set(self.version_key, modified_at)
+        self.redis.publish(self.channel, json.dumps({"origin": self._origin, "modified_at": modified_at}))
+
+    async def invalidate(self) -> None:
+        """导航内容修改后清空本进程缓存，记录共享的修改时间并通知其他 worker"""
+        now = time.time()
+        self._clear(now)
+        if self.redis is not None:
+            try:
+                await run_in_threadpool(self._publish, now)
+            except redis.RedisError as e:
+                logger.warning("发布导航缓存失效通知失败: %s", e)
+
+    def load_version(self) -> None:
+        """从 Redis 读取共享的修改时间（阻塞调用）；还没有时写入本进程的启动时间，使各 worker 的 Last-Modified 一致"""
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(self.version_key, self.last_modified, nx=True)
+            shared = self.redis.get(self.version_key)
+        except redis.RedisError as e:
+            logger.warning("读取导航内容修改时间失败: %s", e)
+            return
+        if shared is not None:
+            # 共享的时间可能早于本进程的启动时间，不能用 _clear 中的 max
+            self.last_modified = float(shared)
+            self.generation += 1
+            self.local.clear()
+
+    def _on_message(self, message) -> None:
+        try:
+            data = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if data.get("origin") != self._origin:
+            self._clear(float(data.get("modified_at") or time.time()))
+
+    def start_listener(self) -> None:
+        """读取共享的修改时间，并在后台线程中订阅其他 worker 的失效通知"""
+        if self.redis is None or self._listener is not None:
+            return
+        self.load_version()
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(**{self.channel: self._on_message})
+            self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except redis.RedisError as e:
+            logger.warning("订阅导航缓存失效通知失败，仅依赖 ttl 过期: %s", e)
+
+    def stop_listener(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    @staticmethod
+    def _not_modified(request: Request, cached: CachedBody) -> bool:
+        # 同时提供两者时以 If-None-Match 为准
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or cached.etag in tags or f"W/{cached.etag}" in tags
+        if_modified_since = request.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(cached.last_modified) <= since
+        return False
+
+    def respond(self, request: Request, cached: CachedBody) -> Response:
+        """返回缓存的响应体；客户端持有的版本仍然有效时返回 304"""
+        headers = {
+            "ETag": cached.etag,
+            "Last-Modified": formatdate(cached.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+        if self._not_modified(request, cached):
+            return Response(status_code=304, headers=headers)
+        return Response(content=cached.body, media_type="application/json", headers=headers)
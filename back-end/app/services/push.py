@@ -0,0 +1,98 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.lazy import lazy_import
+
+redis = lazy_import("redis")
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[dict], None]
+
+
+class PushHub:
+    """向在线用户的 WebSocket 连接推送消息
+
+    每个 worker 只持有本进程内的连接；启用 Redis 时消息同时经 pub/sub 广播，
+    由持有该用户连接的 worker 投递，因此任何 worker 都可以向任何在线用户推送。
+    投递回调不能阻塞，连接自身负责缓冲和处理过慢的客户端。
+    """
+
+    def __init__(self, redis_client: Optional["redis.Redis"] = None, channel: str = "psychat:push"):
+        self.redis = redis_client
+        self.channel = channel
+        # 用户ID -> {连接ID: (连接所在的事件循环, 投递回调)}
+        self._connections: Dict[int, Dict[str, Tuple[asyncio.AbstractEventLoop, Deliver]]] = {}
+        self._origin = f"{os.getpid()}:{id(self)}"
+        self._listener = None
+
+    def register(self, user_id: int, connection_id: str, deliver: Deliver) -> None:
+        """登记一个连接；需在连接所在的事件循环中调用"""
+        self._connections.setdefault(user_id, {})[connection_id] = (asyncio.get_event_loop(), deliver)
+
+    def unregister(self, user_id: int, connection_id: str) -> None:
+        connections = self._connections.get(user_id)
+        if connections is not None:
+            connections.pop(connection_id, None)
+            if not connections:
+                del self._connections[user_id]
+
+    def connection_count(self) -> int:
+        return sum(len(connections) for connections in self._connections.values())
+
+    def _deliver_local(self, user_id: int, payload: dict, exclude: Optional[str] = None) -> int:
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:  # 在 Redis 订阅线程中
+            current = None
+        delivered = 0
+        for connection_id, (loop, deliver) in list(self._connections.get(user_id, {}).items()):
+            if connection_id == exclude:
+                continue
+            if loop is current:
+                deliver(payload)
+            else:
+                loop.call_soon_threadsafe(deliver, payload)
+            delivered += 1
+        return delivered
+
+    async def publish(self, user_id: int, payload: dict, exclude: Optional[str] = None) -> None:
+        """推送给用户的所有连接；exclude 为不需要推送的连接ID（通常是消息的发起方）"""
+        self._deliver_local(user_id, payload, exclude)
+        if self.redis is not None:
+            message = json.dumps({"origin": self._origin, "user_id": user_id, "payload": payload, "exclude": exclude},
+                                 ensure_ascii=False, default=str)
+            try:
+                await run_in_threadpool(self.redis.publish, self.channel, message)
+            except redis.RedisError as e:
+                logger.warning("发布推送消息失败: %s", e)
+
+    def _on_message(self, message: Any) -> None:
+        # 在订阅线程中调用，投递回调会被转交给各连接所在的事件循环
+        try:
+            data = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if data.get("origin") != self._origin:
+            self._deliver_local(data.get("user_id"), data.get("payload"), data.get("exclude"))
+
+    def start_listener(self) -> None:
+        """在后台线程中订阅其他 worker 发布的推送消息"""
+        if self.redis is None or self._listener is not None:
+            return
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(**{self.channel: self._on_message})
+            self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except redis.RedisError as e:
+            logger.warning("订阅推送消息失败，只能推送给本进程内的连接: %s", e)
+
+    def stop_listener(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
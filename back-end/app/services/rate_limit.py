@@ -0,0 +1,162 @@
+import logging
+import math
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.lazy import lazy_import
+
+redis = lazy_import("redis")
+
+logger = logging.getLogger(__name__)
+
+# 限流规则的时间单位（秒）
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# 令牌桶检查与扣减：所有桶都有足够令牌时才一起扣减，保证用户和IP两个维度的限制原子生效
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local tokens = {}
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[1 + i * 2])
+    local capacity = tonumber(ARGV[2 + i * 2])
+    local data = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    available = math.min(capacity, available + math.max(0, now - ts) * rate)
+    if available < cost then
+        retry_after = math.max(retry_after, (cost - available) / rate)
+    end
+    tokens[i] = available
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[1 + i * 2])
+    local capacity = tonumber(ARGV[2 + i * 2])
+    if retry_after == 0 then
+        tokens[i] = tokens[i] - cost
+    end
+    redis.call('HSET', key, 'tokens', tostring(tokens[i]), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+end
+if retry_after == 0 then
+    return {1, '0'}
+end
+return {0, tostring(retry_after)}
+"""
+
+Bucket = Tuple[str, float, float]  # (键, 每秒补充的令牌数, 桶容量)
+
+
+@lru_cache(maxsize=256)
+def parse_limit(limit: str) -> Tuple[float, float]:
+    """把 "30/minute" 形式的限流规则解析为 (每秒补充的令牌数, 桶容量)"""
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(second|minute|hour|day)\s*", limit)
+    if match is None:
+        raise ValueError(f"无效的限流规则: {limit}")
+    count = int(match.group(1))
+    return count / PERIODS[match.group(2)], float(count)
+
+
+class RateLimiter:
+    """令牌桶限流器
+
+    配置了 Redis 时用 Lua 脚本在 Redis 中原子地检查和扣减，多个 worker 共享同一份计数；
+    Redis 不可用时退化为进程内令牌桶，此时限制只在单个进程内生效。
+    """
+
+    def __init__(self, redis_client: Optional["redis.Redis"] = None, prefix: str = "ratelimit:", max_keys: int = 100000):
+        self.redis = redis_client
+        self.prefix = prefix
+        self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT) if redis_client is not None else None
+        # 进程内的桶：键 -> [剩余令牌数, 上次更新时间]
+        self._buckets = TTLCache(max_size=max_keys, ttl=86400)
+        self._lock = threading.Lock()
+
+    def _check_local(self, buckets: Sequence[Bucket], now: float, cost: float) -> Tuple[bool, float]:
+        with self._lock:
+            states: List[list] = []
+            retry_after = 0.0
+            for key, rate, capacity in buckets:
+                state = self._buckets.get(key) or [capacity, now]
+                state[0] = min(capacity, state[0] + max(0.0, now - state[1]) * rate)
+                state[1] = now
+                if state[0] < cost:
+                    retry_after = max(retry_after, (cost - state[0]) / rate)
+                states.append(state)
+            for (key, rate, capacity), state in zip(buckets, states):
+                if retry_after == 0:
+                    state[0] -= cost
+                self._buckets.set(key, state, ttl=capacity / rate + 1)
+            return retry_after == 0, retry_after
+
+    def _check_redis(self, buckets: Sequence[Bucket], now: float, cost: float) -> Tuple[bool, float]:
+        args: List[float] = [now, cost]
+        for _, rate, capacity in buckets:
+            args.extend([rate, capacity])
+        allowed, retry_after = self._script(keys=[self.prefix + key for key, _, _ in buckets], args=args)
+        return bool(int(allowed)), float(retry_after)
+
+    async def check(self, buckets: Sequence[Bucket], cost: float = 1.0) -> Tuple[bool, float]:
+        """检查并扣减令牌，返回 (是否放行, 需要等待的秒数)"""
+        if not buckets:
+            return True, 0.0
+        now = time.time()
+        if self._script is not None:
+            try:
+                return await run_in_threadpool(self._check_redis, buckets, now, cost)
+            except redis.RedisError as e:
+                logger.warning("Redis 限流失败，改用进程内限流: %s", e)
+        return self._check_local(buckets, now, cost)
+
+
+class GenerationOverloaded(Exception):
+    """等待文本生成的请求过多"""
+
+
+class AdmissionController:
+    """全局准入控制：正在生成和排队等待生成的请求数超过 max_inflight 时直接拒绝新请求
+
+    生成服务的并发受 TEXT_GEN_MAX_CONCURRENCY 限制，超出部分在客户端排队；
+    队列过深时新请求即使排到也会超时，不如尽早返回 503 让客户端退避。max_inflight 为 0 表示不限制。
+    """
+
+    def __init__(self, max_inflight: int = 0):
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.rejected = 0
+
+    def acquire(self) -> "AdmissionTicket":
+        if self.max_inflight and self.inflight >= self.max_inflight:
+            self.rejected += 1
+            raise GenerationOverloaded()
+        self.inflight += 1
+        return AdmissionTicket(self)
+
+
+class AdmissionTicket:
+    """一次准入；release 可重复调用，也可作为上下文管理器使用"""
+
+    def __init__(self, controller: AdmissionController):
+        self._controller = controller
+
+    def release(self) -> None:
+        if self._controller is not None:
+            self._controller.inflight -= 1
+            self._controller = None
+
+    def __enter__(self) -> "AdmissionTicket":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+def retry_after_header(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
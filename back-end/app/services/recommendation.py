@@ -0,0 +1,239 @@
+"""导航内容推荐的离线批处理任务
+
+    python -m app.services.recommendation          # 增量：只重算上次运行后有新行为的用户
+    python -m app.services.recommendation --full   # 全量：重算所有用户
+
+用户与内容的交互来自 recommendations 表（按时间衰减加权），据此计算内容之间的余弦相似度；
+再用用户最近的聊天内容与导航标题/描述的文本相似度补充，解决交互稀疏和新内容的冷启动。
+结果写入 recommendation_scores 表，接口只按用户读取排好序的结果。
+相似度矩阵每次运行都会重建，未重算的用户在下次全量运行前使用上一次的结果。
+"""
+import argparse
+import logging
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models.models import ChatLog, Log, Navigation, Recommendation, RecommendationScore
+from app.services.search import ngram_tokens
+
+logger = logging.getLogger(__name__)
+
+# 文本特征哈希的维度
+TEXT_FEATURES = 4096
+# 计算共现矩阵时每批处理的用户数，限制稠密矩阵占用的内存
+USER_CHUNK_SIZE = 1000
+
+Interactions = Dict[int, float]  # content_id -> 权重
+
+
+def text_matrix(texts: Sequence[str], dims: int = TEXT_FEATURES) -> np.ndarray:
+    """把文本哈希为词频向量并按行归一化，行之间的点积即余弦相似度"""
+    matrix = np.zeros((len(texts), dims), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in ngram_tokens(text or ""):
+            matrix[row, zlib.crc32(token.encode("utf-8")) % dims] += 1.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class RecommendationModel:
+    """内容之间的相似度模型，所有打分都以矩阵运算批量完成"""
+
+    def __init__(self, item_ids: Sequence[int], item_texts: Sequence[str]):
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        self.index = {int(item_id): i for i, item_id in enumerate(self.item_ids)}
+        self.item_text = text_matrix(item_texts)
+        n = len(self.item_ids)
+        self.cooccurrence = np.zeros((n, n), dtype=np.float32)
+        self.popularity = np.zeros(n, dtype=np.float32)
+        self.similarity = np.zeros((n, n), dtype=np.float32)
+
+    def user_matrix(self, users: Sequence[Interactions]) -> np.ndarray:
+        matrix = np.zeros((len(users), len(self.item_ids)), dtype=np.float32)
+        for row, interactions in enumerate(users):
+            for content_id, weight in interactions.items():
+                column = self.index.get(content_id)
+                if column is not None:
+                    matrix[row, column] += weight
+        return matrix
+
+    def fit(self, users: Iterable[Interactions]) -> None:
+        """分批累加加权共现矩阵 R^T R，再归一化为内容之间的余弦相似度"""
+        users = list(users)
+        for start in range(0, len(users), USER_CHUNK_SIZE):
+            matrix = self.user_matrix(users[start:start + USER_CHUNK_SIZE])
+            self.cooccurrence += matrix.T @ matrix
+            self.popularity += matrix.sum(axis=0)
+        norms = np.sqrt(np.diag(self.cooccurrence))
+        denominator = np.outer(norms, norms)
+        self.similarity = np.divide(
+            self.cooccurrence, denominator,
+            out=np.zeros_like(self.cooccurrence), where=denominator > 0
+        )
+        np.fill_diagonal(self.similarity, 0.0)
+
+    def score(self, users: Sequence[Interactions], chat_texts: Sequence[str], top_k: int,
+              chat_weight: float) -> List[List[Tuple[int, float]]]:
+        """为一批用户计算 top_k 推荐，返回每个用户的 [(content_id, score)]，已交互过的内容不再推荐"""
+        n = len(self.item_ids)
+        if n == 0 or not users:
+            return [[] for _ in users]
+        interactions = self.user_matrix(users)
+        collaborative = interactions @ self.similarity
+        row_max = collaborative.max(axis=1, keepdims=True)
+        np.divide(collaborative, row_max, out=collaborative, where=row_max > 0)
+        chat = np.clip(text_matrix(chat_texts) @ self.item_text.T, 0.0, None)
+
+        scores = (1.0 - chat_weight) * collaborative + chat_weight * chat
+        scores[interactions > 0] = -np.inf
+        k = min(top_k, n)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        results = []
+        for row_items, row_scores in zip(top, top_scores):
+            results.append([
+                (int(self.item_ids[i]), float(s)) for i, s in zip(row_items, row_scores) if s > 0
+            ])
+        return results
+
+    def popular(self, top_k: int) -> List[Tuple[int, float]]:
+        """按衰减后的交互量排序的全站热门内容"""
+        order = np.argsort(-self.popularity)[:top_k]
+        return [(int(self.item_ids[i]), float(self.popularity[i])) for i in order if self.popularity[i] > 0]
+
+
+def load_interactions(session: Session, now: datetime, half_life_days: float) -> Dict[int, Interactions]:
+    """读取用户与内容的交互，每次交互的权重按半衰期随时间衰减"""
+    interactions: Dict[int, Interactions] = defaultdict(lambda: defaultdict(float))
+    result = session.execute(
+        select(Recommendation.user_id, Recommendation.content_id, Recommendation.timestamp)
+    )
+    for user_id, content_id, timestamp in result:
+        age_days = max((now - timestamp).total_seconds(), 0.0) / 86400
+        interactions[user_id][content_id] += 0.5 ** (age_days / half_life_days)
+    return interactions
+
+
+def load_chat_texts(session: Session, user_ids: Sequence[int], limit: int) -> Dict[int, str]:
+    """每个用户最近 limit 条聊天消息拼接成的文本
+
+    每个用户的条数限制在数据库中用 ROW_NUMBER() 完成（需要 MySQL 8.0 / SQLite 3.25 以上），只传回需要的行。
+    """
+    messages: Dict[int, List[str]] = defaultdict(list)
+    row_number = func.row_number().over(
+        partition_by=ChatLog.user_id, order_by=(ChatLog.timestamp.desc(), ChatLog.id.desc())
+    ).label("row_number")
+    recent = (
+        select(ChatLog.user_id, ChatLog.message, row_number)
+        .where(ChatLog.user_id.in_(user_ids))
+        .subquery()
+    )
+    result = session.execute(
+        select(recent.c.user_id, recent.c.message)
+        .where(recent.c.row_number <= limit)
+        .order_by(recent.c.user_id, recent.c.row_number)
+    )
+    for user_id, message in result:
+        messages[user_id].append(message)
+    return {user_id: " ".join(texts) for user_id, texts in messages.items()}
+
+
+def changed_users(session: Session, since: datetime) -> Set[int]:
+    """上次运行后有新的交互、聊天或操作日志的用户"""
+    users: Set[int] = set()
+    for model in (Recommendation, ChatLog, Log):
+        result = session.execute(select(model.user_id).where(model.timestamp > since).distinct())
+        users.update(user_id for user_id, in result)
+    return users
+
+
+def all_users(session: Session) -> Set[int]:
+    users: Set[int] = set()
+    for model in (Recommendation, ChatLog):
+        users.update(user_id for user_id, in session.execute(select(model.user_id).distinct()))
+    return users
+
+
+def _chunks(items: Sequence[int], size: int) -> Iterator[Sequence[int]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _rows(user_id: Optional[int], recommendations: List[Tuple[int, float]], computed_at: datetime) -> List[dict]:
+    return [
+        {"user_id": user_id, "content_id": content_id, "score": score, "rank": rank, "computed_at": computed_at}
+        for rank, (content_id, score) in enumerate(recommendations)
+    ]
+
+
+def run(session: Session, full: bool = False, top_k: int = None, chat_weight: float = None,
+        half_life_days: float = None, chat_history: int = None, batch_size: int = 500) -> int:
+    """计算推荐结果并写入 recommendation_scores，返回重算的用户数"""
+    top_k = top_k or settings.RECOMMENDATION_TOP_K
+    chat_weight = settings.RECOMMENDATION_CHAT_WEIGHT if chat_weight is None else chat_weight
+    half_life_days = half_life_days or settings.RECOMMENDATION_HALF_LIFE_DAYS
+    chat_history = chat_history or settings.RECOMMENDATION_CHAT_HISTORY
+    now = datetime.utcnow()
+
+    navigations = session.execute(select(Navigation.id, Navigation.title, Navigation.description)).all()
+    model = RecommendationModel(
+        [navigation_id for navigation_id, _, _ in navigations],
+        [f"{title} {description or ''}" for _, title, description in navigations]
+    )
+    interactions = load_interactions(session, now, half_life_days)
+    model.fit(interactions.values())
+
+    since = None if full else session.execute(select(func.max(RecommendationScore.computed_at))).scalar()
+    users = sorted(all_users(session) if since is None else changed_users(session, since))
+
+    table = RecommendationScore.__table__
+    for batch in _chunks(users, batch_size):
+        chat_texts = load_chat_texts(session, batch, chat_history)
+        results = model.score(
+            [interactions.get(user_id, {}) for user_id in batch],
+            [chat_texts.get(user_id, "") for user_id in batch],
+            top_k, chat_weight
+        )
+        rows = []
+        for user_id, recommendations in zip(batch, results):
+            rows.extend(_rows(user_id, recommendations, now))
+        session.execute(delete(table).where(table.c.user_id.in_(batch)))
+        if rows:
+            session.execute(insert(table), rows)
+        session.commit()
+
+    # 全站热门每次都刷新，同时推进增量运行的时间水位
+    session.execute(delete(table).where(table.c.user_id.is_(None)))
+    popular = _rows(None, model.popular(top_k), now)
+    if popular:
+        session.execute(insert(table), popular)
+    session.commit()
+    logger.info("推荐结果已更新：%d 个用户，%d 个导航内容", len(users), len(navigations))
+    return len(users)
+
+
+def main(argv=None) -> None:
+    from app.core.db import get_engine
+
+    parser = argparse.ArgumentParser(description="计算导航内容推荐")
+    parser.add_argument("--full", action="store_true", help="重算所有用户，而不只是有新行为的用户")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    with Session(get_engine()) as session:
+        run(session, full=args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.lazy import lazy_import
+
+redis = lazy_import("redis")
+
+logger = logging.getLogger(__name__)
+
+# 归一化时去掉的首尾标点和空白
+_TRIM_CHARS = " \t\r\n。！？!?.,，~～…"
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """归一化提示词：全角转半角、统一大小写、合并空白并去掉首尾标点"""
+    prompt = unicodedata.normalize("NFKC", prompt).lower()
+    prompt = _WHITESPACE.sub(" ", prompt)
+    return prompt.strip(_TRIM_CHARS)
+
+
+def char_ngram_embedding(text: str, n: int = 2) -> Dict[str, int]:
+    """无外部依赖的字符 n-gram 稀疏向量，适合中文短句的近似去重"""
+    if len(text) < n:
+        return Counter([text])
+    return Counter(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def cosine_similarity(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(value * b.get(key, 0) for key, value in a.items())
+    if not dot:
+        return 0.0
+    norm_a = math.sqrt(sum(value * value for value in a.values()))
+    norm_b = math.sqrt(sum(value * value for value in b.values()))
+    return dot / (norm_a * norm_b)
+
+
+class ResponseCache:
+    """聊天回复缓存
+
+    以归一化后的提示词和生成参数为键，先查进程内 LRU 缓存，再查可选的 Redis 缓存。
+    设置 similarity_threshold 后，精确查找未命中时还会按嵌入向量的余弦相似度
+    查找近似重复的提示词：先用 n-gram 倒排索引找出与查询共享 n-gram 最多的 max_candidates 个条目，
+    只对这些条目计算相似度，每次查找最多访问 max_scan 条倒排记录。
+
+    缓存在所有用户之间共享，调用方只能用用户本次发送的消息作为提示词，
+    拼入了历史对话等私人内容的请求不能读写缓存。
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0,
+                 redis_client: Optional["redis.Redis"] = None, key_prefix: str = "psychat:reply:",
+                 similarity_threshold: float = 0.0,
+                 embed: Callable[[str], Dict[str, float]] = char_ngram_embedding,
+                 max_candidates: int = 64, max_scan: int = 4096):
+        self.ttl = ttl
+        self.local = TTLCache(max_size=max_size, ttl=ttl)
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed
+        self.max_candidates = max_candidates
+        self.max_scan = max_scan
+        self.hits = 0
+        self.misses = 0
+        self.similar_hits = 0
+        # 近似查找用的向量索引，与本地缓存同样限制条目数
+        self._vectors: "OrderedDict[str, Tuple[int, Dict[str, float]]]" = OrderedDict()
+        # 倒排索引：(max_length, n-gram) -> 包含该 n-gram 的缓存键
+        self._postings: Dict[Tuple[int, str], Set[str]] = {}
+        self._max_vectors = max_size
+        self._lock = threading.Lock()
+
+    def make_key(self, prompt: str, max_length: int) -> str:
+        raw = f"{max_length}\x00{normalize_prompt(prompt)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def _lookup(self, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is not None or self.redis is None:
+            return value
+        try:
+            raw = await run_in_threadpool(self.redis.get, self.key_prefix + key)
+        except redis.RedisError as e:
+            logger.warning("读取 Redis 回复缓存失败: %s", e)
+            return None
+        if raw is None:
+            return None
+        value = raw.decode("utf-8")
+        # 回填到本地缓存，下次无需访问 Redis
+        self.local.set(key, value)
+        return value
+
+    def _index(self, key: str, max_length: int, vector: Dict[str, float]) -> None:
+        """加入向量索引，超出条目数时淘汰最早加入的条目（调用方持有锁）"""
+        self._unindex(key)
+        self._vectors[key] = (max_length, vector)
+        for gram in vector:
+            self._postings.setdefault((max_length, gram), set()).add(key)
+        while len(self._vectors) > self._max_vectors:
+            self._unindex(next(iter(self._vectors)))
+
+    def _unindex(self, key: str) -> None:
+        entry = self._vectors.pop(key, None)
+        if entry is None:
+            return
+        max_length, vector = entry
+        for gram in vector:
+            keys = self._postings.get((max_length, gram))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[(max_length, gram)]
+
+    def _find_similar(self, prompt: str, max_length: int) -> Optional[str]:
+        vector = self.embed(normalize_prompt(prompt))
+        with self._lock:
+            postings = [self._postings.get((max_length, gram)) for gram in vector]
+            shared: Counter = Counter()
+            scanned = 0
+            # 先访问包含的条目少、区分度高的 n-gram
+            for keys in sorted(filter(None, postings), key=len):
+                if scanned + len(keys) > self.max_scan:
+                    break
+                shared.update(keys)
+                scanned += len(keys)
+            candidates: List[Tuple[str, Dict[str, float]]] = [
+                (key, self._vectors[key][1]) for key, _ in shared.most_common(self.max_candidates)
+            ]
+        best_key, best_score = None, self.similarity_threshold
+        for key, candidate in candidates:
+            score = cosine_similarity(vector, candidate)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    async def get(self, prompt: str, max_length: int) -> Optional[str]:
+        value = await self._lookup(self.make_key(prompt, max_length))
+        if value is None and self.similarity_threshold > 0:
+            similar_key = self._find_similar(prompt, max_length)
+            if similar_key is not None:
+                value = await self._lookup(similar_key)
+                if value is not None:
+                    self.similar_hits += 1
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, prompt: str, max_length: int, response: str) -> None:
+        key = self.make_key(prompt, max_length)
+        self.local.set(key, response)
+        if self.similarity_threshold > 0:
+            vector = self.embed(normalize_prompt(prompt))
+            with self._lock:
+                self._index(key, max_length, vector)
+        if self.redis is not None:
+            try:
+                await run_in_threadpool(self.redis.set, self.key_prefix + key, response, ex=int(self.ttl))
+            except redis.RedisError as e:
+                logger.warning("写入 Redis 回复缓存失败: %s", e)
+
+    async def get_or_generate(self, prompt: str, max_length: int,
+                              generate: Callable[[], Awaitable[str]]) -> str:
+        """命中缓存时直接返回，否则调用 generate 生成并写入缓存"""
+        response = await self.get(prompt, max_length)
+        if response is None:
+            response = await generate()
+            if response:
+                await self.set(prompt, max_length, response)
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中计数"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "similar_hits": self.similar_hits,
+            "size": len(self.local)
+        }
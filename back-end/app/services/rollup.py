@@ -0,0 +1,170 @@
+"""聊天统计的每日汇总
+
+写入聊天记录和审计日志时在同一事务中增量更新 user_daily_stats / user_daily_actions（record_rows），
+统计接口只读取汇总表，不扫描 chat_logs 和 logs。
+
+    python -m app.services.rollup                          # 重算昨天和今天（UTC），补上增量维护遗漏的行
+    python -m app.services.rollup --start 2026-01-01       # 回填：从指定日期重算到今天
+    python -m app.services.rollup --start 2026-01-01 --end 2026-01-31
+
+重算按天进行且可以重复执行：先删除当天的汇总行再从原始记录重新计算，会扫描当天的全部记录，应安排在业务低峰期运行。
+会话按相邻两条消息的间隔不超过 SESSION_GAP 划分，跨越零点的会话时长分别计入各自的日期。
+"""
+import argparse
+import logging
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.engine import Connection
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.models import ChatLog, Log, UserDailyActions, UserDailyStats
+
+logger = logging.getLogger(__name__)
+
+# 相邻两条消息的间隔超过该值时视为新的会话
+SESSION_GAP = timedelta(minutes=30)
+# 重算时每次写入的行数
+INSERT_BATCH_SIZE = 1000
+
+_COUNTERS = ("message_count", "session_count", "session_seconds", "response_count", "response_ms_total")
+_MAXIMA = ("response_ms_max", "last_message_at")
+
+Message = Tuple[int, datetime, Optional[int]]  # (用户ID, 时间, 回复耗时)
+
+
+def accumulate(messages: Iterable[Message], last_seen: Dict[int, datetime]) -> Dict[Tuple[int, date], dict]:
+    """按 (用户ID, 日期) 汇总消息，messages 需按用户和时间排序；last_seen 为各用户之前最后一条消息的时间，会被原地更新"""
+    stats: Dict[Tuple[int, date], dict] = {}
+    for user_id, timestamp, response_ms in messages:
+        day = timestamp.date()
+        row = stats.get((user_id, day))
+        if row is None:
+            row = stats[(user_id, day)] = {"user_id": user_id, "day": day, **dict.fromkeys(_COUNTERS, 0),
+                                           "response_ms_max": 0, "last_message_at": timestamp}
+        previous = last_seen.get(user_id)
+        if previous is None or timestamp - previous > SESSION_GAP:
+            row["session_count"] += 1
+        elif timestamp > previous:
+            row["session_seconds"] += int((timestamp - previous).total_seconds())
+        row["message_count"] += 1
+        if response_ms is not None:
+            row["response_count"] += 1
+            row["response_ms_total"] += response_ms
+            row["response_ms_max"] = max(row["response_ms_max"], response_ms)
+        row["last_message_at"] = max(row["last_message_at"], timestamp)
+        last_seen[user_id] = max(previous or timestamp, timestamp)
+    return stats
+
+
+def _upsert(dialect: str, table, keys: Sequence[str], counters: Sequence[str], maxima: Sequence[str] = ()):
+    """插入汇总行，已存在时累加计数并保留较大值"""
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        statement = mysql_insert(table)
+        values = {name: table.c[name] + statement.inserted[name] for name in counters}
+        values.update({name: func.greatest(func.coalesce(table.c[name], statement.inserted[name]), statement.inserted[name]) for name in maxima})
+        return statement.on_duplicate_key_update(**values)
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+    statement = sqlite_insert(table)
+    values = {name: table.c[name] + statement.excluded[name] for name in counters}
+    # SQLite 的多参数 max() 是标量函数，返回参数中的最大值
+    values.update({name: func.max(func.coalesce(table.c[name], statement.excluded[name]), statement.excluded[name]) for name in maxima})
+    return statement.on_conflict_do_update(index_elements=list(keys), set_=values)
+
+
+def _dialect(db) -> str:
+    # AsyncSession 和 SyncSessionAdapter 都通过 sync_session 暴露底层的同步会话
+    return db.sync_session.get_bind().dialect.name
+
+
+async def record_rows(db: AsyncSession, rows: Sequence[Union[ChatLog, Log]]) -> None:
+    """在当前事务中把新写入的聊天记录和审计日志累加到每日汇总表"""
+    dialect = _dialect(db)
+    chat_logs = sorted((row for row in rows if isinstance(row, ChatLog)), key=lambda row: (row.user_id, row.timestamp))
+    if chat_logs:
+        # 会话间隔不超过 SESSION_GAP，只需要前一天以来的最后一条消息
+        since = min(row.timestamp for row in chat_logs).date() - timedelta(days=1)
+        table = UserDailyStats.__table__
+        result = await db.execute(
+            select(table.c.user_id, func.max(table.c.last_message_at))
+            .where(table.c.user_id.in_({row.user_id for row in chat_logs}), table.c.day >= since)
+            .group_by(table.c.user_id)
+        )
+        last_seen = {user_id: last for user_id, last in result.all() if last is not None}
+        stats = accumulate(((row.user_id, row.timestamp, row.response_ms) for row in chat_logs), last_seen)
+        await db.execute(_upsert(dialect, table, ("user_id", "day"), _COUNTERS, _MAXIMA), list(stats.values()))
+
+    actions = Counter((row.user_id, row.timestamp.date(), row.action) for row in rows if isinstance(row, Log))
+    if actions:
+        await db.execute(
+            _upsert(dialect, UserDailyActions.__table__, ("user_id", "day", "action"), ("count",)),
+            [{"user_id": user_id, "day": day, "action": action, "count": count} for (user_id, day, action), count in actions.items()]
+        )
+
+
+def _insert_batches(connection: Connection, table, rows: List[dict]) -> None:
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        connection.execute(insert(table), rows[start:start + INSERT_BATCH_SIZE])
+
+
+def rebuild_day(connection: Connection, day: date) -> int:
+    """从原始记录重算某一天的汇总行，返回当天的消息数；前一天的汇总应已是最新的"""
+    start = datetime.combine(day, time.min)
+    end = start + timedelta(days=1)
+    stats_table, actions_table = UserDailyStats.__table__, UserDailyActions.__table__
+    connection.execute(delete(stats_table).where(stats_table.c.day == day))
+    connection.execute(delete(actions_table).where(actions_table.c.day == day))
+
+    last_seen = {
+        user_id: last for user_id, last in connection.execute(
+            select(stats_table.c.user_id, stats_table.c.last_message_at).where(stats_table.c.day == day - timedelta(days=1))
+        ) if last is not None
+    }
+    messages = connection.execute(
+        select(ChatLog.user_id, ChatLog.timestamp, ChatLog.response_ms)
+        .where(and_(ChatLog.timestamp >= start, ChatLog.timestamp < end))
+        .order_by(ChatLog.user_id, ChatLog.timestamp)
+        .execution_options(stream_results=True)
+    )
+    stats = list(accumulate(messages, last_seen).values())
+    _insert_batches(connection, stats_table, stats)
+
+    actions = connection.execute(
+        select(Log.user_id, Log.action, func.count())
+        .where(and_(Log.timestamp >= start, Log.timestamp < end))
+        .group_by(Log.user_id, Log.action)
+    )
+    _insert_batches(connection, actions_table, [
+        {"user_id": user_id, "day": day, "action": action, "count": count} for user_id, action, count in actions
+    ])
+    return sum(row["message_count"] for row in stats)
+
+
+def days_between(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def main(argv=None) -> None:
+    from app.core.db import get_engine
+
+    today = datetime.utcnow().date()
+    parser = argparse.ArgumentParser(description="按天重算聊天统计汇总表")
+    parser.add_argument("--start", type=date.fromisoformat, default=today - timedelta(days=1), help="起始日期（UTC），默认昨天")
+    parser.add_argument("--end", type=date.fromisoformat, default=today, help="结束日期（UTC，包含），默认今天")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    # 每天一个事务，按日期顺序重算，后一天的会话划分依赖前一天的结果
+    for day in days_between(args.start, args.end):
+        with get_engine().begin() as connection:
+            messages = rebuild_day(connection, day)
+        logger.info("%s 的统计已重算：%d 条消息", day, messages)
+
+
+if __name__ == "__main__":
+    main()
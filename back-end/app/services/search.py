@@ -0,0 +1,248 @@
+"""聊天记录和导航内容的全文检索
+
+生产环境（MySQL）使用带 ngram 分词器的 FULLTEXT 索引，由 InnoDB 在写入和删除时自动维护；
+SQLite（开发和测试）使用 FTS5 虚拟表，写入前先在应用侧按相同规则切分成二元组，
+由 ORM 事件在 ChatLog / Navigation 插入、修改、删除时增量维护；不经过 ORM 的 Core INSERT（如批量写入队列）
+需要在同一事务中调用 index_inserted。
+
+按用户检索时 user_id 条件与全文条件写在同一个 WHERE 中，保证该用户的每条匹配记录都能被检索到。
+InnoDB 不能把 FULLTEXT 索引与 user_id 上的普通索引组合使用，全文匹配的代价与全站包含检索词的记录数成正比；
+接口限制了 offset 和 limit，排序只涉及该用户的匹配记录。
+
+    python -m app.services.search --rebuild   # 按现有数据重建 SQLite 的 FTS5 索引
+"""
+import argparse
+import logging
+import re
+from typing import Any, Iterator, List, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import DDL, event, select, text
+from sqlalchemy.engine import Connection
+from sqlmodel import SQLModel
+
+from app.models.models import ChatLog, Navigation
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+
+def ngram_tokens(value: str) -> Iterator[str]:
+    """英文和数字按整词，中文按相邻两个字切分（与 MySQL ngram_token_size=2 一致）"""
+    for word in _WORD.findall(value.lower()):
+        if word.isascii() or len(word) == 1:
+            yield word
+        else:
+            for i in range(len(word) - 1):
+                yield word[i:i + 2]
+
+
+class SearchIndex:
+    """一张表的检索配置：被索引的列，以及检索时用于过滤的列"""
+
+    def __init__(self, model: Type[SQLModel], columns: Sequence[str], filter_column: Optional[str] = None):
+        self.model = model
+        self.table = model.__tablename__
+        self.columns = tuple(columns)
+        self.filter_column = filter_column
+        self.fts_table = f"{self.table}_fts"
+        self.fulltext_index = f"ft_{self.table}_{'_'.join(self.columns)}"
+
+    def sqlite_ddl(self) -> str:
+        columns = list(self.columns)
+        if self.filter_column:
+            columns.append(f"{self.filter_column} UNINDEXED")
+        return f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5({', '.join(columns)})"
+
+    def mysql_ddl(self) -> str:
+        return f"ALTER TABLE {self.table} ADD FULLTEXT INDEX {self.fulltext_index} ({', '.join(self.columns)}) WITH PARSER ngram"
+
+    def sqlite_row(self, target: Any) -> dict:
+        row = {"rowid": target.id}
+        for column in self.columns:
+            row[column] = " ".join(ngram_tokens(getattr(target, column) or ""))
+        if self.filter_column:
+            row[self.filter_column] = getattr(target, self.filter_column)
+        return row
+
+
+CHAT_INDEX = SearchIndex(ChatLog, ("message", "response"), filter_column="user_id")
+NAVIGATION_INDEX = SearchIndex(Navigation, ("title", "description"))
+INDEXES = (CHAT_INDEX, NAVIGATION_INDEX)
+
+
+# create_all / drop_all 时一并创建和删除索引
+for _index in INDEXES:
+    event.listen(_index.model.__table__, "after_create", DDL(_index.sqlite_ddl()).execute_if(dialect="sqlite"))
+    event.listen(_index.model.__table__, "after_create", DDL(_index.mysql_ddl()).execute_if(dialect="mysql"))
+    event.listen(_index.model.__table__, "before_drop", DDL(f"DROP TABLE IF EXISTS {_index.fts_table}").execute_if(dialect="sqlite"))
+
+
+def _sqlite_insert_sql(index: SearchIndex, row: dict) -> str:
+    columns = ", ".join(row)
+    values = ", ".join(f":{name}" for name in row)
+    return f"INSERT INTO {index.fts_table} ({columns}) VALUES ({values})"
+
+
+def _insert_sqlite(index: SearchIndex, connection, target) -> None:
+    row = index.sqlite_row(target)
+    connection.execute(text(_sqlite_insert_sql(index, row)), row)
+
+
+def _delete_sqlite(index: SearchIndex, connection, target) -> None:
+    connection.execute(text(f"DELETE FROM {index.fts_table} WHERE rowid = :rowid"), {"rowid": target.id})
+
+
+def _register_maintenance(index: SearchIndex) -> None:
+    # MySQL 的 FULLTEXT 索引由 InnoDB 维护，只有 SQLite 需要同步 FTS5 表
+    @event.listens_for(index.model, "after_insert")
+    def after_insert(mapper, connection, target):
+        if connection.dialect.name == "sqlite":
+            _insert_sqlite(index, connection, target)
+
+    @event.listens_for(index.model, "after_update")
+    def after_update(mapper, connection, target):
+        if connection.dialect.name == "sqlite":
+            _delete_sqlite(index, connection, target)
+            _insert_sqlite(index, connection, target)
+
+    @event.listens_for(index.model, "after_delete")
+    def after_delete(mapper, connection, target):
+        if connection.dialect.name == "sqlite":
+            _delete_sqlite(index, connection, target)
+
+
+for _index in INDEXES:
+    _register_maintenance(_index)
+
+
+def build_match_query(query: str, dialect: str) -> Optional[str]:
+    """把用户输入转换为检索表达式，各个词都必须出现；只保留文字字符，用户无法注入检索运算符"""
+    terms = [" ".join(_WORD.findall(term)) for term in query.split()]
+    terms = [term for term in terms if term]
+    if not terms:
+        return None
+    if dialect == "mysql":
+        return " ".join(f'+"{term}"' for term in terms)
+
+    expressions = []
+    for term in terms:
+        tokens = list(ngram_tokens(term))
+        if len(tokens) == 1 and not tokens[0].isascii() and len(tokens[0]) == 1:
+            # 单个汉字在索引中只存在于二元组里，按前缀匹配
+            expressions.append(f"{tokens[0]}*")
+        else:
+            expressions.append('"' + " ".join(tokens) + '"')
+    return " ".join(expressions)
+
+
+def mysql_search_sql(index: SearchIndex) -> str:
+    against = f"MATCH({', '.join(index.columns)}) AGAINST (:match IN BOOLEAN MODE)"
+    where = against
+    if index.filter_column:
+        where = f"{index.filter_column} = :filter_value AND {where}"
+    return (f"SELECT id, {against} AS score FROM {index.table} WHERE {where} "
+            f"ORDER BY score DESC, id DESC LIMIT :limit OFFSET :offset")
+
+
+def sqlite_search_sql(index: SearchIndex) -> str:
+    # bm25 越小越相关，取负数使得分数越大越相关
+    where = f"{index.fts_table} MATCH :match"
+    if index.filter_column:
+        where += f" AND {index.filter_column} = :filter_value"
+    return (f"SELECT rowid, -bm25({index.fts_table}) AS score FROM {index.fts_table} WHERE {where} "
+            f"ORDER BY score DESC, rowid DESC LIMIT :limit OFFSET :offset")
+
+
+def _dialect(db) -> str:
+    # AsyncSession 和 SyncSessionAdapter 都通过 sync_session 暴露底层的同步会话
+    return db.sync_session.get_bind().dialect.name
+
+
+async def index_inserted(db, model: Type[SQLModel], targets: Sequence[Any]) -> None:
+    """为通过 Core INSERT 写入、不会触发 ORM 事件的行更新 SQLite 的 FTS5 索引；targets 需要已有ID"""
+    if not targets or _dialect(db) != "sqlite":
+        return
+    for index in INDEXES:
+        if index.model is model:
+            rows = [index.sqlite_row(target) for target in targets]
+            await db.execute(text(_sqlite_insert_sql(index, rows[0])), rows)
+
+
+async def _ranked_ids(db, index: SearchIndex, query: str, offset: int, limit: int,
+                      filter_value: Optional[int] = None) -> List[Tuple[int, float]]:
+    dialect = _dialect(db)
+    match = build_match_query(query, dialect)
+    if match is None:
+        return []
+    params = {"match": match, "limit": limit, "offset": offset, "filter_value": filter_value}
+
+    if dialect == "mysql":
+        sql = mysql_search_sql(index)
+    elif dialect == "sqlite":
+        sql = sqlite_search_sql(index)
+    else:
+        raise ValueError(f"不支持全文检索的数据库: {dialect}")
+
+    result = await db.execute(text(sql), params)
+    return [(row_id, float(score)) for row_id, score in result.all()]
+
+
+async def _search(db, index: SearchIndex, query: str, offset: int, limit: int,
+                  filter_value: Optional[int] = None) -> List[Tuple[Any, float]]:
+    """按相关度返回 (模型对象, 分数)"""
+    ranked = await _ranked_ids(db, index, query, offset, limit, filter_value)
+    if not ranked:
+        return []
+    model = index.model
+    result = await db.execute(select(model).where(model.id.in_([row_id for row_id, _ in ranked])))
+    rows = {row.id: row for row in result.scalars().all()}
+    return [(rows[row_id], score) for row_id, score in ranked if row_id in rows]
+
+
+async def search_chat_logs(db, user_id: int, query: str, offset: int = 0, limit: int = 20) -> List[Tuple[ChatLog, float]]:
+    """在指定用户的聊天记录中检索"""
+    return await _search(db, CHAT_INDEX, query, offset, limit, filter_value=user_id)
+
+
+async def search_navigations(db, query: str, offset: int = 0, limit: int = 20) -> List[Tuple[Navigation, float]]:
+    """检索导航内容的标题和描述"""
+    return await _search(db, NAVIGATION_INDEX, query, offset, limit)
+
+
+def rebuild(connection: Connection, batch_size: int = 1000) -> None:
+    """按现有数据重建 SQLite 的 FTS5 索引；MySQL 的 FULLTEXT 索引由迁移创建，无需重建"""
+    if connection.dialect.name != "sqlite":
+        logger.info("%s 的全文索引由数据库维护，无需重建", connection.dialect.name)
+        return
+    for index in INDEXES:
+        connection.execute(text(f"DROP TABLE IF EXISTS {index.fts_table}"))
+        connection.execute(text(index.sqlite_ddl()))
+        table = index.model.__table__
+        last_id = 0
+        while True:
+            batch = connection.execute(
+                select(table).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            for row in batch:
+                _insert_sqlite(index, connection, row)
+            last_id = batch[-1].id
+        logger.info("已重建 %s", index.fts_table)
+
+
+def main(argv=None) -> None:
+    from app.core.db import get_engine
+
+    parser = argparse.ArgumentParser(description="全文检索索引维护")
+    parser.add_argument("--rebuild", action="store_true", help="按现有数据重建 SQLite 的 FTS5 索引")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.rebuild:
+        with get_engine().begin() as connection:
+            rebuild(connection)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import random
+from typing import AsyncIterator, Iterator, List, Optional
+
+from app.core.lazy import lazy_import
+from app.core.metrics import observe_text_gen
+from app.services.context import estimate_tokens
+
+# 只在首次调用生成服务时导入
+httpx = lazy_import("httpx")
+requests = lazy_import("requests")
+
+# 可以重试的上游状态码（限流、网关错误、服务暂不可用）
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+
+def _parse_stream_line(line: str) -> Optional[str]:
+    """解析生成服务流式返回的一行数据，兼容NDJSON和SSE两种格式"""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("data:"):
+        line = line[len("data:"):].strip()
+        if line == "[DONE]":
+            return None
+    try:
+        chunk = json.loads(line)
+    except ValueError:
+        return line
+    if isinstance(chunk, dict):
+        return chunk.get("token") or chunk.get("generated_text") or None
+    return str(chunk)
+
+
+class TextGenAPI:
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def generate_text(self, prompt, max_length=100):
+        endpoint = f"{self.base_url}/api/generate"
+        payload = {
+            "prompt": prompt,
+            "max_length": max_length
+        }
+        response = requests.post(endpoint, json=payload)
+        if response.status_code == 200:
+            return response.json().get("generated_text")
+        else:
+            raise Exception(f"Error: {response.status_code}, {response.text}")
+
+    def stream_text(self, prompt, max_length=100) -> Iterator[str]:
+        """流式生成文本，生成服务每返回一个片段就立即产出"""
+        endpoint = f"{self.base_url}/api/generate"
+        payload = {
+            "prompt": prompt,
+            "max_length": max_length,
+            "stream": True
+        }
+        with requests.post(endpoint, json=payload, stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(f"Error: {response.status_code}, {response.text}")
+            for line in response.iter_lines(decode_unicode=True):
+                chunk = _parse_stream_line(line)
+                if chunk:
+                    yield chunk
+
+
+class AsyncTextGenAPI:
+    """基于连接池的异步文本生成客户端
+
+    所有请求复用同一个 HTTP/1.1 keep-alive 连接池，每次调用有整体截止时间，
+    失败时按指数退避加随机抖动有限次重试，并通过信号量限制同时发往生成服务的请求数。
+    """
+
+    def __init__(self, base_url, timeout=60.0, max_retries=2, backoff=0.5,
+                 max_concurrency=8, max_connections=16, transport=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        # 延迟到事件循环中再创建，避免连接池和信号量绑定到错误的事件循环
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=self.timeout,
+                transport=self._transport
+            )
+        return self._client
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _remaining(self, deadline: float) -> float:
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError("文本生成请求超时")
+        return remaining
+
+    async def _sleep_before_retry(self, attempt: int, deadline: float) -> None:
+        delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+        await asyncio.sleep(min(delay, self._remaining(deadline)))
+
+    async def _post(self, payload: dict, timeout=None) -> dict:
+        """发送生成请求，按需重试，返回响应的JSON内容"""
+        deadline = asyncio.get_running_loop().time() + (timeout or self.timeout)
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self.client.post(
+                        "/api/generate", json=payload, timeout=self._remaining(deadline)
+                    )
+                except (httpx.TransportError, httpx.TimeoutException):
+                    if attempt == self.max_retries:
+                        raise
+                else:
+                    if response.status_code == 200:
+                        return response.json()
+                    if response.status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                        raise Exception(f"Error: {response.status_code}, {response.text}")
+                await self._sleep_before_retry(attempt, deadline)
+
+    async def generate_text(self, prompt, max_length=100, timeout=None):
+        payload = {
+            "prompt": prompt,
+            "max_length": max_length
+        }
+        with observe_text_gen("generate") as call:
+            result = await self._post(payload, timeout)
+            generated_text = result.get("generated_text")
+            call.tokens = estimate_tokens(generated_text or "")
+        return generated_text
+
+    async def generate_batch(self, prompts: List[str], max_length=100, timeout=None) -> List[str]:
+        """一次请求批量生成多个提示词的回复，返回顺序与 prompts 一致"""
+        payload = {
+            "prompts": prompts,
+            "max_length": max_length
+        }
+        with observe_text_gen("batch") as call:
+            result = await self._post(payload, timeout)
+            generated_texts = result.get("generated_texts") or []
+            if len(generated_texts) != len(prompts):
+                raise Exception(f"Error: expected {len(prompts)} results, got {len(generated_texts)}")
+            call.tokens = sum(estimate_tokens(text) for text in generated_texts)
+        return generated_texts
+
+    async def stream_text(self, prompt, max_length=100, timeout=None) -> AsyncIterator[str]:
+        """流式生成文本；已产出的片段无法重放，因此只在建立连接阶段重试"""
+        payload = {
+            "prompt": prompt,
+            "max_length": max_length,
+            "stream": True
+        }
+        deadline = asyncio.get_running_loop().time() + (timeout or self.timeout)
+        # 生成服务逐 token 推送，每个片段计为一个 token
+        with observe_text_gen("stream") as call:
+            async with self.semaphore:
+                for attempt in range(self.max_retries + 1):
+                    request = self.client.build_request(
+                        "POST", "/api/generate", json=payload, timeout=self._remaining(deadline)
+                    )
+                    try:
+                        response = await self.client.send(request, stream=True)
+                    except (httpx.TransportError, httpx.TimeoutException):
+                        if attempt == self.max_retries:
+                            raise
+                        await self._sleep_before_retry(attempt, deadline)
+                        continue
+
+                    try:
+                        if response.status_code != 200:
+                            await response.aread()
+                            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                                raise Exception(f"Error: {response.status_code}, {response.text}")
+                        else:
+                            async for line in response.aiter_lines():
+                                self._remaining(deadline)
+                                chunk = _parse_stream_line(line)
+                                if chunk:
+                                    call.tokens += 1
+                                    yield chunk
+                            return
+                    finally:
+                        await response.aclose()
+                    await self._sleep_before_retry(attempt, deadline)
+
+    async def warmup(self, connections: int = 1) -> None:
+        """预先建立到生成服务的 keep-alive 连接；只关心连接能否建立，不检查响应状态"""
+        async def connect():
+            response = await self.client.get("/", timeout=5.0)
+            await response.aclose()
+
+        await asyncio.gather(*(connect() for _ in range(min(connections, self.max_connections))))
+
+    async def aclose(self) -> None:
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,69 @@
+import logging
+from typing import Optional
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.lazy import lazy_import
+from app.models.models import User
+
+redis = lazy_import("redis")
+
+logger = logging.getLogger(__name__)
+
+# 不写入进程内缓存和共享 Redis 的字段
+_UNCACHED_FIELDS = {"password_hash"}
+
+
+class UserCache:
+    """按用户ID缓存用户行，先查进程内缓存，再查可选的 Redis 缓存，都未命中时才查询数据库
+
+    缓存中保存的是序列化后的列值，每次读取都会构造新的 User 对象，
+    这些对象不属于任何会话，需要修改用户时应重新从数据库加载。
+    密码哈希不写入缓存（缓存中的 User.password_hash 为 None），校验密码时应查询数据库。
+    """
+
+    def __init__(self, ttl: float = 60.0, max_size: int = 10000,
+                 redis_client: Optional["redis.Redis"] = None, key_prefix: str = "psychat:user:"):
+        self.ttl = ttl
+        self.local = TTLCache(max_size=max_size, ttl=ttl)
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+
+    async def get(self, db: AsyncSession, user_id: int) -> Optional[User]:
+        raw = self.local.get(user_id)
+        if raw is None and self.redis is not None:
+            try:
+                cached = await run_in_threadpool(self.redis.get, f"{self.key_prefix}{user_id}")
+            except redis.RedisError as e:
+                logger.warning("读取 Redis 用户缓存失败: %s", e)
+                cached = None
+            if cached is not None:
+                raw = cached.decode("utf-8")
+                self.local.set(user_id, raw)
+        if raw is not None:
+            return User.parse_raw(raw)
+
+        user = await db.get(User, user_id)
+        if user is not None:
+            await self.set(user)
+        return user
+
+    async def set(self, user: User) -> None:
+        raw = user.json(exclude=_UNCACHED_FIELDS)
+        self.local.set(user.id, raw)
+        if self.redis is not None:
+            try:
+                await run_in_threadpool(self.redis.set, f"{self.key_prefix}{user.id}", raw, ex=int(self.ttl))
+            except redis.RedisError as e:
+                logger.warning("写入 Redis 用户缓存失败: %s", e)
+
+    async def invalidate(self, user_id: int) -> None:
+        """用户信息修改后清除缓存"""
+        self.local.delete(user_id)
+        if self.redis is not None:
+            try:
+                await run_in_threadpool(self.redis.delete, f"{self.key_prefix}{user_id}")
+            except redis.RedisError as e:
+                logger.warning("清除 Redis 用户缓存失败: %s", e)
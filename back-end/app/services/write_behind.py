@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import uuid
+from collections import Counter
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+from sqlalchemy import insert, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core import metrics
+from app.models.models import ChatLog, Log, User
+from app.services.rollup import record_rows
+from app.services.search import index_inserted
+
+logger = logging.getLogger(__name__)
+
+Row = Union[ChatLog, Log]
+
+# 放入队列表示停止的标记
+_STOP = object()
+
+_chat_log_columns = [column.name for column in ChatLog.__table__.columns if column.name != "id"]
+
+
+class WriteBehindQueueFull(Exception):
+    """写入队列已满，调用方应当稍后重试"""
+
+
+async def increment_chat_count(db: AsyncSession, user_id: int, delta: int) -> None:
+    """在当前事务中更新用户的聊天记录数"""
+    await db.execute(update(User).where(User.id == user_id).values(chat_count=User.chat_count + delta))
+
+
+async def insert_chat_logs(db: AsyncSession, chat_logs: List[ChatLog]) -> None:
+    """用一条多行 INSERT 写入聊天记录，并把自增ID回填到各行
+
+    支持 RETURNING 的数据库（PostgreSQL）直接取回ID。其他数据库中同一条 INSERT 分配的ID不一定连续
+    （MySQL 的 auto_increment_increment 大于 1 或 innodb_autoinc_lock_mode = 2 时），不能由 lastrowid 推算：
+    各行带上本批次随机生成的 write_batch，插入后在同一事务中按批次查回ID，同一条语句分配的ID按插入顺序递增。
+    """
+    dialect = db.sync_session.get_bind().dialect
+    if not dialect.full_returning:
+        write_batch = uuid.uuid4().hex
+        for chat_log in chat_logs:
+            chat_log.write_batch = write_batch
+    values = [{name: getattr(chat_log, name) for name in _chat_log_columns} for chat_log in chat_logs]
+    if dialect.full_returning:
+        result = await db.execute(insert(ChatLog).values(values).returning(ChatLog.id))
+        ids = [row[0] for row in result.all()]
+    else:
+        await db.execute(insert(ChatLog).values(values))
+        result = await db.execute(select(ChatLog.id).where(ChatLog.write_batch == write_batch).order_by(ChatLog.id))
+        ids = result.scalars().all()
+    for chat_log, chat_log_id in zip(chat_logs, ids):
+        chat_log.id = chat_log_id
+
+
+async def record_action(db: AsyncSession, write_queue: Optional["WriteBehindQueue"], user_id: int, action: str) -> None:
+    """记录审计日志；启用写入队列时异步批量写入，否则立即提交"""
+    log = Log(user_id=user_id, action=action)
+    if write_queue is not None:
+        await write_queue.add(log, wait=False)
+    else:
+        db.add(log)
+        await record_rows(db, [log])
+        await db.commit()
+
+
+class WriteBehindQueue:
+    """ChatLog / Log 的批量写入队列
+
+    行先进入有界队列，后台任务每 flush_interval 秒或攒满 max_batch_size 行时在一个事务中
+    批量写入：Log 和 ChatLog 都使用多行 INSERT，ChatLog 的自增ID由 insert_chat_logs 回填。
+    需要ID的调用方（wait=True）等待所在批次提交后返回带有ID的行；
+    队列满时等待 put_timeout 秒仍无空位则抛出 WriteBehindQueueFull 进行反压。
+    写入失败的批次最多重试 max_retries 次，仍失败时丢弃并计入 write_behind_dropped_rows_total，
+    等待中的调用方收到异常。stop() 会先写完队列中剩余的行，保证正常关闭时不丢数据。
+    """
+
+    def __init__(self, session_factory: Callable[[], Any], max_batch_size: int = 100,
+                 flush_interval: float = 0.01, max_queue_size: int = 10000, put_timeout: float = 1.0,
+                 max_retries: int = 2, retry_delay: float = 0.1):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def _ensure_worker(self) -> None:
+        # 延迟到事件循环中再创建，避免绑定到错误的事件循环
+        if self._worker is None or self._worker.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            # 由第一个请求触发创建，不能继承该请求的SQL统计上下文
+            self._worker = metrics.create_background_task(self._run())
+
+    async def add(self, row: Row, wait: bool = True) -> Row:
+        """加入写入队列；wait 为 True 时等待写入完成并返回带有ID的行"""
+        if self._stopping:
+            raise WriteBehindQueueFull("写入队列正在关闭")
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future() if wait else None
+        deadline = loop.time() + self.put_timeout
+        while True:
+            try:
+                self._queue.put_nowait((row, future))
+                break
+            except asyncio.QueueFull:
+                if loop.time() >= deadline:
+                    raise WriteBehindQueueFull("写入队列已满")
+                await asyncio.sleep(0.005)
+        if future is None:
+            return row
+        return await future
+
+    async def _collect_batch(self) -> Tuple[List[Tuple[Row, Optional[asyncio.Future]]], bool]:
+        """收集一批待写入的行，返回 (批次, 是否收到停止标记)"""
+        item = await self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.max_batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, 0.001))
+                continue
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self) -> None:
+        while True:
+            batch, stopping = await self._collect_batch()
+            if batch:
+                await self._flush(batch)
+            if stopping:
+                return
+
+    async def _write(self, chat_logs: List[ChatLog], logs: List[Log]) -> None:
+        async with self.session_factory() as db:
+            if logs:
+                await db.execute(insert(Log), [
+                    {"user_id": log.user_id, "action": log.action, "timestamp": log.timestamp}
+                    for log in logs
+                ])
+            if chat_logs:
+                await insert_chat_logs(db, chat_logs)
+                # Core INSERT 不触发 ORM 事件，检索索引需要单独更新
+                await index_inserted(db, ChatLog, chat_logs)
+                for user_id, count in Counter(chat_log.user_id for chat_log in chat_logs).items():
+                    await increment_chat_count(db, user_id, count)
+            await record_rows(db, [*chat_logs, *logs])
+            await db.commit()
+
+    async def _flush(self, batch: List[Tuple[Row, Optional[asyncio.Future]]]) -> None:
+        chat_logs = [row for row, _ in batch if isinstance(row, ChatLog)]
+        logs = [row for row, _ in batch if isinstance(row, Log)]
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._write(chat_logs, logs)
+                break
+            except Exception as e:
+                # 失败的事务已回滚，清掉可能已回填的ID后整批重试
+                for chat_log in chat_logs:
+                    chat_log.id = None
+                    chat_log.write_batch = None
+                if attempt < self.max_retries:
+                    logger.warning("批量写入 %d 行失败，第 %d 次重试: %s", len(batch), attempt + 1, e)
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+                    continue
+                logger.exception("批量写入 %d 行失败，已丢弃", len(batch))
+                metrics.WRITE_BEHIND_DROPPED_ROWS.inc(len(chat_logs), table=ChatLog.__tablename__)
+                metrics.WRITE_BEHIND_DROPPED_ROWS.inc(len(logs), table=Log.__tablename__)
+                for _, future in batch:
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+                return
+        for row, future in batch:
+            if future is not None and not future.done():
+                future.set_result(row)
+
+    async def stop(self) -> None:
+        """停止接收新的行，并写完队列中剩余的行"""
+        self._stopping = True
+        if self._worker is not None and not self._worker.done():
+            await self._queue.put(_STOP)
+            await self._worker
+        self._worker = None
+        # 停止标记之后才入队的行
+        while self._queue is not None and not self._queue.empty():
+            batch = []
+            while not self._queue.empty() and len(batch) < self.max_batch_size:
+                item = self._queue.get_nowait()
+                if item is not _STOP:
+                    batch.append(item)
+            if batch:
+                await self._flush(batch)
@@ -0,0 +1,165 @@
+"""冷启动耗时分析
+
+    python -m app.startup_profile                          # 导入耗时树和首个请求的延迟
+    python -m app.startup_profile --path /api/navigation/  # 指定首个请求的路径（可重复）
+    python -m app.startup_profile --import-budget-ms 800 --first-request-budget-ms 200
+
+每项测量都在新的解释器中进行，结果不受当前进程已导入模块的影响。
+指定预算时任何一项超出都以非零状态码退出，可在 CI 中防止启动耗时回归。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中导入应用并依次发出请求，输出各阶段耗时（毫秒）
+_FIRST_REQUEST_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(app)
+requests = []
+for path in sys.argv[1:]:
+    begin = time.perf_counter()
+    status = client.get(path).status_code
+    first = time.perf_counter()
+    client.get(path)
+    second = time.perf_counter()
+    requests.append({"path": path, "status": status, "first_ms": (first - begin) * 1000, "second_ms": (second - first) * 1000})
+print(json.dumps({"import_ms": (imported - start) * 1000, "requests": requests}))
+"""
+
+
+class ImportNode(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportNode]:
+    """解析 python -X importtime 的输出，按导入完成的顺序返回各模块（子模块排在父模块之前）"""
+    nodes = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        nodes.append(ImportNode(name.strip(), int(self_us), int(cumulative_us), depth))
+    return nodes
+
+
+def build_tree(nodes: List[ImportNode]) -> List[Tuple[ImportNode, list]]:
+    """把按完成顺序输出的导入记录还原为树，返回 [(模块, 子树列表)]，子模块按导入顺序排列"""
+    pending: Dict[int, list] = {}
+    for node in nodes:
+        children = pending.pop(node.depth + 1, [])
+        pending.setdefault(node.depth, []).append((node, children))
+    return pending.get(0, [])
+
+
+def import_tree(nodes: List[ImportNode], root: str, max_depth: int = 3, min_ms: float = 5.0) -> List[str]:
+    """root 模块的导入耗时树，只列出累计耗时不低于 min_ms 的模块"""
+    lines: List[str] = []
+
+    def render(subtree, depth: int) -> None:
+        node, children = subtree
+        if depth > max_depth or node.cumulative_us < min_ms * 1000:
+            return
+        lines.append(f"{'  ' * depth}{node.module}  {node.cumulative_us / 1000:.1f} ms (自身 {node.self_us / 1000:.1f} ms)")
+        for child in children:
+            render(child, depth + 1)
+
+    def find(subtrees):
+        for subtree in subtrees:
+            if subtree[0].module == root:
+                return subtree
+            found = find(subtree[1])
+            if found is not None:
+                return found
+        return None
+
+    subtree = find(build_tree(nodes))
+    if subtree is not None:
+        render(subtree, 0)
+    return lines
+
+
+def profile_imports(module: str = "app.main") -> List[ImportNode]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def profile_first_requests(paths: List[str]) -> Dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _FIRST_REQUEST_SCRIPT, *paths],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def check_budget(import_ms: float, first_request_ms: float, import_budget_ms: Optional[float],
+                 first_request_budget_ms: Optional[float]) -> List[str]:
+    """返回超出预算的项目说明，为空表示全部在预算内"""
+    failures = []
+    if import_budget_ms is not None and import_ms > import_budget_ms:
+        failures.append(f"导入耗时 {import_ms:.0f} ms 超出预算 {import_budget_ms:.0f} ms")
+    if first_request_budget_ms is not None and first_request_ms > first_request_budget_ms:
+        failures.append(f"首个请求耗时 {first_request_ms:.0f} ms 超出预算 {first_request_budget_ms:.0f} ms")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="分析应用冷启动耗时")
+    parser.add_argument("--module", default="app.main", help="展示导入耗时树的模块")
+    parser.add_argument("--path", action="append", dest="paths", help="首个请求的路径，默认 /")
+    parser.add_argument("--depth", type=int, default=3, help="导入树显示的最大深度")
+    parser.add_argument("--min-ms", type=float, default=5.0, help="只显示累计导入耗时不低于该值的模块")
+    parser.add_argument("--import-budget-ms", type=float, default=None)
+    parser.add_argument("--first-request-budget-ms", type=float, default=None)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    nodes = profile_imports(args.module)
+    # -X importtime 本身有额外开销，预算按不带它的实际导入耗时计算
+    requests = profile_first_requests(args.paths or ["/"])
+    import_ms = requests["import_ms"]
+    first_request_ms = max((request["first_ms"] for request in requests["requests"]), default=0.0)
+    failures = check_budget(import_ms, first_request_ms, args.import_budget_ms, args.first_request_budget_ms)
+
+    if args.json:
+        print(json.dumps({
+            "import_ms": import_ms,
+            "slowest_imports": [
+                {"module": node.module, "self_ms": node.self_us / 1000, "cumulative_ms": node.cumulative_us / 1000}
+                for node in sorted(nodes, key=lambda node: node.self_us, reverse=True)[:20]
+            ],
+            "requests": requests["requests"],
+            "failures": failures,
+        }, ensure_ascii=False, indent=2))
+    else:
+        print(f"导入 app.main: {import_ms:.1f} ms\n\n导入耗时树（-X importtime）:")
+        for line in import_tree(nodes, args.module, args.depth, args.min_ms):
+            print("  " + line)
+        print("\n自身耗时最多的模块:")
+        for node in sorted(nodes, key=lambda node: node.self_us, reverse=True)[:10]:
+            print(f"  {node.module}  {node.self_us / 1000:.1f} ms")
+        print("\n首个请求（新进程，不触发 startup 事件）:")
+        for request in requests["requests"]:
+            print(f"  GET {request['path']} -> {request['status']}  首次 {request['first_ms']:.1f} ms，再次 {request['second_ms']:.1f} ms")
+        for failure in failures:
+            print(f"\n超出预算: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import pytest
+from fastapi import FastAPI
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.api import chat, deps
+from app.core.db import SyncSessionAdapter
+from app.services.fake_text_gen import FakeTextGenAPI
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    """内存数据库上的会话，测试结束后删除数据表"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture(name="chat_app")
+def chat_app_fixture():
+    """创建挂载聊天路由的测试应用
+
+    当前用户固定为 user，生成服务默认使用 FakeTextGenAPI，不启用回复缓存和对话上下文；
+    传入 session 时请求使用该会话，否则使用 db.session_scope。
+    """
+    def make(user, session=None, text_gen_api=None) -> FastAPI:
+        text_gen_api = text_gen_api or FakeTextGenAPI()
+        app = FastAPI()
+        app.include_router(chat.router, prefix="/api/chat")
+        if session is not None:
+            app.dependency_overrides[deps.get_db] = lambda: SyncSessionAdapter(session)
+        app.dependency_overrides[deps.get_current_active_user] = lambda: user
+        app.dependency_overrides[deps.get_text_gen_api] = lambda: text_gen_api
+        app.dependency_overrides[deps.get_response_cache] = lambda: None
+        app.dependency_overrides[deps.get_conversation_context] = lambda: None
+        return app
+
+    return make
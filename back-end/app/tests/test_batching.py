@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app.services.batching import BatchingTextGenAPI
+from app.services.fake_text_gen import FakeTextGenAPI
+
+
+def test_concurrent_prompts_are_batched():
+    """测试并发请求被合并为一次批量生成"""
+    backend = FakeTextGenAPI()
+
+    async def run():
+        api = BatchingTextGenAPI(backend, max_batch_size=4, max_wait=0.05)
+        try:
+            return await asyncio.gather(*(api.generate_text(f"消息{i}") for i in range(4)))
+        finally:
+            await api.aclose()
+
+    results = asyncio.run(run())
+    assert results == [backend.reply(f"消息{i}") for i in range(4)]
+    assert backend.batch_sizes == [4]
+
+
+def test_batch_flushes_after_max_wait():
+    """测试未凑满一批时等待 max_wait 后发出"""
+    backend = FakeTextGenAPI()
+
+    async def run():
+        api = BatchingTextGenAPI(backend, max_batch_size=8, max_wait=0.01)
+        try:
+            return await api.generate_text("你好")
+        finally:
+            await api.aclose()
+
+    assert asyncio.run(run()) == backend.reply("你好")
+    assert backend.batch_sizes == [1]
+
+
+def test_high_priority_and_matching_params_batched_first():
+    """测试高优先级请求先于排队中的低优先级请求组批，且只合并生成参数相同的请求"""
+    backend = FakeTextGenAPI()
+    batches = []
+
+    async def generate_batch(prompts, max_length=100, timeout=None):
+        batches.append((list(prompts), max_length))
+        return [backend.reply(prompt) for prompt in prompts]
+
+    backend.generate_batch = generate_batch
+
+    async def run():
+        api = BatchingTextGenAPI(backend, max_batch_size=2, max_wait=0.01)
+        try:
+            await asyncio.gather(
+                api.generate_text("low", priority="low"),
+                api.generate_text("short", max_length=10),
+                api.generate_text("low2", priority="low"),
+                api.generate_text("high", priority="high"),
+            )
+        finally:
+            await api.aclose()
+
+    asyncio.run(run())
+    assert batches[0] == (["high", "low"], 100)
+    assert batches[1] == (["short"], 10)
+    assert batches[2] == (["low2"], 100)
+
+
+def test_backend_error_propagates_to_callers():
+    """测试批量生成失败时每个调用方都收到异常"""
+    backend = FakeTextGenAPI()
+
+    async def generate_batch(prompts, max_length=100, timeout=None):
+        raise Exception("Error: 503, busy")
+
+    backend.generate_batch = generate_batch
+
+    async def run():
+        api = BatchingTextGenAPI(backend, max_batch_size=2, max_wait=0.01)
+        try:
+            return await asyncio.gather(api.generate_text("a"), api.generate_text("b"), return_exceptions=True)
+        finally:
+            await api.aclose()
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, Exception) for result in results)
+
+
+def test_aclose_fails_queued_requests():
+    """测试关闭时仍在排队的请求收到异常，不会一直等待"""
+    backend = FakeTextGenAPI()
+
+    async def run():
+        api = BatchingTextGenAPI(backend, max_batch_size=8, max_wait=10)
+        await api.warmup()
+        pending = asyncio.ensure_future(api.generate_text("你好"))
+        await asyncio.sleep(0.01)
+        await api.aclose()
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(pending, 1)
+
+    asyncio.run(run())
+    assert backend.batch_sizes == []
+
+
+
+def test_unknown_priority():
+    """测试未知优先级"""
+    api = BatchingTextGenAPI(FakeTextGenAPI())
+    with pytest.raises(ValueError):
+        asyncio.run(api.generate_text("a", priority="urgent"))
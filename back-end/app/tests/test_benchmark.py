@@ -0,0 +1,28 @@
+from benchmarks.load_test import compare_to_baseline, percentile, summarize
+
+
+def test_percentile_nearest_rank():
+    values = [i / 1000 for i in range(1, 101)]
+    assert percentile(values, 50) == 0.05
+    assert percentile(values, 99) == 0.099
+    assert percentile([], 95) == 0.0
+
+
+def test_summarize_reports_milliseconds_and_throughput():
+    summary = summarize([0.01, 0.02, 0.03, 0.04], errors=1, elapsed=2.0)
+    assert summary["requests"] == 5
+    assert summary["errors"] == 1
+    assert summary["throughput_rps"] == 2.0
+    assert summary["p50_ms"] == 20.0
+    assert summary["p99_ms"] == 40.0
+
+
+def test_compare_to_baseline_flags_regressions_beyond_tolerance():
+    baseline = {"GET /api/chat/history@c8": {"errors": 0, "throughput_rps": 100.0, "p95_ms": 20.0}}
+    within = {"GET /api/chat/history@c8": {"errors": 0, "throughput_rps": 90.0, "p95_ms": 23.0}}
+    slower = {"GET /api/chat/history@c8": {"errors": 2, "throughput_rps": 70.0, "p95_ms": 30.0}}
+
+    assert compare_to_baseline(within, baseline, tolerance=0.2) == []
+    assert len(compare_to_baseline(slower, baseline, tolerance=0.2)) == 3
+    # 本次未压测的路由不参与比较
+    assert compare_to_baseline({}, baseline, tolerance=0.2) == []
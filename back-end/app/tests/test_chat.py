@@ -0,0 +1,141 @@
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.api import deps
+from app.models.models import User, ChatLog
+from app.services.context import ConversationContext
+from app.services.fake_text_gen import FakeTextGenAPI
+from app.services.response_cache import ResponseCache
+from app.services.text_gen import _parse_stream_line
+
+
+def parse_events(body: str):
+    """把SSE响应体解析为 (event, data) 列表"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture(name="client")
+def client_fixture(session, chat_app):
+    """创建挂载聊天路由的测试客户端"""
+    user = User(email="streamuser@example.com", username="streamuser", password_hash="x")
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    app = chat_app(user, session, FakeTextGenAPI(chunks=["你好", "，", "我在听"]))
+    return TestClient(app), session, user
+
+
+def test_parse_stream_line():
+    """测试流式数据行的解析"""
+    assert _parse_stream_line('{"token": "你"}') == "你"
+    assert _parse_stream_line('data: {"token": "好"}') == "好"
+    assert _parse_stream_line("data: [DONE]") is None
+    assert _parse_stream_line("") is None
+
+
+def test_stream_message(client):
+    """测试SSE流式回复并在结束时写入聊天记录"""
+    test_client, session, user = client
+    response = test_client.post("/api/chat/stream", json={"message": "我很焦虑"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_events(response.text)
+    assert [data["text"] for event, data in events if event == "token"] == ["你好", "，", "我在听"]
+    event, data = events[-1]
+    assert event == "done"
+    assert data["response"] == "你好，我在听"
+
+    chat_logs = session.exec(select(ChatLog).where(ChatLog.user_id == user.id)).all()
+    assert len(chat_logs) == 1
+    assert chat_logs[0].id == data["id"]
+
+
+def test_send_message(client):
+    """测试非流式发送消息"""
+    test_client, session, user = client
+    response = test_client.post("/api/chat/send", json={"message": "睡不着怎么办"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["response"] == "你好，我在听"
+    assert data["user_id"] == user.id
+
+
+
+def test_send_with_history_skips_response_cache(client):
+    """测试回复缓存以用户本次的消息为键，拼入历史对话的请求不读写共享缓存"""
+    test_client, session, user = client
+    cache = ResponseCache(max_size=8, ttl=60, similarity_threshold=0.6)
+    test_client.app.dependency_overrides[deps.get_response_cache] = lambda: cache
+    test_client.app.dependency_overrides[deps.get_conversation_context] = lambda: ConversationContext()
+
+    assert test_client.post("/api/chat/send", json={"message": "睡不着怎么办"}).status_code == 200
+    assert cache.stats() == {"hits": 0, "misses": 1, "similar_hits": 0, "size": 1}
+    # 第二条消息的提示词带有第一轮对话，不使用缓存
+    assert test_client.post("/api/chat/send", json={"message": "睡不着怎么办"}).status_code == 200
+    assert cache.stats()["hits"] == 0 and cache.stats()["misses"] == 1
+
+def test_history_cursor_pagination(client):
+    """测试游标分页按时间倒序遍历全部记录，并返回维护的总数"""
+    test_client, session, user = client
+    for i in range(5):
+        assert test_client.post("/api/chat/send", json={"message": f"消息{i}"}).status_code == 200
+
+    messages, cursor = [], None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = test_client.get("/api/chat/history/page", params=params)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 5
+        messages += [chat["message"] for chat in data["chats"]]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert messages == [f"消息{i}" for i in reversed(range(5))]
+
+    chat_id = test_client.get("/api/chat/history/page").json()["chats"][0]["id"]
+    assert test_client.delete(f"/api/chat/history/{chat_id}").status_code == 204
+    assert test_client.get("/api/chat/history/page").json()["total"] == 4
+
+
+def test_history_invalid_cursor(client):
+    """测试无效游标"""
+    test_client, session, user = client
+    response = test_client.get("/api/chat/history/page", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_export_chat_history(client):
+    """测试以NDJSON、CSV和gzip格式导出聊天历史"""
+    test_client, session, user = client
+    for i in range(3):
+        test_client.post("/api/chat/send", json={"message": f"消息{i}"})
+
+    response = test_client.get("/api/chat/export")
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["message"] for row in rows] == ["消息0", "消息1", "消息2"]
+
+    response = test_client.get("/api/chat/export", params={"format": "csv"})
+    lines = response.content.decode("utf-8-sig").splitlines()
+    assert lines[0] == "id,message,response,timestamp"
+    assert len(lines) == 4
+
+    response = test_client.get("/api/chat/export", params={"compress": True, "start": rows[1]["timestamp"]})
+    assert response.headers["content-type"] == "application/gzip"
+    exported = gzip.decompress(response.content).decode("utf-8").splitlines()
+    assert [json.loads(line)["message"] for line in exported] == ["消息1", "消息2"]
+
+    response = test_client.get("/api/chat/export", params={"user_id": user.id + 1})
+    assert response.status_code == 403
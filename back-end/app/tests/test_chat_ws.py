@@ -0,0 +1,189 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+from starlette.websockets import WebSocketDisconnect
+
+from app.api import chat, deps
+from app.core.db import SyncSessionAdapter
+from app.core.lifecycle import StreamDrainer
+from app.core.security import create_access_token
+from app.models.models import User, ChatLog
+from app.services.batching import BatchingTextGenAPI
+from app.services.fake_text_gen import FakeTextGenAPI
+from app.services.push import PushHub
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+
+class SlowTextGenAPI:
+    """按片段返回固定回复的生成服务，每段之间可以等待"""
+
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+
+    async def generate_text(self, prompt, max_length=100):
+        return "".join(self.chunks)
+
+    async def stream_text(self, prompt, max_length=100):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield chunk
+
+
+def receive_until(websocket, kind):
+    """读取消息直到出现指定类型，返回读到的全部消息"""
+    frames = []
+    while not frames or frames[-1]["type"] != kind:
+        frames.append(websocket.receive_json())
+    return frames
+
+
+@pytest.fixture(name="client")
+def client_fixture():
+    """创建挂载聊天路由的测试客户端，返回 (客户端, 会话, 用户, token, 依赖对象)"""
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(email="wsuser@example.com", username="wsuser", password_hash="x")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+
+        @asynccontextmanager
+        async def session_factory():
+            yield SyncSessionAdapter(session)
+
+        services = {"text_gen": SlowTextGenAPI(["你好", "，", "我在听"]), "drainer": StreamDrainer(timeout=5), "hub": PushHub()}
+        app = FastAPI()
+        app.include_router(chat.router, prefix="/api/chat")
+        app.dependency_overrides[deps.get_db] = lambda: SyncSessionAdapter(session)
+        app.dependency_overrides[deps.get_session_factory] = lambda: session_factory
+        app.dependency_overrides[deps.get_current_active_user] = lambda: user
+        app.dependency_overrides[deps.get_text_gen_api] = lambda: services["text_gen"]
+        app.dependency_overrides[deps.get_response_cache] = lambda: None
+        app.dependency_overrides[deps.get_conversation_context] = lambda: None
+        app.dependency_overrides[deps.get_stream_drainer] = lambda: services["drainer"]
+        app.dependency_overrides[deps.get_push_hub] = lambda: services["hub"]
+        yield TestClient(app), session, user, create_access_token(user.id), services
+    SQLModel.metadata.drop_all(engine)
+
+
+def test_ws_streams_reply_and_saves_chat_log(client):
+    """测试连接时认证，按消息ID流式返回回复并写入聊天记录"""
+    test_client, session, user, token, _ = client
+    with test_client.websocket_connect(f"/api/chat/ws?token={token}") as websocket:
+        assert websocket.receive_json()["type"] == "ready"
+        websocket.send_json({"type": "message", "id": "m1", "message": "我很焦虑"})
+        frames = receive_until(websocket, "done")
+
+    assert [frame["text"] for frame in frames if frame["type"] == "token"] == ["你好", "，", "我在听"]
+    assert all(frame["id"] == "m1" for frame in frames)
+    chat_logs = session.exec(select(ChatLog).where(ChatLog.user_id == user.id)).all()
+    assert len(chat_logs) == 1
+    assert frames[-1]["chat"]["id"] == chat_logs[0].id
+
+
+def test_ws_reply_is_batched_at_high_priority(client):
+    """测试启用批处理时 WebSocket 回复以 high 优先级参与组批，整条回复作为一段发送"""
+    test_client, _, _, token, services = client
+    api = BatchingTextGenAPI(FakeTextGenAPI(chunks=["你好", "，", "我在听"]), max_wait=0.001)
+    priorities = []
+    generate_text = api.generate_text
+
+    async def recording_generate_text(prompt, max_length=100, priority="normal"):
+        priorities.append(priority)
+        try:
+            return await generate_text(prompt, max_length=max_length, priority=priority)
+        finally:
+            # 调度任务属于该连接的事件循环，在循环结束前关闭
+            await api.aclose()
+
+    api.generate_text = recording_generate_text
+    services["text_gen"] = api
+    with test_client.websocket_connect(f"/api/chat/ws?token={token}") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"type": "message", "id": "m1", "message": "我很焦虑"})
+        frames = receive_until(websocket, "done")
+
+    assert [frame["text"] for frame in frames if frame["type"] == "token"] == ["你好，我在听"]
+    assert priorities == ["high"]
+
+def test_ws_rejects_invalid_token(client):
+    """测试首条 auth 消息中的 token 无效时以 1008 关闭连接"""
+    test_client = client[0]
+    with test_client.websocket_connect("/api/chat/ws") as websocket:
+        websocket.send_json({"type": "auth", "token": "invalid"})
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            websocket.receive_json()
+    assert exc_info.value.code == 1008
+
+
+def test_ws_cancel_stops_reply(client):
+    """测试取消进行中的回复后连接仍可继续使用，且不写入聊天记录"""
+    test_client, session, user, token, services = client
+    services["text_gen"] = SlowTextGenAPI(["一"] * 100, delay=0.05)
+    with test_client.websocket_connect(f"/api/chat/ws?token={token}") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"type": "message", "id": "m1", "message": "说很长的话"})
+        websocket.send_json({"type": "cancel", "id": "m1"})
+        assert receive_until(websocket, "cancelled")[-1]["id"] == "m1"
+        websocket.send_json({"type": "ping"})
+        assert receive_until(websocket, "pong")[-1] == {"type": "pong"}
+
+    assert session.exec(select(ChatLog)).all() == []
+
+
+def test_ws_receives_chats_from_other_connections(client):
+    """测试同一用户在其他连接和HTTP接口上的对话会推送到当前连接"""
+    test_client, _, _, token, _ = client
+    with test_client.websocket_connect(f"/api/chat/ws?token={token}") as first, \
+            test_client.websocket_connect(f"/api/chat/ws?token={token}") as second:
+        first.receive_json()
+        second.receive_json()
+        first.send_json({"type": "message", "id": "m1", "message": "你好"})
+        assert "chat" not in [frame["type"] for frame in receive_until(first, "done")]
+        pushed = second.receive_json()
+        assert pushed["type"] == "chat" and pushed["chat"]["message"] == "你好"
+
+        assert test_client.post("/api/chat/send", json={"message": "睡不着"}).status_code == 200
+        assert first.receive_json()["chat"]["message"] == "睡不着"
+        assert second.receive_json()["chat"]["message"] == "睡不着"
+
+
+def test_ws_closes_with_service_restart_when_draining(client):
+    """测试停机开始后连接以 1012 关闭，新连接直接被拒绝"""
+    test_client, _, _, token, services = client
+    with test_client.websocket_connect(f"/api/chat/ws?token={token}") as websocket:
+        websocket.receive_json()
+        services["drainer"].begin()
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            websocket.receive_json()
+    assert exc_info.value.code == 1012
+
+    with pytest.raises(WebSocketDisconnect):
+        test_client.websocket_connect(f"/api/chat/ws?token={token}")
+
+
+def test_push_hub_excludes_origin_and_ignores_own_broadcast():
+    """测试推送跳过发起方连接，并忽略本进程自己经 Redis 发出的消息"""
+    async def run():
+        hub = PushHub()
+        received = {"a": [], "b": []}
+        hub.register(1, "a", received["a"].append)
+        hub.register(1, "b", received["b"].append)
+        await hub.publish(1, {"type": "chat"}, exclude="a")
+        hub._on_message({"data": f'{{"origin": "{hub._origin}", "user_id": 1, "payload": {{}}}}'})
+        hub.unregister(1, "a")
+        hub.unregister(1, "b")
+        return received, hub.connection_count()
+
+    assert asyncio.run(run()) == ({"a": [], "b": [{"type": "chat"}]}, 0)
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.models import User, ChatLog
+from app.services.context import ConversationContext, estimate_tokens
+
+# 创建异步内存数据库用于测试
+engine = create_async_engine(
+    "sqlite+aiosqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def add_chat_log(session, message, response):
+    session.add(ChatLog(user_id=1, message=message, response=response))
+    await session.commit()
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    """创建带有两轮历史对话的数据库会话"""
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        session = async_session()
+        session.add(User(email="contextuser@example.com", username="contextuser", password_hash="x"))
+        await session.commit()
+        await add_chat_log(session, "我最近失眠", "失眠多久了？")
+        await add_chat_log(session, "两周了", "有什么压力吗？")
+        return session
+
+    async def teardown(session):
+        await session.close()
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.drop_all)
+
+    session = asyncio.run(setup())
+    yield session
+    asyncio.run(teardown(session))
+
+
+def test_estimate_tokens():
+    """测试token估算"""
+    assert estimate_tokens("你好") == 2
+    assert estimate_tokens("hello world!") == 3
+
+
+def test_build_prompt_includes_history(session):
+    """测试提示词中按顺序包含历史对话"""
+    context = ConversationContext(max_turns=10, token_budget=1024)
+    prompt = asyncio.run(context.build_prompt(session, 1, "工作压力很大"))
+    assert prompt == "\n".join([
+        "用户: 我最近失眠", "助手: 失眠多久了？",
+        "用户: 两周了", "助手: 有什么压力吗？",
+        "用户: 工作压力很大", "助手:",
+    ])
+
+
+def test_window_is_updated_incrementally(session):
+    """测试窗口命中后不再读库，新记录增量追加"""
+    context = ConversationContext(max_turns=2, token_budget=1024)
+
+    async def run():
+        await context.build_prompt(session, 1, "你好")
+        # 直接写库的记录不会出现在已缓存的窗口中，说明没有重新查询
+        await add_chat_log(session, "未追加", "未追加")
+        await context.append(1, "工作压力很大", "可以具体说说吗？")
+        prompt = await context.build_prompt(session, 1, "好的")
+        await context.invalidate(1)
+        return prompt, await context.build_prompt(session, 1, "好的")
+
+    prompt, reloaded = asyncio.run(run())
+    assert "未追加" not in prompt
+    assert "我最近失眠" not in prompt
+    assert "用户: 两周了" in prompt
+    assert "用户: 工作压力很大\n助手: 可以具体说说吗？" in prompt
+    assert "未追加" in reloaded
+
+
+def test_history_trimmed_to_token_budget(session):
+    """测试历史超出token预算时只保留最近的几轮"""
+    context = ConversationContext(max_turns=10, token_budget=20)
+    prompt = asyncio.run(context.build_prompt(session, 1, "嗯"))
+    assert "我最近失眠" not in prompt
+    assert prompt.startswith("用户: 两周了")
@@ -0,0 +1,107 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.api import deps, users
+from app.core.config import Settings, settings
+from app.core.db import SyncSessionAdapter
+from app.core.hashing import PasswordHasher, PasswordHasherBusy, calibrate_rounds, hash_password, verify_and_update
+from app.models.models import User
+from app.server import configure_password_rounds
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+
+def test_verify_and_update_rehashes_when_cost_changes():
+    hashed = hash_password("secret", 4)
+    assert verify_and_update("secret", hashed, 4) == (True, None)
+
+    verified, new_hash = verify_and_update("secret", hashed, 5)
+    assert verified
+    assert new_hash.startswith("$2b$05$")
+    assert verify_and_update("wrong", hashed, 5) == (False, None)
+
+
+def test_verify_and_update_keeps_higher_cost_hash():
+    """存储的 cost 高于配置时不重写，cost 不同的 worker 之间不会来回改写哈希"""
+    hashed = hash_password("secret", 6)
+    assert verify_and_update("secret", hashed, 5) == (True, None)
+
+
+def test_calibrate_rounds_is_bounded():
+    assert calibrate_rounds(0.001) == 10
+    assert calibrate_rounds(10 ** 9) == 16
+
+
+def test_launcher_calibrates_rounds_once_for_all_workers(monkeypatch):
+    """启动入口校准后写回固定的 cost，worker 中不再各自校准"""
+    monkeypatch.setenv("PASSWORD_BCRYPT_ROUNDS", "12")
+    monkeypatch.setenv("PASSWORD_HASH_TARGET_MS", "0")
+    monkeypatch.setattr(settings, "PASSWORD_BCRYPT_ROUNDS", 12)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_TARGET_MS", 10 ** 9)
+
+    assert configure_password_rounds() == 16
+    assert settings.PASSWORD_HASH_TARGET_MS == 0
+    assert os.environ["PASSWORD_BCRYPT_ROUNDS"] == "16"
+    assert os.environ["PASSWORD_HASH_TARGET_MS"] == "0"
+    assert Settings().PASSWORD_BCRYPT_ROUNDS == 16
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_password_hasher_runs_in_executor(executor):
+    hasher = PasswordHasher(rounds=4, executor=executor, max_workers=1)
+
+    async def run():
+        hashed = await hasher.hash("secret")
+        return await hasher.verify("secret", hashed)
+
+    try:
+        assert asyncio.run(run()) == (True, None)
+    finally:
+        hasher.shutdown()
+
+
+def test_password_hasher_rejects_when_backlog_full():
+    hasher = PasswordHasher(rounds=4, executor="thread", max_pending=0)
+    with pytest.raises(PasswordHasherBusy):
+        asyncio.run(hasher.hash("secret"))
+
+
+def test_login_rehashes_with_new_cost():
+    """bcrypt cost 调整后，用户登录时透明地按新 cost 重新哈希"""
+    SQLModel.metadata.create_all(engine)
+    hasher = PasswordHasher(rounds=5, executor="thread")
+    try:
+        with Session(engine) as session:
+            user = User(email="rehash@example.com", username="rehash", password_hash=hash_password("secret", 4))
+            session.add(user)
+            session.commit()
+
+            app = FastAPI()
+            app.include_router(users.router, prefix="/api")
+            app.dependency_overrides[deps.get_db] = lambda: SyncSessionAdapter(session)
+            app.dependency_overrides[deps.get_password_hasher] = lambda: hasher
+            app.dependency_overrides[deps.get_write_queue] = lambda: None
+            client = TestClient(app)
+
+            response = client.post("/api/login", json={"email": "rehash@example.com", "password": "secret"})
+            assert response.status_code == 200
+            session.refresh(user)
+            assert user.password_hash.startswith("$2b$05$")
+
+            busy = PasswordHasher(rounds=5, executor="thread", max_pending=0)
+            app.dependency_overrides[deps.get_password_hasher] = lambda: busy
+            response = client.post("/api/login", json={"email": "rehash@example.com", "password": "secret"})
+            assert response.status_code == 503
+    finally:
+        hasher.shutdown()
+        SQLModel.metadata.drop_all(engine)
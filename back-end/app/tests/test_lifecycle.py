@@ -0,0 +1,75 @@
+import asyncio
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.core.lifecycle import StreamDrainer, StreamInterrupted
+from app.main import create_app
+from app.server import configure_workers, worker_count
+
+
+def test_app_factory_registers_routes():
+    paths = {route.path for route in create_app().routes}
+    assert {"/api/login", "/api/chat/stream", "/api/navigation/", "/metrics"} <= paths
+
+
+def test_worker_count_prefers_explicit_value():
+    assert worker_count(3) == 3
+    assert worker_count() >= 1
+
+
+def test_multi_worker_launch_shares_conversation_context(monkeypatch):
+    """测试启动多个 worker 时对话窗口默认使用 Redis，显式配置优先"""
+    monkeypatch.setenv("WEB_CONCURRENCY", "0")
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 0)
+    monkeypatch.setattr(settings, "CHAT_CONTEXT_USE_REDIS", None)
+    assert not settings.chat_context_use_redis
+
+    assert configure_workers(4) == 4
+    assert os.environ["WEB_CONCURRENCY"] == "4"
+    assert settings.chat_context_use_redis
+    monkeypatch.setattr(settings, "CHAT_CONTEXT_USE_REDIS", False)
+    assert not settings.chat_context_use_redis
+
+
+def test_stream_passes_items_through():
+    async def source():
+        for i in range(3):
+            yield i
+
+    async def collect():
+        drainer = StreamDrainer(timeout=1)
+        items = [item async for item in drainer.stream(source())]
+        return items, drainer.active
+
+    assert asyncio.run(collect()) == ([0, 1, 2], 0)
+
+
+def test_stalled_stream_is_interrupted_after_drain_timeout():
+    closed = []
+
+    async def source():
+        try:
+            yield "a"
+            await asyncio.sleep(60)
+            yield "b"
+        finally:
+            closed.append(True)
+
+    async def consume():
+        drainer = StreamDrainer(timeout=0.05)
+        items = []
+        with pytest.raises(StreamInterrupted):
+            async for item in drainer.stream(source()):
+                items.append(item)
+                drainer.begin()
+        assert drainer.draining and drainer.active == 0
+        # 期限过后新的流立即结束
+        with pytest.raises(StreamInterrupted):
+            async for _ in drainer.stream(source()):
+                pass
+        return items
+
+    assert asyncio.run(consume()) == ["a"]
+    assert closed == [True]
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel
+
+from app.core import metrics
+from app.core.db import SyncSessionAdapter
+from app.models.models import Log, User
+from app.services.write_behind import WriteBehindQueue
+from app.services.text_gen import AsyncTextGenAPI
+
+
+def test_registry_renders_prometheus_text():
+    registry = metrics.Registry()
+    counter = registry.counter("demo_total", "示例计数", ("kind",))
+    histogram = registry.histogram("demo_seconds", "示例耗时", ("route",), buckets=(0.1, 1.0))
+    counter.inc(2, kind='a"b')
+    histogram.observe(0.05, route="/x")
+    histogram.observe(0.5, route="/x")
+    histogram.observe(3.0, route="/x")
+
+    output = registry.render()
+    assert "# TYPE demo_total counter" in output
+    assert 'demo_total{kind="a\\"b"} 2' in output
+    # 桶计数是累计值
+    assert 'demo_seconds_bucket{route="/x",le="0.1"} 1' in output
+    assert 'demo_seconds_bucket{route="/x",le="1.0"} 2' in output
+    assert 'demo_seconds_bucket{route="/x",le="+Inf"} 3' in output
+    assert 'demo_seconds_count{route="/x"} 3' in output
+
+
+def make_app(slow_request_ms=0):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    metrics.instrument_engine(engine)
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT :id"), {"id": item_id})
+        return {"id": item_id}
+
+    app.add_middleware(metrics.MetricsMiddleware, slow_request_ms=slow_request_ms)
+    return app
+
+
+def test_middleware_records_route_template_and_queries():
+    client = TestClient(make_app())
+    labels = {"method": "GET", "route": "/items/{item_id}"}
+    before = metrics.REQUEST_DB_QUERIES.sum(**labels)
+    before_duration = metrics.REQUEST_DURATION.count(status="200", **labels)
+
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items/2").status_code == 200
+    assert client.get("/missing/3").status_code == 404
+
+    assert metrics.REQUEST_DURATION.count(status="200", **labels) == before_duration + 2
+    assert metrics.REQUEST_DB_QUERIES.sum(**labels) == before + 4
+    assert metrics.REQUEST_DURATION.count(method="GET", route="unmatched", status="404") >= 1
+
+
+def test_slow_request_logs_sql_trace(caplog):
+    client = TestClient(make_app(slow_request_ms=0.001))
+    with caplog.at_level(logging.WARNING, logger="app.core.metrics"):
+        client.get("/items/7")
+    assert "慢请求 GET /items/7" in caplog.text
+    assert "SELECT ?" in caplog.text
+
+
+def test_text_gen_records_latency_and_tokens():
+    def handler(request):
+        if b"fail" in request.content:
+            return httpx.Response(400, text="bad")
+        return httpx.Response(200, json={"generated_text": "你好世界"})
+
+    async def run():
+        api = AsyncTextGenAPI("http://textgen", transport=httpx.MockTransport(handler), backoff=0)
+        try:
+            await api.generate_text("hi")
+            try:
+                await api.generate_text("fail")
+            except Exception:
+                pass
+        finally:
+            await api.aclose()
+
+    ok = metrics.TEXT_GEN_DURATION.count(operation="generate", outcome="ok")
+    errors = metrics.TEXT_GEN_DURATION.count(operation="generate", outcome="error")
+    tokens = metrics.TEXT_GEN_TOKENS.value(operation="generate")
+    asyncio.run(run())
+    assert metrics.TEXT_GEN_DURATION.count(operation="generate", outcome="ok") == ok + 1
+    assert metrics.TEXT_GEN_DURATION.count(operation="generate", outcome="error") == errors + 1
+    assert metrics.TEXT_GEN_TOKENS.value(operation="generate") == tokens + 4
+
+
+def test_background_worker_does_not_count_towards_request():
+    """测试由请求触发创建的写入队列后台任务执行的SQL不计入该请求"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    metrics.instrument_engine(engine)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(email="metrics@example.com", username="metrics", password_hash="x"))
+        session.commit()
+
+    @asynccontextmanager
+    async def session_factory():
+        with Session(engine) as session:
+            yield SyncSessionAdapter(session)
+
+    queue = WriteBehindQueue(session_factory, flush_interval=0)
+    seen = []
+    app = FastAPI()
+
+    @app.post("/actions")
+    async def add_action():
+        seen.append(metrics.current_request_stats())
+        await queue.add(Log(user_id=1, action="first"), wait=False)
+        return {}
+
+    app.add_middleware(metrics.MetricsMiddleware, slow_request_ms=0.001)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            assert (await client.post("/actions")).status_code == 200
+            stats = seen[0]
+            count, trace = stats.query_count, list(stats.trace)
+            for i in range(5):
+                await queue.add(Log(user_id=1, action=f"later{i}"), wait=False)
+            await queue.stop()
+        return stats, count, trace
+
+    stats, count, trace = asyncio.run(run())
+    assert stats.query_count == count and stats.trace == trace
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM logs")).scalar() == 6
@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.api import deps, navigation
+from app.core.db import SyncSessionAdapter
+from app.models.models import Navigation, User
+from app.services.navigation_cache import NavigationCache
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+
+@pytest.fixture(name="client")
+def client_fixture():
+    SQLModel.metadata.create_all(engine)
+    cache = NavigationCache(ttl=300)
+    with Session(engine) as session:
+        user = User(email="nav@example.com", username="nav", password_hash="x")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+
+        app = FastAPI()
+        app.include_router(navigation.router, prefix="/api/navigation")
+        app.dependency_overrides[deps.get_db] = lambda: SyncSessionAdapter(session)
+        app.dependency_overrides[deps.get_current_active_user] = lambda: user
+        app.dependency_overrides[deps.get_navigation_cache] = lambda: cache
+        yield TestClient(app), session, cache
+    SQLModel.metadata.drop_all(engine)
+
+
+def test_list_is_cached_until_write(client):
+    test_client, session, _ = client
+    test_client.post("/api/navigation/", json={"title": "冥想"})
+
+    first = test_client.get("/api/navigation/")
+    assert [item["title"] for item in first.json()] == ["冥想"]
+
+    # 绕过接口直接写库，缓存不会感知
+    session.add(Navigation(title="呼吸练习", created_by=1))
+    session.commit()
+    assert test_client.get("/api/navigation/").json() == first.json()
+
+    # 通过接口写入时清空缓存
+    test_client.post("/api/navigation/", json={"title": "睡眠"})
+    titles = [item["title"] for item in test_client.get("/api/navigation/").json()]
+    assert titles == ["冥想", "呼吸练习", "睡眠"]
+
+
+def test_conditional_get_returns_304(client):
+    test_client, _, _ = client
+    created = test_client.post("/api/navigation/", json={"title": "冥想"}).json()
+
+    response = test_client.get(f"/api/navigation/{created['id']}")
+    assert response.status_code == 200
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+
+    not_modified = test_client.get(f"/api/navigation/{created['id']}", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert test_client.get(f"/api/navigation/{created['id']}", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    test_client.put(f"/api/navigation/{created['id']}", json={"title": "正念冥想"})
+    changed = test_client.get(f"/api/navigation/{created['id']}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["title"] == "正念冥想"
+    assert changed.headers["ETag"] != etag
+
+
+def test_missing_item_and_delete(client):
+    test_client, _, _ = client
+    assert test_client.get("/api/navigation/99").status_code == 404
+    created = test_client.post("/api/navigation/", json={"title": "冥想"}).json()
+    assert test_client.get(f"/api/navigation/{created['id']}").status_code == 200
+    assert test_client.delete(f"/api/navigation/{created['id']}").status_code == 204
+    assert test_client.get(f"/api/navigation/{created['id']}").status_code == 404
+
+
+def test_stale_read_is_not_cached():
+    """查询期间发生失效时，查询结果不写入缓存"""
+    cache = NavigationCache()
+    generation = cache.generation
+    cache._clear(0)
+    cache.set(("list", 0, 100), [], generation)
+    assert cache.get(("list", 0, 100)) is None
+
+
+def test_invalidation_message_from_other_worker_clears_cache():
+    cache = NavigationCache()
+    cache.set("key", [], cache.generation)
+    cache._on_message({"data": json.dumps({"origin": cache._origin, "modified_at": 1})})
+    assert cache.get("key") is not None
+    cache._on_message({"data": json.dumps({"origin": "other", "modified_at": cache.last_modified + 10})})
+    assert cache.get("key") is None
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.published = []
+
+    def set(self, key, value, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = str(value).encode()
+        return True
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+
+def test_last_modified_is_shared_between_workers():
+    """测试启用 Redis 时各 worker 使用同一个修改时间作为 Last-Modified"""
+    client = FakeRedis()
+    first, second = NavigationCache(redis_client=client), NavigationCache(redis_client=client)
+    second.last_modified = first.last_modified + 30
+    first.load_version()
+    second.load_version()
+    assert second.last_modified == first.last_modified
+    assert first.set("key", [], first.generation) == second.set("key", [], second.generation)
+
+    asyncio.run(first.invalidate())
+    second.load_version()
+    assert second.last_modified == first.last_modified
+    assert len(client.published) == 1
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+import redis
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.api import chat, deps
+from app.core.config import settings
+from app.core.db import SyncSessionAdapter
+from app.models.models import User
+from app.services.fake_text_gen import FakeTextGenAPI
+from app.services.rate_limit import AdmissionController, GenerationOverloaded, RateLimiter, parse_limit
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+
+def test_parse_limit():
+    assert parse_limit("30/minute") == (0.5, 30.0)
+    assert parse_limit("5 / second") == (5.0, 5.0)
+    with pytest.raises(ValueError):
+        parse_limit("5 per minute")
+
+
+def test_local_token_bucket_refills_over_time():
+    limiter = RateLimiter()
+    bucket = [("user:1", 1.0, 2.0)]
+    assert limiter._check_local(bucket, now=100.0, cost=1) == (True, 0.0)
+    assert limiter._check_local(bucket, now=100.0, cost=1) == (True, 0.0)
+    allowed, retry_after = limiter._check_local(bucket, now=100.0, cost=1)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    assert limiter._check_local(bucket, now=101.0, cost=1) == (True, 0.0)
+
+
+def test_denied_request_does_not_consume_other_buckets():
+    """用户维度超限时不扣减IP维度的令牌"""
+    limiter = RateLimiter()
+    user, ip = ("user:1", 1.0, 1.0), ("ip:1.2.3.4", 1.0, 2.0)
+    assert limiter._check_local([user, ip], now=0.0, cost=1)[0]
+    assert not limiter._check_local([user, ip], now=0.0, cost=1)[0]
+    assert limiter._check_local([ip], now=0.0, cost=1)[0]
+
+
+class BrokenRedis:
+    """所有脚本调用都失败的 Redis 客户端"""
+
+    def register_script(self, script):
+        def call(keys, args):
+            raise redis.ConnectionError("down")
+        return call
+
+
+def test_falls_back_to_local_when_redis_fails():
+    limiter = RateLimiter(redis_client=BrokenRedis())
+    bucket = [("user:1", 1.0, 1.0)]
+    assert asyncio.run(limiter.check(bucket)) == (True, 0.0)
+    assert not asyncio.run(limiter.check(bucket))[0]
+
+
+def test_admission_controller_sheds_when_full():
+    controller = AdmissionController(max_inflight=1)
+    ticket = controller.acquire()
+    with pytest.raises(GenerationOverloaded):
+        controller.acquire()
+    ticket.release()
+    ticket.release()
+    assert controller.inflight == 0
+    with controller.acquire():
+        assert controller.inflight == 1
+    assert controller.inflight == 0
+
+
+@pytest.fixture(name="client")
+def client_fixture(monkeypatch):
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(deps, "rate_limiter", RateLimiter())
+    monkeypatch.setattr(settings, "RATE_LIMITS", {"chat_send:ip": "2/minute"})
+    with Session(engine) as session:
+        user = User(email="limited@example.com", username="limited", password_hash="x")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+
+        app = FastAPI()
+        app.include_router(chat.router, prefix="/api/chat")
+        app.dependency_overrides[deps.get_db] = lambda: SyncSessionAdapter(session)
+        app.dependency_overrides[deps.get_current_active_user] = lambda: user
+        app.dependency_overrides[deps.get_text_gen_api] = lambda: FakeTextGenAPI()
+        app.dependency_overrides[deps.get_response_cache] = lambda: None
+        app.dependency_overrides[deps.get_conversation_context] = lambda: None
+        app.dependency_overrides[deps.get_write_queue] = lambda: None
+        yield app, TestClient(app)
+    SQLModel.metadata.drop_all(engine)
+
+
+def test_send_is_rate_limited_per_ip(client):
+    _, test_client = client
+    assert test_client.post("/api/chat/send", json={"message": "1"}).status_code == 200
+    assert test_client.post("/api/chat/send", json={"message": "2"}).status_code == 200
+    response = test_client.post("/api/chat/send", json={"message": "3"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_generation_overload_returns_503(client):
+    app, test_client = client
+    controller = AdmissionController(max_inflight=1)
+    app.dependency_overrides[deps.get_admission_controller] = lambda: controller
+
+    ticket = controller.acquire()
+    response = test_client.post("/api/chat/send", json={"message": "hi"})
+    assert response.status_code == 503
+    assert test_client.post("/api/chat/stream", json={"message": "hi"}).status_code == 503
+
+    ticket.release()
+    assert test_client.post("/api/chat/stream", json={"message": "hi"}).status_code == 200
+    assert controller.inflight == 0
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlalchemy.pool import StaticPool
+
+from app.api import deps, navigation
+from app.core.db import SyncSessionAdapter
+from app.models.models import ChatLog, Navigation, Recommendation, RecommendationScore, User
+from app.services import recommendation
+from app.services.recommendation import RecommendationModel
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+
+def test_item_similarity_recommends_co_consumed_content():
+    model = RecommendationModel([1, 2, 3], ["冥想入门", "呼吸练习", "运动计划"])
+    model.fit([{1: 1.0, 2: 1.0}, {1: 1.0, 2: 1.0}, {1: 1.0, 3: 1.0}])
+
+    [result] = model.score([{1: 1.0}], [""], top_k=5, chat_weight=0.0)
+    assert [content_id for content_id, _ in result] == [2, 3]
+    assert model.popular(1) == [(1, 3.0)]
+
+
+def test_chat_text_recommends_for_users_without_interactions():
+    model = RecommendationModel([1, 2], ["失眠自助指南", "职场压力管理"])
+    model.fit([])
+
+    [result] = model.score([{}], ["最近总是失眠，晚上睡不着"], top_k=5, chat_weight=0.3)
+    assert result[0][0] == 1
+
+
+def seed(session):
+    for name in ("a", "b", "c"):
+        session.add(User(email=f"{name}@example.com", username=name, password_hash="x"))
+    for title in ("冥想入门", "呼吸练习", "失眠自助指南"):
+        session.add(Navigation(title=title, created_by=1))
+    session.commit()
+    past = datetime.utcnow() - timedelta(days=1)
+    session.add_all([
+        Recommendation(user_id=1, content_id=1, timestamp=past),
+        Recommendation(user_id=1, content_id=2, timestamp=past),
+        Recommendation(user_id=2, content_id=1, timestamp=past),
+        ChatLog(user_id=3, message="总是失眠", response="...", timestamp=past),
+    ])
+    session.commit()
+
+
+def test_batch_job_full_and_incremental():
+    SQLModel.metadata.create_all(engine)
+    try:
+        with Session(engine) as session:
+            seed(session)
+            assert recommendation.run(session, full=True) == 3
+
+            rows = session.exec(select(RecommendationScore).where(RecommendationScore.user_id == 2)).all()
+            assert [row.content_id for row in rows] == [2]
+            rows = session.exec(select(RecommendationScore).where(RecommendationScore.user_id == 3)).all()
+            assert rows[0].content_id == 3
+            assert session.exec(select(RecommendationScore).where(RecommendationScore.user_id.is_(None))).all()
+
+            # 增量运行只重算上次之后有新行为的用户
+            assert recommendation.run(session) == 0
+            session.add(Recommendation(user_id=2, content_id=2))
+            session.commit()
+            assert recommendation.run(session) == 1
+            rows = session.exec(select(RecommendationScore).where(RecommendationScore.user_id == 2)).all()
+            assert 2 not in [row.content_id for row in rows]
+    finally:
+        SQLModel.metadata.drop_all(engine)
+
+
+def test_load_chat_texts_keeps_latest_messages_per_user():
+    SQLModel.metadata.create_all(engine)
+    try:
+        with Session(engine) as session:
+            seed(session)
+            start = datetime.utcnow() - timedelta(hours=1)
+            session.add_all(
+                ChatLog(user_id=user_id, message=f"{user_id}-{i}", response="...", timestamp=start + timedelta(minutes=i))
+                for user_id in (1, 2) for i in range(4)
+            )
+            session.commit()
+            assert recommendation.load_chat_texts(session, [1, 2, 3], limit=2) == {
+                1: "1-3 1-2", 2: "2-3 2-2", 3: "总是失眠"
+            }
+    finally:
+        SQLModel.metadata.drop_all(engine)
+
+
+def test_recommended_endpoint_falls_back_to_popular():
+    SQLModel.metadata.create_all(engine)
+    try:
+        with Session(engine) as session:
+            seed(session)
+            recommendation.run(session, full=True)
+            newcomer = User(email="new@example.com", username="new", password_hash="x")
+            session.add(newcomer)
+            session.commit()
+            current = {"user": session.get(User, 2)}
+
+            app = FastAPI()
+            app.include_router(navigation.router, prefix="/api/navigation")
+            app.dependency_overrides[deps.get_db] = lambda: SyncSessionAdapter(session)
+            app.dependency_overrides[deps.get_current_active_user] = lambda: current["user"]
+            client = TestClient(app)
+
+            response = client.get("/api/navigation/recommended")
+            assert response.status_code == 200
+            assert [item["title"] for item in response.json()] == ["呼吸练习"]
+
+            current["user"] = newcomer
+            popular = client.get("/api/navigation/recommended", params={"limit": 1}).json()
+            assert [item["title"] for item in popular] == ["冥想入门"]
+    finally:
+        SQLModel.metadata.drop_all(engine)
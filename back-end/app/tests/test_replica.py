@@ -0,0 +1,108 @@
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.api import deps
+from app.core import db as database, security
+from app.core.config import settings
+from app.core.db import SyncSessionAdapter
+from app.core.replica import RecentWriters, ReplicaRouter
+from app.models.models import ChatLog, ReplicationHeartbeat, User
+
+
+def replicate_heartbeat(primary, replica):
+    """模拟复制：把主库的心跳复制到副本"""
+    with Session(primary) as source, Session(replica) as target:
+        beat = source.get(ReplicationHeartbeat, 1)
+        target.merge(ReplicationHeartbeat(id=1, beat_at=beat.beat_at))
+        target.commit()
+
+
+@pytest.fixture(name="setup")
+def setup_fixture(tmp_path, monkeypatch, chat_app):
+    """主库和副本各使用一个 SQLite 文件；副本上多一条只存在于副本的聊天记录，用来区分请求读的是哪个库"""
+    # 同步会话的操作在线程池中执行，连接会跨线程使用
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}?check_same_thread=false")
+    replica_uri = f"sqlite:///{tmp_path / 'replica.db'}?check_same_thread=false"
+    SQLModel.metadata.create_all(primary)
+    SQLModel.metadata.create_all(create_engine(replica_uri))
+
+    @asynccontextmanager
+    async def primary_scope():
+        with Session(primary) as session:
+            yield SyncSessionAdapter(session)
+
+    monkeypatch.setattr(settings, "DATABASE_ASYNC", False)
+    monkeypatch.setattr(database, "session_scope", primary_scope)
+    router = ReplicaRouter([replica_uri], max_lag=5.0, primary_engine=primary)
+    monkeypatch.setattr(deps, "replica_router", router)
+    monkeypatch.setattr(deps, "recent_writers", RecentWriters(window=10.0))
+
+    replica = router.replicas[0].get_engine()
+    with Session(primary) as session:
+        user = User(email="replica@example.com", username="replica", password_hash="x")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+    with Session(replica) as session:
+        session.add(ChatLog(user_id=user.id, message="副本", response="副本"))
+        session.commit()
+
+    # 不传入会话：请求经由 get_db / get_read_db 在主库和副本之间选择
+    app = chat_app(user)
+    headers = {"Authorization": f"Bearer {security.create_access_token(user.id)}"}
+    yield TestClient(app), router, primary, replica, headers
+    router.replicas[0].get_engine().dispose()
+
+
+def history(client, headers):
+    return [chat["message"] for chat in client.get("/api/chat/history", headers=headers).json()]
+
+
+def test_reads_use_replica_until_lag_exceeds_limit(setup):
+    """测试只读接口使用延迟在允许范围内的副本，副本落后时回退到主库"""
+    client, router, primary, replica, headers = setup
+    # 第一次检查时主库还没有心跳，无法判断延迟，视为已同步
+    router.check()
+    replicate_heartbeat(primary, replica)
+    assert router.replicas[0].lag == 0.0
+    assert history(client, headers) == ["副本"]
+
+    # 副本停在旧的心跳上，超过 max_lag 后不再使用
+    with Session(primary) as session:
+        session.merge(ReplicationHeartbeat(id=1, beat_at=time.time() - 60))
+        session.commit()
+    replicate_heartbeat(primary, replica)
+    router.check()
+    assert router.replicas[0].lag == 0.0
+    router.check()
+    assert router.replicas[0].lag > 50
+    assert router.choose() is None
+    assert history(client, headers) == []
+
+
+def test_read_your_writes_stays_on_primary(setup):
+    """测试用户写入后，其只读请求在一段时间内使用主库，能读到刚写入的数据"""
+    client, router, primary, replica, headers = setup
+    router.check()
+    assert history(client, headers) == ["副本"]
+
+    assert client.post("/api/chat/send", json={"message": "你好"}, headers=headers).status_code == 200
+    assert history(client, headers) == ["你好"]
+
+    # 其他用户不受影响
+    other = {"Authorization": f"Bearer {security.create_access_token(999)}"}
+    assert history(client, other) == ["副本"]
+
+
+def test_unreachable_replica_is_skipped(setup, tmp_path):
+    """测试无法连接的副本被标记为不可用，读请求使用主库"""
+    client, router, primary, replica, headers = setup
+    router.replicas[0]._engine = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    router.check()
+    status = router.status()[0]
+    assert status["healthy"] is False and status["error"]
+    assert history(client, headers) == []
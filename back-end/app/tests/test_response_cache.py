@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from app.core.cache import TTLCache
+from app.services.response_cache import ResponseCache, normalize_prompt
+
+
+def test_ttl_cache_lru_and_expiry():
+    """测试LRU淘汰和TTL过期"""
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    cache.set("d", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("d") is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_normalize_prompt():
+    """测试提示词归一化"""
+    assert normalize_prompt("  我很焦虑。 ") == normalize_prompt("我很焦虑")
+    assert normalize_prompt("睡不着怎么办？") == normalize_prompt("睡不着怎么办?")
+    assert normalize_prompt("Hello   World") == "hello world"
+
+
+def test_get_or_generate_uses_cache():
+    """测试相同提示词和参数只生成一次"""
+    cache = ResponseCache(max_size=8, ttl=60)
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        return "深呼吸，慢慢来"
+
+    async def run():
+        first = await cache.get_or_generate("我很焦虑", 100, generate)
+        second = await cache.get_or_generate("我很焦虑！", 100, generate)
+        third = await cache.get_or_generate("我很焦虑", 50, generate)
+        return first, second, third
+
+    assert asyncio.run(run()) == ("深呼吸，慢慢来",) * 3
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_similarity_lookup():
+    """测试近似重复提示词的相似度查找"""
+    cache = ResponseCache(max_size=8, ttl=60, similarity_threshold=0.6)
+
+    async def run():
+        await cache.set("晚上睡不着怎么办", 100, "试试规律作息")
+        return await cache.get("晚上总是睡不着怎么办", 100), await cache.get("今天心情很好", 100)
+
+    assert asyncio.run(run()) == ("试试规律作息", None)
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_similarity_index_follows_eviction():
+    """测试淘汰的条目同时从倒排索引中移除，不会再被近似查找命中"""
+    cache = ResponseCache(max_size=2, ttl=60, similarity_threshold=0.6)
+
+    async def run():
+        await cache.set("晚上睡不着怎么办", 100, "试试规律作息")
+        await cache.set("工作压力很大", 100, "先休息一下")
+        await cache.set("考试前很紧张", 100, "做几次深呼吸")
+        return await cache.get("晚上总是睡不着怎么办", 100), await cache.get("最近工作压力很大", 100)
+
+    assert asyncio.run(run()) == (None, "先休息一下")
+    assert all(key in cache._vectors for keys in cache._postings.values() for key in keys)
+    assert len(cache._vectors) == 2
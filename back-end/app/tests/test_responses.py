@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.api import chat, deps
+from app.core.db import SyncSessionAdapter
+from app.core.responses import ORJSONResponse
+from app.models.models import ChatLog, User
+from app.schemas.chat import ChatResponse
+
+
+def legacy_body(content) -> bytes:
+    """原来的序列化方式：jsonable_encoder 之后用 JSONResponse 编码"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def test_orjson_response_matches_json_response():
+    content = {"text": "你好\n\"引号\"", "at": datetime(2026, 10, 18, 8, 30, 0, 123456), "whole": datetime(2026, 10, 18),
+               "score": 0.25, "empty": None, "items": [1, True]}
+    assert ORJSONResponse(content).body == legacy_body(content)
+
+
+def test_history_fast_path_matches_response_model():
+    """测试历史记录接口按列直接编码的结果与逐行经过 ChatResponse 校验的结果逐字节相同"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(email="fast@example.com", username="fast", password_hash="x")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        start = datetime(2026, 10, 18, 8, 0, 0, 500)
+        for i in range(5):
+            session.add(ChatLog(user_id=user.id, message=f"消息{i}", response="回复", timestamp=start + timedelta(minutes=i)))
+        session.commit()
+
+        app = FastAPI()
+        app.include_router(chat.router, prefix="/api/chat")
+        app.dependency_overrides[deps.get_db] = lambda: SyncSessionAdapter(session)
+        app.dependency_overrides[deps.get_current_active_user] = lambda: user
+        client = TestClient(app)
+
+        chat_logs: List[ChatLog] = sorted(session.query(ChatLog).all(), key=lambda row: row.timestamp, reverse=True)
+        expected = [ChatResponse.from_orm(chat_log) for chat_log in chat_logs]
+        assert client.get("/api/chat/history").content == legacy_body(expected)
+
+        page = client.get("/api/chat/history/page", params={"limit": 2}).json()
+        assert page["chats"] == jsonable_encoder(expected[:2])
+        assert page["next_cursor"]
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.api import admin, deps
+from app.models.models import User, UserDailyActions, UserDailyStats
+from app.services.rollup import accumulate, rebuild_day
+
+
+@pytest.fixture(name="client")
+def client_fixture(session, chat_app):
+    """创建挂载聊天和管理路由的测试客户端"""
+    user = User(email="rollup@example.com", username="rollup", password_hash="x", role="admin")
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    app = chat_app(user, session)
+    app.include_router(admin.router, prefix="/api/admin")
+    app.dependency_overrides[deps.get_current_admin_user] = lambda: user
+    return TestClient(app), session, user
+
+
+def test_accumulate_splits_sessions_by_gap():
+    """测试按消息间隔划分会话，跨越零点的会话时长计入各自的日期"""
+    start = datetime(2026, 10, 17, 23, 50)
+    messages = [
+        (1, start, 100),
+        (1, start + timedelta(minutes=20), 300),  # 同一会话，计入第二天
+        (1, start + timedelta(hours=2), None),  # 新会话
+    ]
+    last_seen = {}
+    stats = accumulate(messages, last_seen)
+
+    first, second = stats[(1, start.date())], stats[(1, start.date() + timedelta(days=1))]
+    assert (first["message_count"], first["session_count"], first["session_seconds"]) == (1, 1, 0)
+    assert (second["message_count"], second["session_count"], second["session_seconds"]) == (2, 1, 1200)
+    assert (second["response_count"], second["response_ms_total"], second["response_ms_max"]) == (1, 300, 300)
+    assert last_seen[1] == start + timedelta(hours=2)
+
+
+def test_rollups_are_maintained_on_write_and_served_by_admin_stats(client):
+    """测试发送消息时增量更新每日统计，统计接口从汇总表返回"""
+    test_client, session, user = client
+    for message in ("你好", "睡不着"):
+        assert test_client.post("/api/chat/send", json={"message": message}).status_code == 200
+
+    response = test_client.get("/api/admin/stats", params={"user_id": user.id})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"]["message_count"] == 2
+    assert data["total"]["session_count"] == 1
+    assert data["total"]["actions"] == {"chat_send": 2}
+    assert data["total"]["avg_response_ms"] is not None
+    assert [day["message_count"] for day in data["days"]] == [2]
+
+
+def test_rebuild_day_matches_incremental_rollups(client):
+    """测试按天重算的结果与增量维护一致，并且可以重复执行"""
+    test_client, session, user = client
+    for message in ("一", "二", "三"):
+        assert test_client.post("/api/chat/send", json={"message": message}).status_code == 200
+
+    def snapshot():
+        stats = [row.dict(exclude={"id"}) for row in session.exec(select(UserDailyStats)).all()]
+        actions = [row.dict(exclude={"id"}) for row in session.exec(select(UserDailyActions)).all()]
+        session.expire_all()
+        return stats, actions
+
+    incremental = snapshot()
+    for _ in range(2):
+        with session.get_bind().begin() as connection:
+            assert rebuild_day(connection, datetime.utcnow().date()) == 3
+        assert snapshot() == incremental
+
+
+def test_admin_stats_rejects_invalid_range(client):
+    test_client = client[0]
+    response = test_client.get("/api/admin/stats", params={"start": "2026-01-02", "end": "2026-01-01"})
+    assert response.status_code == 400
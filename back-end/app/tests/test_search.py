@@ -0,0 +1,104 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.api import chat, deps, navigation
+from app.core.db import SyncSessionAdapter
+from app.models.models import ChatLog, Navigation, User
+from app.services import search
+from app.services.search import build_match_query, ngram_tokens
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+
+@pytest.fixture(name="client")
+def client_fixture():
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        users = [User(email=f"{name}@example.com", username=name, password_hash="x") for name in ("a", "b")]
+        session.add_all(users)
+        session.commit()
+        for user in users:
+            session.refresh(user)
+
+        app = FastAPI()
+        app.include_router(chat.router, prefix="/api/chat")
+        app.include_router(navigation.router, prefix="/api/navigation")
+        app.dependency_overrides[deps.get_db] = lambda: SyncSessionAdapter(session)
+        app.dependency_overrides[deps.get_current_active_user] = lambda: users[0]
+        yield TestClient(app), session
+    SQLModel.metadata.drop_all(engine)
+
+
+def test_query_building():
+    assert list(ngram_tokens("最近失眠 Sleep")) == ["最近", "近失", "失眠", "sleep"]
+    assert build_match_query("失眠 sleep", "sqlite") == '"失眠" "sleep"'
+    assert build_match_query("失", "sqlite") == "失*"
+    assert build_match_query('失眠" OR *', "mysql") == '+"失眠" +"OR"'
+    assert build_match_query("  *() ", "sqlite") is None
+
+
+def test_user_hit_is_found_among_many_other_users_hits(client):
+    """测试其他用户有大量更相关的匹配记录时，仍能检索到当前用户自己的记录"""
+    test_client, session = client
+    session.add_all(ChatLog(user_id=2, message=f"失眠失眠失眠{i}", response="失眠") for i in range(1200))
+    session.add(ChatLog(user_id=1, message="偶尔失眠", response="注意作息"))
+    session.commit()
+
+    body = test_client.get("/api/chat/search", params={"q": "失眠"}).json()
+    assert [hit["message"] for hit in body["results"]] == ["偶尔失眠"]
+
+
+def test_chat_search_is_ranked_scoped_and_paginated(client):
+    test_client, session = client
+    session.add_all([
+        ChatLog(user_id=1, message="最近总是失眠", response="试试睡前冥想"),
+        ChatLog(user_id=1, message="失眠好几天了，失眠真难受", response="失眠时可以做呼吸练习"),
+        ChatLog(user_id=1, message="工作压力大", response="聊聊具体情况"),
+        ChatLog(user_id=2, message="我也失眠", response="..."),
+    ])
+    session.commit()
+
+    body = test_client.get("/api/chat/search", params={"q": "失眠"}).json()
+    assert [hit["id"] for hit in body["results"]] == [2, 1]
+    assert body["next_offset"] is None
+
+    first = test_client.get("/api/chat/search", params={"q": "失眠", "limit": 1}).json()
+    assert [hit["id"] for hit in first["results"]] == [2]
+    second = test_client.get("/api/chat/search", params={"q": "失眠", "limit": 1, "offset": first["next_offset"]}).json()
+    assert [hit["id"] for hit in second["results"]] == [1]
+
+    # 删除后索引同步更新
+    test_client.delete("/api/chat/history/2")
+    body = test_client.get("/api/chat/search", params={"q": "失眠"}).json()
+    assert [hit["id"] for hit in body["results"]] == [1]
+
+
+def test_navigation_index_follows_writes(client):
+    test_client, _ = client
+    created = test_client.post("/api/navigation/", json={"title": "冥想入门", "description": "缓解焦虑"}).json()
+    test_client.post("/api/navigation/", json={"title": "运动计划"})
+
+    results = test_client.get("/api/navigation/search", params={"q": "焦虑"}).json()["results"]
+    assert [item["id"] for item in results] == [created["id"]]
+
+    test_client.put(f"/api/navigation/{created['id']}", json={"description": "改善睡眠"})
+    assert test_client.get("/api/navigation/search", params={"q": "焦虑"}).json()["results"] == []
+    assert len(test_client.get("/api/navigation/search", params={"q": "睡眠"}).json()["results"]) == 1
+
+
+def test_rebuild_indexes_existing_rows(client):
+    _, session = client
+    session.add(Navigation(title="正念练习", created_by=1))
+    session.commit()
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM navigation_fts")
+        search.rebuild(connection)
+        [(count,)] = connection.exec_driver_sql("SELECT count(*) FROM navigation_fts WHERE navigation_fts MATCH '\"正念\"'").all()
+    assert count == 1
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+
+from app.startup_profile import BACKEND_DIR, check_budget, import_tree, parse_importtime
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     json.decoder
+import time:       200 |        300 |   json
+import time:      6000 |       6000 |   heavy
+import time:      1000 |       7300 | app.main
+"""
+
+
+def test_parse_and_render_import_tree():
+    nodes = parse_importtime(SAMPLE)
+    assert [(node.module, node.depth) for node in nodes] == [
+        ("json.decoder", 2), ("json", 1), ("heavy", 1), ("app.main", 0)
+    ]
+    assert import_tree(nodes, "app.main", min_ms=0.2) == [
+        "app.main  7.3 ms (自身 1.0 ms)",
+        "  json  0.3 ms (自身 0.2 ms)",
+        "  heavy  6.0 ms (自身 6.0 ms)",
+    ]
+
+
+def test_check_budget():
+    assert check_budget(500, 20, None, None) == []
+    assert check_budget(500, 20, 800, 50) == []
+    assert len(check_budget(900, 80, 800, 50)) == 2
+
+
+def test_heavy_dependencies_are_not_loaded_at_import():
+    script = (
+        "import sys, app.main\n"
+        "names = ['redis', 'jose.jwt', 'passlib.context', 'httpx', 'pymysql', 'aiomysql']\n"
+        "print(','.join(n for n in names if type(sys.modules.get(n)).__name__ not in ('NoneType', '_LazyModule')))"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
@@ -0,0 +1,92 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.text_gen import AsyncTextGenAPI
+
+
+def make_api(handler, **kwargs):
+    """创建使用模拟传输层的异步客户端"""
+    kwargs.setdefault("backoff", 0)
+    return AsyncTextGenAPI("http://textgen", transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_generate_text_retries_on_unavailable():
+    """测试上游暂时不可用时会重试"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503, text="busy")
+        return httpx.Response(200, json={"generated_text": "你好"})
+
+    async def run():
+        api = make_api(handler, max_retries=2)
+        try:
+            return await api.generate_text("hi")
+        finally:
+            await api.aclose()
+
+    assert asyncio.run(run()) == "你好"
+    assert len(calls) == 3
+
+
+def test_generate_text_does_not_retry_client_error():
+    """测试非可重试的错误直接抛出"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, text="bad prompt")
+
+    async def run():
+        api = make_api(handler)
+        try:
+            await api.generate_text("hi")
+        finally:
+            await api.aclose()
+
+    with pytest.raises(Exception, match="400"):
+        asyncio.run(run())
+    assert len(calls) == 1
+
+
+def test_stream_text():
+    """测试流式读取NDJSON片段"""
+    def handler(request):
+        return httpx.Response(200, content=b'{"token": "\xe4\xbd\xa0"}\n{"token": "\xe5\xa5\xbd"}\n')
+
+    async def run():
+        api = make_api(handler)
+        try:
+            return [chunk async for chunk in api.stream_text("hi")]
+        finally:
+            await api.aclose()
+
+    assert asyncio.run(run()) == ["你", "好"]
+
+
+def test_concurrency_limit():
+    """测试同时发往生成服务的请求数不超过上限"""
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={"generated_text": "ok"})
+
+    async def run():
+        api = make_api(handler, max_concurrency=2)
+        try:
+            await asyncio.gather(*(api.generate_text(str(i)) for i in range(6)))
+        finally:
+            await api.aclose()
+
+    asyncio.run(run())
+    assert peak == 2
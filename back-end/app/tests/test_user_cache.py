@@ -0,0 +1,113 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from jose import JWTError
+from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core import security
+from app.core.db import SyncSessionAdapter
+from app.models.models import User
+from app.services.user_cache import UserCache
+
+# 创建内存数据库用于测试
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    """创建数据库会话"""
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(email="cacheduser@example.com", username="cacheduser", password_hash="x"))
+        session.commit()
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+
+def test_decode_access_token_is_memoized(monkeypatch):
+    """测试同一个 token 只做一次 JWT 验证"""
+    token = security.create_access_token(42, expires_delta=timedelta(minutes=5))
+    calls = []
+    original_decode = security.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(1)
+        return original_decode(*args, **kwargs)
+
+    monkeypatch.setattr(security.jwt, "decode", counting_decode)
+    assert security.decode_access_token(token) == 42
+    assert security.decode_access_token(token) == 42
+    assert len(calls) == 1
+
+
+def test_invalid_and_expired_tokens_are_rejected():
+    """测试无效或过期的 token 不会被缓存"""
+    with pytest.raises(JWTError):
+        security.decode_access_token("not-a-token")
+    expired = security.create_access_token(42, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(JWTError):
+        security.decode_access_token(expired)
+    assert security.token_cache.get(expired) is None
+
+
+def test_user_cache_hits_db_once(session):
+    """测试缓存命中后不再查询数据库，修改后失效"""
+    cache = UserCache(ttl=60)
+    db = SyncSessionAdapter(session)
+    gets = []
+    original_get = db.get
+
+    async def counting_get(*args):
+        gets.append(1)
+        return await original_get(*args)
+
+    db.get = counting_get
+
+    async def run():
+        first = await cache.get(db, 1)
+        second = await cache.get(db, 1)
+        await cache.invalidate(1)
+        third = await cache.get(db, 1)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first.username == second.username == third.username == "cacheduser"
+    assert second is not first
+    assert len(gets) == 2
+    assert asyncio.run(cache.get(db, 999)) is None
+
+
+class RecordingRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode("utf-8") if isinstance(value, str) else value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def test_user_cache_does_not_store_password_hash(session):
+    """测试写入 Redis 和进程内缓存的用户数据不包含密码哈希"""
+    redis_client = RecordingRedis()
+    cache = UserCache(ttl=60, redis_client=redis_client)
+    db = SyncSessionAdapter(session)
+    asyncio.run(cache.get(db, 1))
+
+    payload = redis_client.data["psychat:user:1"].decode("utf-8")
+    assert "password_hash" not in payload
+    assert "password_hash" not in cache.local.get(1)
+
+    # 其他 worker 从 Redis 读到的用户同样没有密码哈希
+    cached = asyncio.run(UserCache(ttl=60, redis_client=redis_client).get(db, 1))
+    assert cached.username == "cacheduser" and cached.password_hash is None
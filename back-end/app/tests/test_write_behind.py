@@ -0,0 +1,186 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import event, text
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlalchemy.pool import StaticPool
+
+from app.core import metrics
+from app.core.db import SyncSessionAdapter
+from app.models.models import User, ChatLog, Log
+from app.services.search import search_chat_logs
+from app.services.write_behind import WriteBehindQueue, WriteBehindQueueFull
+
+# 创建内存数据库用于测试
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+transactions = []
+
+
+@asynccontextmanager
+async def session_factory():
+    transactions.append(1)
+    with Session(engine) as session:
+        yield SyncSessionAdapter(session)
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """创建数据表和测试用户"""
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(email="writer@example.com", username="writer", password_hash="x"))
+        session.commit()
+    transactions.clear()
+    yield
+    SQLModel.metadata.drop_all(engine)
+
+
+def test_rows_are_written_in_one_transaction():
+    """测试并发写入合并为一个事务，并返回自增ID"""
+    async def run():
+        queue = WriteBehindQueue(session_factory, max_batch_size=10, flush_interval=0.05)
+        await queue.add(Log(user_id=1, action="chat_send"), wait=False)
+        chat_logs = await asyncio.gather(*(
+            queue.add(ChatLog(user_id=1, message=f"消息{i}", response="回复")) for i in range(3)
+        ))
+        await queue.stop()
+        return chat_logs
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        chat_logs = asyncio.run(run())
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert [chat_log.id for chat_log in chat_logs] == [1, 2, 3]
+    assert [chat_log.message for chat_log in chat_logs] == ["消息0", "消息1", "消息2"]
+    assert len(transactions) == 1
+    # 聊天记录用一条多行 INSERT 写入，整批只查询一次ID，提交后不再逐行查询
+    assert sum(statement.startswith("INSERT INTO chat_logs (") for statement in statements) == 1
+    assert sum(statement.startswith("SELECT chat_logs") for statement in statements) == 1
+    with Session(engine) as session:
+        assert session.get(User, 1).chat_count == 3
+        assert len(session.exec(select(Log)).all()) == 1
+
+
+def test_ids_are_correct_when_not_consecutive():
+    """测试同一条 INSERT 分配的ID不连续时（如 MySQL 的 auto_increment_increment > 1），返回的ID仍与各行对应"""
+    # 每插入一行队列中的记录就插入一条其他记录，占用中间的ID
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TRIGGER interleave AFTER INSERT ON chat_logs WHEN NEW.message != '其他' BEGIN "
+            "INSERT INTO chat_logs (user_id, message, response, timestamp) VALUES (1, '其他', '其他', NEW.timestamp); END"
+        ))
+
+    async def run():
+        queue = WriteBehindQueue(session_factory, max_batch_size=10, flush_interval=0.05)
+        chat_logs = await asyncio.gather(*(
+            queue.add(ChatLog(user_id=1, message=f"消息{i}", response="回复")) for i in range(3)
+        ))
+        await queue.stop()
+        return chat_logs
+
+    chat_logs = asyncio.run(run())
+    with Session(engine) as session:
+        for chat_log in chat_logs:
+            assert session.get(ChatLog, chat_log.id).message == chat_log.message
+        assert len(session.exec(select(ChatLog)).all()) == 6
+
+
+def test_stop_flushes_pending_rows():
+    """测试关闭时写完队列中剩余的行"""
+    async def run():
+        queue = WriteBehindQueue(session_factory, max_batch_size=2, flush_interval=10)
+        for i in range(5):
+            await queue.add(Log(user_id=1, action=f"action{i}"), wait=False)
+        await queue.stop()
+        with pytest.raises(WriteBehindQueueFull):
+            await queue.add(Log(user_id=1, action="late"), wait=False)
+
+    asyncio.run(run())
+    with Session(engine) as session:
+        assert len(session.exec(select(Log)).all()) == 5
+
+
+def test_backpressure_when_queue_full():
+    """测试写入阻塞、队列满时拒绝新的写入"""
+    async def run():
+        released = asyncio.Event()
+
+        @asynccontextmanager
+        async def slow_session_factory():
+            await released.wait()
+            async with session_factory() as db:
+                yield db
+
+        queue = WriteBehindQueue(slow_session_factory, max_batch_size=1, flush_interval=0, max_queue_size=1, put_timeout=0.01)
+        await queue.add(Log(user_id=1, action="a"), wait=False)
+        await asyncio.sleep(0.01)
+        await queue.add(Log(user_id=1, action="b"), wait=False)
+        with pytest.raises(WriteBehindQueueFull):
+            await queue.add(Log(user_id=1, action="c"), wait=False)
+        released.set()
+        await queue.stop()
+
+    asyncio.run(run())
+    with Session(engine) as session:
+        assert [log.action for log in session.exec(select(Log)).all()] == ["a", "b"]
+
+
+def test_failed_batch_is_retried_then_dropped():
+    """测试写入失败的批次先重试，重试后仍失败时丢弃并计入指标"""
+    attempts = []
+
+    @asynccontextmanager
+    async def flaky_session_factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("连接断开")
+        async with session_factory() as db:
+            yield db
+
+    @asynccontextmanager
+    async def broken_session_factory():
+        raise RuntimeError("数据库不可用")
+        yield
+
+    async def run():
+        queue = WriteBehindQueue(flaky_session_factory, max_retries=1, retry_delay=0)
+        chat_log = await queue.add(ChatLog(user_id=1, message="重试", response="回复"))
+        await queue.stop()
+
+        queue = WriteBehindQueue(broken_session_factory, max_retries=1, retry_delay=0)
+        await queue.add(Log(user_id=1, action="lost"), wait=False)
+        with pytest.raises(RuntimeError):
+            await queue.add(ChatLog(user_id=1, message="丢弃", response="回复"))
+        await queue.stop()
+        return chat_log
+
+    dropped_logs = metrics.WRITE_BEHIND_DROPPED_ROWS.value(table="logs")
+    dropped_chat_logs = metrics.WRITE_BEHIND_DROPPED_ROWS.value(table="chat_logs")
+    chat_log = asyncio.run(run())
+    assert len(attempts) == 2 and chat_log.id == 1
+    assert metrics.WRITE_BEHIND_DROPPED_ROWS.value(table="logs") == dropped_logs + 1
+    assert metrics.WRITE_BEHIND_DROPPED_ROWS.value(table="chat_logs") == dropped_chat_logs + 1
+    with Session(engine) as session:
+        assert [row.message for row in session.exec(select(ChatLog)).all()] == ["重试"]
+
+
+def test_queued_chat_logs_are_searchable():
+    """测试经写入队列批量写入的聊天记录同样进入全文检索索引"""
+    async def run():
+        queue = WriteBehindQueue(session_factory)
+        await queue.add(ChatLog(user_id=1, message="最近总是失眠", response="试试睡前冥想"))
+        await queue.stop()
+        async with session_factory() as db:
+            return await search_chat_logs(db, 1, "失眠")
+
+    hits = asyncio.run(run())
+    assert [chat_log.message for chat_log, _ in hits] == ["最近总是失眠"]
@@ -0,0 +1 @@
+# 后端压测与延迟基准工具
@@ -0,0 +1,261 @@
+"""后端压测与延迟基准
+
+在 SQLite 和模拟生成服务上启动 app.main:app，按给定并发度依次压测注册、登录、
+发送消息、历史记录和导航接口，输出每个路由的吞吐量与 p50/p95/p99 延迟，
+并可与保存的基准结果比较，超出容差时以非零状态码退出。
+
+用法（在 back-end 目录下）：
+    python -m benchmarks.load_test --concurrency 1,8,32 --requests 200 --output bench.json
+    python -m benchmarks.load_test --baseline benchmarks/baseline.json
+    python -m benchmarks.load_test --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PASSWORD = "bench-password"
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩法计算分位数，sorted_values 需已升序排列"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    """汇总一组请求的延迟（秒）为报告中的指标，延迟以毫秒输出"""
+    values = sorted(latencies)
+    return {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+    }
+
+
+def compare_to_baseline(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """与基准比较，返回回归描述列表；p95 变慢或吞吐下降超过容差即视为回归"""
+    regressions = []
+    for key, base in baseline.items():
+        current = results.get(key)
+        if current is None:
+            continue
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(f"{key}: 错误数 {base.get('errors', 0)} -> {current['errors']}")
+        if base["p95_ms"] > 0 and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{key}: 吞吐 {base['throughput_rps']}rps -> {current['throughput_rps']}rps")
+    return regressions
+
+
+async def measure(concurrency: int, total: int, send: Callable[[int], Awaitable[httpx.Response]]) -> dict:
+    """以固定并发度发送 total 个请求，send 接收请求序号"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await send(i)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def _register_and_login(client: httpx.AsyncClient, email: str) -> str:
+    response = await client.post(
+        "/api/register", json={"email": email, "username": email.split("@")[0], "password": PASSWORD}
+    )
+    response.raise_for_status()
+    response = await client.post("/api/login", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_workloads(base_url: str, levels: List[int], total: int, routes: Optional[List[str]] = None) -> Dict[str, dict]:
+    """依次在每个并发度下压测各个路由，结果键为 "<METHOD> <path>@c<并发度>" """
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        # 预先准备若干用户和一条导航内容，读接口的压测不受注册耗时影响
+        emails = [f"bench{i}@example.com" for i in range(min(max(levels), 8))]
+        tokens = [await _register_and_login(client, email) for email in emails]
+        response = await client.post(
+            "/api/navigation/", json={"title": "压测导航", "description": "benchmark"},
+            headers={"Authorization": f"Bearer {tokens[0]}"}
+        )
+        response.raise_for_status()
+        navigation_id = response.json()["id"]
+
+        def auth(i):
+            return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+        def workloads(level):
+            return {
+                "POST /api/register": lambda i: client.post(
+                    "/api/register",
+                    json={"email": f"c{level}_{i}@example.com", "username": f"c{level}_{i}", "password": PASSWORD}
+                ),
+                "POST /api/login": lambda i: client.post(
+                    "/api/login", json={"email": emails[i % len(emails)], "password": PASSWORD}
+                ),
+                "POST /api/chat/send": lambda i: client.post(
+                    "/api/chat/send", json={"message": f"压测消息 c{level} #{i}"}, headers=auth(i)
+                ),
+                "GET /api/chat/history": lambda i: client.get(
+                    "/api/chat/history", params={"limit": 20}, headers=auth(i)
+                ),
+                "GET /api/chat/history/page": lambda i: client.get(
+                    "/api/chat/history/page", params={"limit": 20}, headers=auth(i)
+                ),
+                "GET /api/navigation/": lambda i: client.get("/api/navigation/"),
+                "GET /api/navigation/{id}": lambda i: client.get(f"/api/navigation/{navigation_id}"),
+            }
+
+        results = {}
+        for level in levels:
+            for route, send in workloads(level).items():
+                if routes and route not in routes:
+                    continue
+                results[f"{route}@c{level}"] = await measure(level, total, send)
+                print(f"{route}@c{level}: {results[f'{route}@c{level}']}", file=sys.stderr)
+        return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"服务启动失败: {url}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"等待服务就绪超时: {url}")
+
+
+def _uvicorn(app: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+
+
+def _create_tables(database_uri: str) -> None:
+    from sqlmodel import SQLModel, create_engine
+
+    import app.models.models  # noqa: F401  注册所有数据表
+    import app.services.search  # noqa: F401  注册 SQLite 的全文检索表
+
+    engine = create_engine(database_uri)
+    SQLModel.metadata.create_all(engine)
+    engine.dispose()
+
+
+def run(args) -> Dict[str, dict]:
+    levels = [int(level) for level in args.concurrency.split(",")]
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        _create_tables(database_uri)
+
+        stub_port, api_port = _free_port(), _free_port()
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URI": database_uri,
+            "TEXT_GEN_API_URL": f"http://127.0.0.1:{stub_port}",
+            "STUB_TEXT_GEN_LATENCY": str(args.gen_latency),
+            # 压测的是接口本身的吞吐，不应被限流拦下
+            "RATE_LIMIT_ENABLED": "false",
+            "PYTHONPATH": BACKEND_DIR,
+        })
+        processes = [_uvicorn("benchmarks.stub_textgen:app", stub_port, env)]
+        try:
+            _wait_until_ready(f"http://127.0.0.1:{stub_port}/docs", processes[0])
+            processes.append(_uvicorn("app.main:app", api_port, env))
+            _wait_until_ready(f"http://127.0.0.1:{api_port}/", processes[1])
+            routes = args.routes.split(",") if args.routes else None
+            return asyncio.run(run_workloads(f"http://127.0.0.1:{api_port}", levels, args.requests, routes))
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait(timeout=10)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="PsyChat 后端压测")
+    parser.add_argument("--concurrency", default="1,8,32", help="逗号分隔的并发度列表")
+    parser.add_argument("--requests", type=int, default=200, help="每个路由在每个并发度下的请求数")
+    parser.add_argument("--routes", default="", help="只压测指定路由，如 'GET /api/chat/history,POST /api/chat/send'")
+    parser.add_argument("--gen-latency", type=float, default=0.05, help="模拟生成服务的响应延迟（秒）")
+    parser.add_argument("--output", default="bench_results.json", help="结果输出文件")
+    parser.add_argument("--baseline", help="与该基准文件比较，出现回归时返回非零状态码")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对回归幅度")
+    parser.add_argument("--save-baseline", help="将本次结果保存为基准文件")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "gen_latency": args.gen_latency,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"回归: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""列表接口的序列化基准
+
+比较聊天历史接口两种实现每个请求消耗的 CPU 时间：
+    orm   查询完整的 ORM 对象，由 response_model 逐行校验，再经 jsonable_encoder 和 JSONResponse 编码（原来的实现）
+    fast  只查询响应需要的列，直接用 orjson 编码（当前 /api/chat/history 的实现）
+
+在进程内的 SQLite 内存库上通过 ASGI 直接调用，不经过网络和 uvicorn；
+另外单独测量不含查询、只做序列化的耗时。CPU 时间用 time.process_time 统计（包含线程池中的数据库操作）。
+
+用法（在 back-end 目录下）：
+    python -m benchmarks.serialization --rows 100 --requests 500
+    python -m benchmarks.serialization --rows 20,100 --output serialization.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.utils import create_response_field
+from sqlalchemy import select
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.api import chat, deps
+from app.core.db import SyncSessionAdapter
+from app.core.responses import ORJSONResponse, response_fields, rows_to_dicts
+from app.models.models import ChatLog, User
+from app.schemas.chat import ChatResponse
+
+legacy_router = APIRouter()
+
+
+@legacy_router.get("/history", response_model=List[ChatResponse], response_class=JSONResponse)
+async def legacy_history(*, db=Depends(deps.get_db), current_user: User = Depends(deps.get_current_active_user), skip: int = 0, limit: int = 100):
+    """原来的实现：返回 ORM 对象，由 response_model 校验和编码"""
+    result = await db.execute(select(ChatLog).where(ChatLog.user_id == current_user.id).order_by(ChatLog.timestamp.desc(), ChatLog.id.desc()).offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+def build_app(rows: int) -> FastAPI:
+    """创建只有一个用户、rows 条聊天记录的应用，每个请求使用新的会话"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(email="bench@example.com", username="bench", password_hash="x")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        start = datetime(2026, 10, 18, 8, 0, 0, 1)
+        session.add_all(
+            ChatLog(user_id=user.id, message=f"最近总是睡不着，第{i}天", response="听起来你最近压力很大，愿意多说一些吗？" * 3,
+                    timestamp=start + timedelta(seconds=i))
+            for i in range(rows)
+        )
+        session.commit()
+        session.refresh(user)
+        session.expunge(user)
+
+    def get_db():
+        with Session(engine) as session:
+            yield SyncSessionAdapter(session)
+
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api/chat")
+    app.include_router(legacy_router, prefix="/legacy")
+    app.dependency_overrides[deps.get_db] = get_db
+    app.dependency_overrides[deps.get_current_active_user] = lambda: user
+    return app
+
+
+async def measure_requests(app: FastAPI, path: str, rows: int, total: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(min(total, 20)):
+            (await client.get(path, params={"limit": rows})).raise_for_status()
+        cpu, wall = time.process_time(), time.perf_counter()
+        for _ in range(total):
+            response = await client.get(path, params={"limit": rows})
+            response.raise_for_status()
+        cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    return {"cpu_ms_per_request": round(cpu / total * 1000, 3), "throughput_rps": round(total / wall, 1)}
+
+
+def measure_serialization(rows: int, total: int) -> Dict[str, dict]:
+    """只测量序列化：legacy 与 FastAPI 的 serialize_response 步骤相同（校验后 jsonable_encoder）"""
+    start = datetime(2026, 10, 18, 8, 0, 0, 1)
+    objects = [
+        ChatLog(id=i, user_id=1, message=f"最近总是睡不着，第{i}天", response="听起来你最近压力很大，愿意多说一些吗？" * 3,
+                timestamp=start + timedelta(seconds=i))
+        for i in range(rows)
+    ]
+    tuples = [tuple(getattr(chat_log, name) for name in response_fields(ChatResponse)) for chat_log in objects]
+    field = create_response_field(name="response", type_=List[ChatResponse])
+
+    def legacy() -> bytes:
+        value, errors = field.validate(objects, {}, loc=("response",))
+        return JSONResponse(jsonable_encoder(value)).body
+
+    def fast() -> bytes:
+        return ORJSONResponse(rows_to_dicts(ChatResponse, tuples)).body
+
+    assert legacy() == fast()
+    results = {}
+    for name, render in (("orm", legacy), ("fast", fast)):
+        cpu = time.process_time()
+        for _ in range(total):
+            render()
+        results[name] = {"cpu_ms_per_request": round((time.process_time() - cpu) / total * 1000, 3)}
+    return results
+
+
+def run(rows: int, total: int) -> Dict[str, dict]:
+    app = build_app(rows)
+    results = {
+        "request": {
+            "orm": asyncio.run(measure_requests(app, "/legacy/history", rows, total)),
+            "fast": asyncio.run(measure_requests(app, "/api/chat/history", rows, total)),
+        },
+        "serialize_only": measure_serialization(rows, total),
+    }
+    for stage in results.values():
+        stage["speedup"] = round(stage["orm"]["cpu_ms_per_request"] / stage["fast"]["cpu_ms_per_request"], 2)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="列表接口序列化基准")
+    parser.add_argument("--rows", default="100", help="逗号分隔的每页行数列表")
+    parser.add_argument("--requests", type=int, default=500, help="每种实现的请求数")
+    parser.add_argument("--output", help="结果输出文件")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for rows in (int(value) for value in args.rows.split(",")):
+        results[f"rows={rows}"] = run(rows, args.requests)
+        print(f"rows={rows}: {results[f'rows={rows}']}", file=sys.stderr)
+    report = {
+        "meta": {"timestamp": datetime.utcnow().isoformat(), "python": platform.python_version(), "requests": args.requests},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+import json
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from app.services.fake_text_gen import FakeTextGenAPI
+
+# 模拟的生成服务，协议与真实服务的 /api/generate 一致，延迟可通过环境变量调整
+backend = FakeTextGenAPI(
+    latency=float(os.getenv("STUB_TEXT_GEN_LATENCY", "0.05")),
+    token_latency=float(os.getenv("STUB_TEXT_GEN_TOKEN_LATENCY", "0.0"))
+)
+
+app = FastAPI(title="Stub TextGen")
+
+
+@app.post("/api/generate")
+async def generate(request: Request):
+    payload = await request.json()
+    max_length = payload.get("max_length", 100)
+
+    if payload.get("prompts") is not None:
+        texts = await backend.generate_batch(payload["prompts"], max_length=max_length)
+        return {"generated_texts": texts}
+
+    if payload.get("stream"):
+        async def body():
+            async for token in backend.stream_text(payload["prompt"], max_length=max_length):
+                yield json.dumps({"token": token}, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+
+    return {"generated_text": await backend.generate_text(payload["prompt"], max_length=max_length)}
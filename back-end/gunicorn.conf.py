@@ -0,0 +1,17 @@
+# gunicorn 配置：gunicorn -c gunicorn.conf.py app.main:app
+from app.core.config import settings
+from app.server import configure_password_rounds, configure_workers
+
+bind = "0.0.0.0:8000"
+workers = configure_workers()
+configure_password_rounds()
+worker_class = "app.server.DrainingUvicornWorker"
+# 每个 worker 各自建立数据库、Redis 和生成服务的连接池，因此不预加载应用
+preload_app = False
+# 强制结束 worker 前等待的时间，需大于流式回复的停机期限
+graceful_timeout = int(settings.SHUTDOWN_DRAIN_TIMEOUT) + 10
+# worker 无响应多久后重启；启动预热也需在此时间内完成
+timeout = 60
+keepalive = 5
+forwarded_allow_ips = "*"
+accesslog = "-"
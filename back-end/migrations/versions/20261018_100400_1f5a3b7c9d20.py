@@ -0,0 +1,29 @@
+"""add users.allow_response_cache
+
+Revision ID: 1f5a3b7c9d20
+Revises: 
+Create Date: 2026-10-18 10:04:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f5a3b7c9d20'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 已有用户默认允许使用共享的回复缓存
+    op.add_column(
+        "users", sa.Column("allow_response_cache", sa.Boolean(), nullable=False, server_default=sa.true())
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "allow_response_cache")
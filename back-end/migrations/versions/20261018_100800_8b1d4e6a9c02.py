@@ -0,0 +1,35 @@
+"""add users.email and users.is_active
+
+Revision ID: 8b1d4e6a9c02
+Revises: 1f5a3b7c9d20
+Create Date: 2026-10-18 10:08:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1d4e6a9c02'
+down_revision: Union[str, None] = '1f5a3b7c9d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 已有用户没有邮箱，先以用户名占位，之后由用户自行修改
+    op.add_column("users", sa.Column("email", sa.String(255), nullable=True))
+    op.execute("UPDATE users SET email = username WHERE email IS NULL")
+    op.alter_column("users", "email", existing_type=sa.String(255), nullable=False)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.add_column(
+        "users", sa.Column("is_active", sa.Boolean(), nullable=False, server_default=sa.true())
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "is_active")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_column("users", "email")
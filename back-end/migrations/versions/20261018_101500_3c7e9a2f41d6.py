@@ -0,0 +1,37 @@
+"""add chat_logs (user_id, timestamp, id) index and users.chat_count
+
+Revision ID: 3c7e9a2f41d6
+Revises: 8b1d4e6a9c02
+Create Date: 2026-10-18 10:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c7e9a2f41d6'
+down_revision: Union[str, None] = '8b1d4e6a9c02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_chat_logs_user_id_timestamp_id", "chat_logs", ["user_id", "timestamp", "id"]
+    )
+    op.add_column(
+        "users", sa.Column("chat_count", sa.Integer(), nullable=False, server_default="0")
+    )
+    # 用现有记录回填计数
+    op.execute(
+        "UPDATE users SET chat_count = "
+        "(SELECT COUNT(*) FROM chat_logs WHERE chat_logs.user_id = users.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "chat_count")
+    op.drop_index("ix_chat_logs_user_id_timestamp_id", table_name="chat_logs")
@@ -0,0 +1,38 @@
+"""add recommendation_scores table
+
+Revision ID: 5e2f8c7d1a43
+Revises: 3c7e9a2f41d6
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2f8c7d1a43'
+down_revision: Union[str, None] = '3c7e9a2f41d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "recommendation_scores",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("content_id", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("rank", sa.Integer(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "ix_recommendation_scores_user_id_rank", "recommendation_scores", ["user_id", "rank"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_recommendation_scores_user_id_rank", table_name="recommendation_scores")
+    op.drop_table("recommendation_scores")
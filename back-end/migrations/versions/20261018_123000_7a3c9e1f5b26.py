@@ -0,0 +1,40 @@
+"""add full-text search indexes on chat_logs and navigation
+
+Revision ID: 7a3c9e1f5b26
+Revises: 5e2f8c7d1a43
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3c9e1f5b26'
+down_revision: Union[str, None] = '5e2f8c7d1a43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "mysql":
+        # ngram 分词器按 ngram_token_size（默认 2）切分中文，InnoDB 在写入和删除时自动维护索引
+        op.execute("ALTER TABLE chat_logs ADD FULLTEXT INDEX ft_chat_logs_message_response (message, response) WITH PARSER ngram")
+        op.execute("ALTER TABLE navigation ADD FULLTEXT INDEX ft_navigation_title_description (title, description) WITH PARSER ngram")
+    elif dialect == "sqlite":
+        from app.services.search import rebuild
+
+        # 创建 FTS5 表并写入已有数据，之后由应用的 ORM 事件增量维护
+        rebuild(op.get_bind())
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "mysql":
+        op.drop_index("ft_chat_logs_message_response", table_name="chat_logs")
+        op.drop_index("ft_navigation_title_description", table_name="navigation")
+    elif dialect == "sqlite":
+        op.execute("DROP TABLE IF EXISTS chat_logs_fts")
+        op.execute("DROP TABLE IF EXISTS navigation_fts")
@@ -0,0 +1,63 @@
+"""add daily chat statistics rollup tables
+
+Revision ID: 2d6b8f4e0a17
+Revises: 7a3c9e1f5b26
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d6b8f4e0a17'
+down_revision: Union[str, None] = '7a3c9e1f5b26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("chat_logs", sa.Column("response_ms", sa.Integer(), nullable=True))
+    # 统计任务按天重算时使用
+    op.create_index("ix_chat_logs_timestamp", "chat_logs", ["timestamp"])
+    op.create_index("ix_logs_timestamp", "logs", ["timestamp"])
+
+    op.create_table(
+        "user_daily_stats",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("message_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("session_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("session_seconds", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("response_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("response_ms_total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("response_ms_max", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_message_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("user_id", "day", name="uq_user_daily_stats_user_id_day"),
+    )
+    op.create_index("ix_user_daily_stats_day", "user_daily_stats", ["day"])
+
+    op.create_table(
+        "user_daily_actions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("action", sa.String(255), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+        sa.UniqueConstraint("user_id", "day", "action", name="uq_user_daily_actions_user_id_day_action"),
+    )
+    op.create_index("ix_user_daily_actions_day", "user_daily_actions", ["day"])
+    # 已有数据通过 python -m app.services.rollup --start <最早日期> 回填
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_daily_actions_day", table_name="user_daily_actions")
+    op.drop_table("user_daily_actions")
+    op.drop_index("ix_user_daily_stats_day", table_name="user_daily_stats")
+    op.drop_table("user_daily_stats")
+    op.drop_index("ix_logs_timestamp", table_name="logs")
+    op.drop_index("ix_chat_logs_timestamp", table_name="chat_logs")
+    op.drop_column("chat_logs", "response_ms")
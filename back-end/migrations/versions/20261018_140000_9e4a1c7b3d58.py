@@ -0,0 +1,31 @@
+"""add replication heartbeat table
+
+Revision ID: 9e4a1c7b3d58
+Revises: 2d6b8f4e0a17
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4a1c7b3d58'
+down_revision: Union[str, None] = '2d6b8f4e0a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 只有一行，由主库定期更新并随复制到达只读副本
+    op.create_table(
+        "replication_heartbeat",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("beat_at", sa.Float(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("replication_heartbeat")
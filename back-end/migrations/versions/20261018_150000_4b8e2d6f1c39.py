@@ -0,0 +1,29 @@
+"""add chat_logs.write_batch for write-behind id lookup
+
+Revision ID: 4b8e2d6f1c39
+Revises: 9e4a1c7b3d58
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b8e2d6f1c39'
+down_revision: Union[str, None] = '9e4a1c7b3d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 写入队列批量插入后按批次查回自增ID
+    op.add_column("chat_logs", sa.Column("write_batch", sa.String(32), nullable=True))
+    op.create_index("ix_chat_logs_write_batch", "chat_logs", ["write_batch"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_logs_write_batch", table_name="chat_logs")
+    op.drop_column("chat_logs", "write_batch")
@@ -8,6 +8,11 @@ class Chatbot:
         response = self.text_gen_api.generate_text(user_input)
         return response
 
+    async def achat(self, user_input):
+        """使用异步客户端（AsyncTextGenAPI）时在事件循环中等待回复"""
+        response = await self.text_gen_api.generate_text(user_input)
+        return response
+
 # 示例用法
 if __name__ == "__main__":
     text_gen_api = TextGenAPI(base_url="http://localhost:7860")
@@ -16,4 +21,4 @@ if __name__ == "__main__":
     while True:
         user_input = input("You: ")
         response = chatbot.chat(user_input)
-        print(f"Bot: {response}")
\ No newline at end of file
+        print(f"Bot: {response}")
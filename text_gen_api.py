@@ -1,24 +1,19 @@
-import requests
+import os
+import sys
 
-class TextGenAPI:
-    def __init__(self, base_url):
-        self.base_url = base_url
+# 文本生成客户端的实现位于后端 app.services.text_gen，这里保留原有的导入路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "back-end"))
 
-    def generate_text(self, prompt, max_length=100):
-        endpoint = f"{self.base_url}/api/generate"
-        payload = {
-            "prompt": prompt,
-            "max_length": max_length
-        }
-        response = requests.post(endpoint, json=payload)
-        if response.status_code == 200:
-            return response.json().get("generated_text")
-        else:
-            raise Exception(f"Error: {response.status_code}, {response.text}")
+from app.services.text_gen import AsyncTextGenAPI, TextGenAPI  # noqa: E402
 
 # 示例用法
 if __name__ == "__main__":
     api = TextGenAPI(base_url="http://localhost:7860")
     prompt = "Once upon a time"
     generated_text = api.generate_text(prompt)
-    print(generated_text)
\ No newline at end of file
+    print(generated_text)
+
+    # 流式生成：逐个打印生成的片段
+    for chunk in api.stream_text(prompt):
+        print(chunk, end="", flush=True)
+    print()